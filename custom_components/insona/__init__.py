@@ -1,13 +1,14 @@
 """inSona网关集成组件"""
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import logging
-import json
-from datetime import timedelta
-
-import voluptuous as vol
+from typing import Iterable, Set
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.const import (
     CONF_HOST,
     CONF_PORT,
@@ -15,56 +16,252 @@ from homeassistant.const import (
 )
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
-from .const import DOMAIN, DEFAULT_PORT
+from .const import (
+    DOMAIN,
+    DEFAULT_PORT,
+    DATA_HUB,
+    DEVICE_TYPE_LIGHT,
+    DEVICE_TYPE_COVER,
+    DEVICE_TYPE_SENSOR,
+    SIGNAL_DEVICE_ADDED,
+    SIGNAL_DEVICE_REMOVED,
+    SIGNAL_SCENE_ADDED,
+    SIGNAL_SCENE_REMOVED,
+    CONF_PROXY_ENABLED,
+    CONF_PROXY_PORT,
+    CONF_PROXY_HOST,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_PROXY_HOST,
+    CONF_CIRCADIAN_ENABLED,
+    CONF_ROOM_GROUPS,
+)
+from .device_index import CAP_MOTION, CAP_PANEL, capabilities
+from .fanout import parse_groups
 from .gateway import InSonaGateway
-from .scene import InSonaScene
+from .registry import async_register_device, async_register_topology
 
 _LOGGER = logging.getLogger(__name__)
 
+# 集成模块自身的导入耗时（毫秒），平台模块在转发时才按需导入，
+# 调度中心、绑定、场景学习、在线跟踪和服务在设置配置项时导入，代理和节律只在启用时导入
+IMPORT_TIME_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+
 PLATFORMS = [
     Platform.LIGHT,
     Platform.COVER,
     Platform.SENSOR,
+    Platform.BINARY_SENSOR,
+    Platform.EVENT,
     Platform.SCENE,
 ]
 
+def _device_platforms(device: dict) -> Set[Platform]:
+    """设备需要的平台。"""
+    platforms = set()
+    device_type = device["type"]
+    caps = capabilities(device)
+    if device_type == DEVICE_TYPE_LIGHT:
+        platforms.add(Platform.LIGHT)
+    elif device_type == DEVICE_TYPE_COVER:
+        platforms.add(Platform.COVER)
+    elif device_type == DEVICE_TYPE_SENSOR:
+        platforms.add(Platform.SENSOR)
+    if CAP_PANEL in caps:
+        platforms.add(Platform.EVENT)
+    if CAP_MOTION in caps:
+        platforms.add(Platform.BINARY_SENSOR)
+    return platforms
+
+def _gateway_platforms(gateway: InSonaGateway) -> Set[Platform]:
+    """根据网关中实际存在的设备类型和场景决定要加载的平台，由设备索引计数。"""
+    index = gateway.index
+    platforms = set()
+    if index.count(device_type=DEVICE_TYPE_LIGHT):
+        platforms.add(Platform.LIGHT)
+    if index.count(device_type=DEVICE_TYPE_COVER):
+        platforms.add(Platform.COVER)
+    if index.count(device_type=DEVICE_TYPE_SENSOR):
+        platforms.add(Platform.SENSOR)
+    if index.count(capability=CAP_PANEL):
+        platforms.add(Platform.EVENT)
+    if index.count(capability=CAP_MOTION):
+        platforms.add(Platform.BINARY_SENSOR)
+    if gateway.scenes:
+        platforms.add(Platform.SCENE)
+    return platforms
+
+async def _async_forward_platforms(
+    hass: HomeAssistant, entry: ConfigEntry, gateway: InSonaGateway, platforms: Iterable[Platform], late: bool = False
+) -> None:
+    """逐个转发平台并记录每个平台的导入和设置耗时。"""
+    forward = hass.config_entries.async_forward_entry_setups
+    if late:
+        # 配置项加载完成后再新增平台需持有设置锁
+        forward = getattr(hass.config_entries, "async_late_forward_entry_setups", forward)
+    timing = gateway.metrics.setup_timing.setdefault("platforms_ms", {})
+    for platform in sorted(platforms):
+        gateway.platforms.add(platform)
+        started = time.perf_counter()
+        await forward(entry, [platform])
+        timing[platform] = round((time.perf_counter() - started) * 1000, 1)
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """设置来自配置流的inSona网关条目。"""
+    from .bindings import BindingTable
+    from .hub import InSonaHub
+    from .liveness import LivenessMonitor
+    from .scene_learning import SceneLearner
+    from .services import async_setup_services
+
     host = entry.data[CONF_HOST]
     port = entry.data.get(CONF_PORT, DEFAULT_PORT)
     
     gateway = InSonaGateway(hass, host, port)
-    gateway_id = f"{host}:{port}"
+    gateway.room_groups = parse_groups(entry.options.get(CONF_ROOM_GROUPS, ""))
+    gateway_id = gateway.gateway_id
     
+    # 所有网关共用一个调度中心
+    hub = hass.data.get(DATA_HUB)
+    if hub is None:
+        hub = hass.data[DATA_HUB] = InSonaHub(hass)
+    gateway.attach_hub(hub)
+    
+    setup_started = time.perf_counter()
     try:
-        # 注册网关设备
-        device_registry = dr.async_get(hass)
-        device_registry.async_get_or_create(
-            config_entry_id=entry.entry_id,
-            identifiers={(DOMAIN, gateway_id)},
-            manufacturer="inSona",
-            name=f"inSona 网关 ({host})",
-            model="inSona Gateway",
-        )
-        
         await gateway.connect()
         await gateway.query_devices()
         _LOGGER.info("开始查询场景列表")
         await gateway.query_scenes()
         _LOGGER.info("场景列表查询完成")
+        
+        # 加载面板按键本地绑定和场景学习结果，开始跟踪设备在线状态
+        gateway.bindings = BindingTable(hass, entry.entry_id, gateway)
+        await gateway.bindings.async_load()
+        gateway.scene_learner = SceneLearner(hass, entry.entry_id, gateway)
+        await gateway.scene_learner.async_load()
+        gateway.liveness = LivenessMonitor(hass, gateway)
+        gateway.liveness.async_start()
     except (asyncio.TimeoutError, ConnectionRefusedError) as err:
         await gateway.disconnect()
+        await _async_release_hub(hass, gateway)
         raise ConfigEntryNotReady(f"无法连接到inSona网关: {err}") from err
     except Exception as err:
         await gateway.disconnect()
+        await _async_release_hub(hass, gateway)
         _LOGGER.exception("设置inSona网关时出错，特别是在查询场景时: %s", err)
         raise ConfigEntryNotReady(f"初始化inSona网关失败，特别是在查询场景时: {err}") from err
     
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = gateway
     
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    timing = gateway.metrics.setup_timing
+    timing["import_ms"] = round(IMPORT_TIME_MS, 1)
+    timing["connect_and_query_ms"] = round((time.perf_counter() - setup_started) * 1000, 1)
+    
+    # 一次性注册房间区域、网关和全部子设备，实体随后只需挂载
+    gateway.metrics.registry_ms = async_register_topology(hass, entry, gateway)
+    
+    # 只加载有设备的平台
+    await _async_forward_platforms(hass, entry, gateway, _gateway_platforms(gateway))
+    await async_setup_services(hass)
+    
+    # 启用代理时由本连接为下游客户端提供服务
+    if entry.options.get(CONF_PROXY_ENABLED):
+        from .proxy import GatewayProxy
+
+        proxy = GatewayProxy(
+            hass,
+            gateway,
+            entry.options.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT),
+            entry.options.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST),
+        )
+        try:
+            await proxy.async_start()
+            gateway.proxy = proxy
+        except OSError as err:
+            _LOGGER.error("启动inSona网关代理失败: %s", err)
+    
+    # 启用昼夜节律时按房间批量调整色温灯具
+    if entry.options.get(CONF_CIRCADIAN_ENABLED):
+        from .circadian import CircadianEngine
+
+        gateway.circadian = CircadianEngine(hass, gateway, entry.options)
+        gateway.circadian.async_start()
+    timing["total_ms"] = round((time.perf_counter() - setup_started) * 1000, 1)
+    _LOGGER.info("inSona网关 %s 设置完成，耗时统计: %s", gateway_id, timing)
+    
+    @callback
+    def _async_device_removed(did: str) -> None:
+        """网关移除设备时只删除对应的实体和设备，无需重新加载。"""
+        # 其他网关仍能看到该设备时，实体已转交给新的归属网关，只解除本配置项与设备的关联
+        if hub.owner(did) in (None, gateway_id):
+            entity_registry = er.async_get(hass)
+            for platform in PLATFORMS:
+                if platform == Platform.SCENE:
+                    continue
+                entity_id = entity_registry.async_get_entity_id(platform, DOMAIN, f"{DOMAIN}_{did}")
+                if entity_id is not None:
+                    entity_registry.async_remove(entity_id)
+        
+        device_registry = dr.async_get(hass)
+        device = device_registry.async_get_device(identifiers={(DOMAIN, did)})
+        if device is not None:
+            device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
+    
+    @callback
+    def _async_scene_removed(scene_id: int) -> None:
+        """网关移除场景时删除对应的场景实体。"""
+        entity_registry = er.async_get(hass)
+        entity_id = entity_registry.async_get_entity_id(
+            Platform.SCENE, DOMAIN, f"{gateway.host}_{scene_id}"
+        )
+        if entity_id is not None:
+            entity_registry.async_remove(entity_id)
+    
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时先注册设备，平台随后创建的实体直接挂载。"""
+        async_register_device(hass, entry, gateway, device)
+        _async_ensure_platforms(_device_platforms(device))
+    
+    @callback
+    def _async_scene_added(scene_id: int, scene_name: str) -> None:
+        """网关新增场景时按需加载场景平台。"""
+        _async_ensure_platforms({Platform.SCENE})
+    
+    @callback
+    def _async_ensure_platforms(platforms: Set[Platform]) -> None:
+        """加载尚未加载的平台，平台设置时会为已有设备创建实体。"""
+        missing = platforms - gateway.platforms
+        if missing:
+            gateway.platforms |= missing
+            hass.async_create_task(
+                _async_forward_platforms(hass, entry, gateway, missing, late=True)
+            )
+    
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_SCENE_ADDED.format(gateway_id), _async_scene_added
+        )
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway_id), _async_device_added
+        )
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_REMOVED.format(gateway_id), _async_device_removed
+        )
+    )
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_SCENE_REMOVED.format(gateway_id), _async_scene_removed
+        )
+    )
     
     # 注册关闭回调
     entry.async_on_unload(entry.add_update_listener(update_listener))
@@ -77,10 +274,33 @@ async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """卸载一个配置项。"""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    from .services import async_unload_services
+
+    gateway = hass.data[DOMAIN][entry.entry_id]
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, gateway.platforms)
     
     if unload_ok:
-        gateway = hass.data[DOMAIN].pop(entry.entry_id)
+        hass.data[DOMAIN].pop(entry.entry_id)
+        gateway.bindings.async_unload()
+        gateway.scene_learner.async_unload()
+        gateway.liveness.async_unload()
+        if gateway.circadian is not None:
+            gateway.circadian.async_unload()
+            gateway.circadian = None
+        if gateway.proxy is not None:
+            await gateway.proxy.async_stop()
+            gateway.proxy = None
         await gateway.disconnect()
+        await _async_release_hub(hass, gateway)
+        async_unload_services(hass)
     
-    return unload_ok
\ No newline at end of file
+    return unload_ok
+
+async def _async_release_hub(hass: HomeAssistant, gateway: InSonaGateway) -> None:
+    """从调度中心移除网关，没有网关时释放调度中心。"""
+    hub = hass.data.get(DATA_HUB)
+    if hub is None:
+        return
+    await hub.async_remove_gateway(gateway)
+    if hub.empty:
+        hass.data.pop(DATA_HUB)
\ No newline at end of file
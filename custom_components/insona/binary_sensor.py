@@ -0,0 +1,107 @@
+"""inSona网关人体感应平台。"""
+import logging
+from typing import List, Optional
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import (
+    DOMAIN,
+    FUNC_SENSOR,
+    SIGNAL_DEVICE_ADDED,
+)
+from .device_index import CAP_MOTION, capabilities
+from .gateway import InSonaGateway
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """设置inSona人体感应实体。"""
+    gateway = hass.data[DOMAIN][entry.entry_id]
+
+    entities = [
+        InSonaMotionSensor(gateway, device)
+        for device in gateway.index.find(capability=CAP_MOTION)
+        if gateway.owns_device(device["did"])
+    ]
+
+    if entities:
+        async_add_entities(entities)
+
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时增量创建实体。"""
+        if _is_motion_sensor(gateway, device):
+            async_add_entities([InSonaMotionSensor(gateway, device)])
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway.gateway_id), _async_device_added
+        )
+    )
+
+
+def _is_motion_sensor(gateway: InSonaGateway, device: dict) -> bool:
+    """设备是否支持人感/光感事件。"""
+    return gateway.owns_device(device["did"]) and CAP_MOTION in capabilities(device)
+
+
+class InSonaMotionSensor(BinarySensorEntity):
+    """inSona人体感应实体。"""
+
+    _attr_should_poll = False
+    _attr_device_class = BinarySensorDeviceClass.MOTION
+
+    def __init__(self, gateway: InSonaGateway, device: dict):
+        """初始化人体感应实体。"""
+        self.gateway = gateway
+        self.device = device
+        self.did = device["did"]
+        self._attr_unique_id = f"{DOMAIN}_{self.did}"
+        self._attr_name = device["name"]
+
+        # 设备已在启动时批量注册，实体只需携带标识挂载
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, self.did)})
+
+        # 初始状态取查询结果中的值
+        value = device.get("value", [])
+        self._attr_is_on: Optional[bool] = (
+            value[0] == 1 if device.get("func") == FUNC_SENSOR and value else None
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """实体加入HomeAssistant时注册事件回调，移除时自动注销。"""
+        self.async_on_remove(
+            self.gateway.register_event_listener(self.did, self._handle_event)
+        )
+        self.async_on_remove(
+            self.gateway.register_disconnect_callback(self.async_write_ha_state)
+        )
+
+    @property
+    def available(self) -> bool:
+        """设备是否可用。"""
+        return self.gateway.online and self.device.get("alive", 0) == 1
+
+    @callback
+    def _handle_event(self, evt: str, value: List[int]) -> None:
+        """处理传感器事件，value[0]为1表示检测到有人。"""
+        if not value:
+            return
+        is_on = value[0] == 1
+        if is_on == self._attr_is_on:
+            return
+        self._attr_is_on = is_on
+        self.async_write_ha_state()
@@ -0,0 +1,151 @@
+"""inSona面板按键本地绑定。"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    DEVICE_TYPE_LIGHT,
+    DEVICE_TYPE_COVER,
+    SIGNAL_DEVICE_ADDED,
+    SIGNAL_DEVICE_REMOVED,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# 绑定帧使用的固定uuid，位于网关请求uuid范围之外，确认帧会被忽略
+BINDING_UUID = 999
+
+BindingKey = Tuple[str, int, Optional[int]]
+
+
+class BindingTable:
+    """面板按键到控制帧的绑定表。
+
+    每条绑定把(面板did, 按键, 动作)映射到一组控制目标，目标可以是设备或房间；
+    绑定在加载和拓扑变化时预编译为可直接写入连接的字节串，按键事件到达时
+    由网关读取任务直接下发，不经过HA总线和自动化引擎。
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, gateway) -> None:
+        """初始化绑定表。"""
+        self.hass = hass
+        self.gateway = gateway
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.bindings.{entry_id}")
+        self._bindings: Dict[BindingKey, Dict[str, Any]] = {}
+        self._compiled: Dict[BindingKey, bytes] = {}
+        self._unsubs: List = []
+
+    async def async_load(self) -> None:
+        """从存储加载绑定并编译，同时监听拓扑变化以重新编译房间目标。"""
+        data = await self._store.async_load() or {}
+        for binding in data.get("bindings", []):
+            self._bindings[_binding_key(binding)] = binding
+        self._compile()
+
+        gateway_id = self.gateway.gateway_id
+        for signal in (SIGNAL_DEVICE_ADDED, SIGNAL_DEVICE_REMOVED):
+            self._unsubs.append(
+                async_dispatcher_connect(self.hass, signal.format(gateway_id), self._handle_topology)
+            )
+
+    @callback
+    def async_unload(self) -> None:
+        """停止监听拓扑变化。"""
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def _handle_topology(self, *args: Any) -> None:
+        """拓扑变化后重新编译，房间目标随之更新。"""
+        self._compile()
+
+    def lookup(self, panel_did: str, value: List[int]) -> Optional[bytes]:
+        """查找按键事件对应的预编译控制帧。"""
+        if not self._compiled or not value:
+            return None
+        key = value[0]
+        action = value[1] if len(value) > 1 else None
+        frames = self._compiled.get((panel_did, key, action))
+        if frames is None and action is not None:
+            frames = self._compiled.get((panel_did, key, None))
+        return frames
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        """返回所有绑定。"""
+        return list(self._bindings.values())
+
+    async def async_set(self, binding: Dict[str, Any]) -> None:
+        """新增或替换一条绑定。"""
+        self._bindings[_binding_key(binding)] = binding
+        self._compile()
+        await self._async_save()
+
+    async def async_remove(self, panel_did: str, key: int, key_action: Optional[int]) -> bool:
+        """删除一条绑定。"""
+        if self._bindings.pop((panel_did, key, key_action), None) is None:
+            return False
+        self._compile()
+        await self._async_save()
+        return True
+
+    async def _async_save(self) -> None:
+        """保存绑定。"""
+        await self._store.async_save({"bindings": self.as_list()})
+
+    def _compile(self) -> None:
+        """把所有绑定编译为控制帧字节串。"""
+        compiled = {}
+        for key, binding in self._bindings.items():
+            frames = b"".join(
+                _control_frame(did, binding["action"], binding["value"], binding.get("transition", 0))
+                for did in self._resolve_targets(binding)
+            )
+            if frames:
+                compiled[key] = frames
+        self._compiled = compiled
+
+    def _resolve_targets(self, binding: Dict[str, Any]) -> List[str]:
+        """展开绑定目标，房间目标展开为房间内的灯具和窗帘。
+
+        房间配置了组地址时，房间内的灯具由组地址一条命令控制，窗帘仍逐个下发。
+        """
+        devices = self.gateway.devices
+        targets = [did for did in binding.get("targets", []) if did in devices]
+        room_id = binding.get("room")
+        if room_id is not None:
+            group = self.gateway.room_groups.get(room_id)
+            if group is not None:
+                targets.append(group)
+            for device in self.gateway.index.find(room_id=room_id):
+                did = device["did"]
+                if device["type"] == DEVICE_TYPE_LIGHT and group is not None:
+                    continue
+                if device["type"] in (DEVICE_TYPE_LIGHT, DEVICE_TYPE_COVER) and did not in targets:
+                    targets.append(did)
+        return targets
+
+
+def _binding_key(binding: Dict[str, Any]) -> BindingKey:
+    """绑定的查找键。"""
+    return (binding["panel"], binding["key"], binding.get("key_action"))
+
+
+def _control_frame(did: str, action: str, value: List[int], transition: int) -> bytes:
+    """生成一条控制帧。"""
+    command = {
+        "version": 1,
+        "uuid": BINDING_UUID,
+        "method": "c.control",
+        "did": did,
+        "action": action,
+        "value": value,
+        "transition": transition,
+    }
+    return (json.dumps(command) + "\r\n").encode("utf-8")
@@ -0,0 +1,241 @@
+"""inSona灯具的昼夜节律色温调整。"""
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from homeassistant.const import SUN_EVENT_SUNRISE, SUN_EVENT_SUNSET
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.sun import get_astral_event_date
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ACTION_CTL,
+    FUNC_HSL,
+    CONF_CIRCADIAN_MIN_KELVIN,
+    CONF_CIRCADIAN_MAX_KELVIN,
+    CONF_CIRCADIAN_INTERVAL,
+    CONF_CIRCADIAN_ROOMS,
+    DEFAULT_CIRCADIAN_MIN_KELVIN,
+    DEFAULT_CIRCADIAN_MAX_KELVIN,
+    DEFAULT_CIRCADIAN_INTERVAL,
+)
+from .device_index import CAP_CT, CAP_DUAL
+
+_LOGGER = logging.getLogger(__name__)
+
+# 灯具的色温范围，设备色温值0-100线性对应该范围
+LIGHT_MIN_KELVIN = 2700
+LIGHT_MAX_KELVIN = 6500
+
+# 每次调整的渐变时间（毫秒），色温在两次调整之间缓慢过渡
+CIRCADIAN_TRANSITION = 60 * 1000
+
+# 灯具色温与上次下发值相差超过该值（设备色温值）即视为手动调整
+OVERRIDE_TOLERANCE = 2
+
+# 等待每个房间控制确认的时间（秒）
+ROOM_ACK_TIMEOUT = 10.0
+
+
+def circadian_kelvin(
+    now: datetime,
+    sunrise: Optional[datetime],
+    sunset: Optional[datetime],
+    min_kelvin: int,
+    max_kelvin: int,
+) -> int:
+    """计算当前的目标色温：日出日落之间按正弦曲线升到正午色温，夜间为最低色温。"""
+    if sunrise is None or sunset is None or not sunrise < now < sunset:
+        return min_kelvin
+    progress = (now - sunrise) / (sunset - sunrise)
+    return round(min_kelvin + (max_kelvin - min_kelvin) * math.sin(math.pi * progress))
+
+
+def kelvin_to_device(kelvin: int) -> int:
+    """把开尔文温度换算为设备色温值(0-100)。"""
+    kelvin = max(LIGHT_MIN_KELVIN, min(LIGHT_MAX_KELVIN, kelvin))
+    return round((kelvin - LIGHT_MIN_KELVIN) / (LIGHT_MAX_KELVIN - LIGHT_MIN_KELVIN) * 100)
+
+
+class CircadianEngine:
+    """按房间批量调整色温灯具的色温。
+
+    每个周期计算一次目标色温。配置了组地址的房间中，色温灯具都已打开、
+    都跟随节律且亮度相同时，只向组地址发一条带长渐变的控制命令；
+    其余房间中需要调整的灯具各发一帧，合并为一次写出。
+    只调整已打开、处于色温模式的灯具；上次调整后色温被改动或切换到彩色模式的灯具
+    视为手动调整，直到关灯前不再调整。
+    """
+
+    def __init__(self, hass: HomeAssistant, gateway, options: Mapping[str, Any]) -> None:
+        """初始化节律调整。"""
+        self.hass = hass
+        self.gateway = gateway
+        self.min_kelvin = options.get(CONF_CIRCADIAN_MIN_KELVIN, DEFAULT_CIRCADIAN_MIN_KELVIN)
+        self.max_kelvin = options.get(CONF_CIRCADIAN_MAX_KELVIN, DEFAULT_CIRCADIAN_MAX_KELVIN)
+        self.interval = options.get(CONF_CIRCADIAN_INTERVAL, DEFAULT_CIRCADIAN_INTERVAL)
+        self.rooms: Set[int] = {int(room) for room in options.get(CONF_CIRCADIAN_ROOMS, [])}
+        self._unsub = None
+        self._task = None
+        self._commanded: Dict[str, int] = {}  # did -> 上次下发的设备色温值
+        self._overridden: Set[str] = set()
+        self.target_kelvin: Optional[int] = None
+        self.cycles = 0
+        self.room_writes = 0
+        self.group_commands = 0
+        self.frames_sent = 0
+
+    @callback
+    def async_start(self) -> None:
+        """开始周期调整，并立即执行一次。"""
+        self._unsub = async_track_time_interval(
+            self.hass, self._async_tick, timedelta(minutes=self.interval)
+        )
+        self._async_tick(None)
+
+    @callback
+    def async_unload(self) -> None:
+        """停止调整。"""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @callback
+    def discard(self, did: str) -> None:
+        """设备被移除时丢弃记录。"""
+        self._commanded.pop(did, None)
+        self._overridden.discard(did)
+
+    @callback
+    def _async_tick(self, _now: Any) -> None:
+        """启动一个调整周期，上一周期未完成时跳过。"""
+        if self._task is not None or not self.gateway.connected:
+            return
+        self._task = self.hass.async_create_task(self._async_cycle())
+
+    def _target(self) -> int:
+        """根据当天的日出日落计算目标色温。"""
+        now = dt_util.utcnow()
+        today = dt_util.now().date()
+        sunrise = get_astral_event_date(self.hass, SUN_EVENT_SUNRISE, today)
+        sunset = get_astral_event_date(self.hass, SUN_EVENT_SUNSET, today)
+        return circadian_kelvin(now, sunrise, sunset, self.min_kelvin, self.max_kelvin)
+
+    def _candidates(self) -> List[dict]:
+        """由设备索引取出参与房间中的色温灯具和双模式灯具。"""
+        index = self.gateway.index
+        if not self.rooms:
+            return index.find(capability=CAP_CT) + index.find(capability=CAP_DUAL)
+        return [
+            device
+            for room_id in self.rooms
+            for capability in (CAP_CT, CAP_DUAL)
+            for device in index.find(capability=capability, room_id=room_id)
+        ]
+
+    def _room_commands(self, ct: int) -> Tuple[Dict[int, List[tuple]], Set[int]]:
+        """找出需要调整的灯具，按房间分组，并返回可以用一条组命令调整的房间。
+
+        组命令会作用于组内所有灯具且只能带一个亮度，只有房间中的色温灯具
+        都已打开、都跟随节律且亮度相同时才能代替逐灯命令。
+        """
+        rooms: Dict[int, List[tuple]] = {}
+        brightness_by_room: Dict[int, Set[int]] = {}
+        mixed: Set[int] = set()  # 有灯具不能跟随组命令的房间
+        for device in self._candidates():
+            did = device["did"]
+            room_id = device.get("roomId")
+            if not self.gateway.owns_device(did) or device.get("alive", 0) != 1:
+                continue
+            value = device["value"]
+            if not value or value[0] != 1:
+                # 关灯后清除手动调整标记，下次开灯重新跟随节律
+                self.discard(did)
+                mixed.add(room_id)
+                continue
+            if did in self._overridden:
+                mixed.add(room_id)
+                continue
+            current = value[2] if len(value) > 2 else None
+            commanded = self._commanded.get(did)
+            if device.get("func") == FUNC_HSL or (
+                commanded is not None
+                and current is not None
+                and abs(current - commanded) > OVERRIDE_TOLERANCE
+            ):
+                self._overridden.add(did)
+                mixed.add(room_id)
+                continue
+            brightness = value[1] if len(value) > 1 else 100
+            brightness_by_room.setdefault(room_id, set()).add(brightness)
+            if current is not None and abs(current - ct) <= 1:
+                continue
+            rooms.setdefault(room_id, []).append(
+                (did, ACTION_CTL, [brightness, ct], CIRCADIAN_TRANSITION)
+            )
+        group_rooms = {
+            room_id
+            for room_id in rooms
+            if room_id in self.gateway.room_groups
+            and room_id not in mixed
+            and len(brightness_by_room.get(room_id, ())) == 1
+        }
+        return rooms, group_rooms
+
+    async def _async_cycle(self) -> None:
+        """计算目标色温并逐个房间下发。"""
+        try:
+            self.cycles += 1
+            self.target_kelvin = self._target()
+            ct = kelvin_to_device(self.target_kelvin)
+            rooms, group_rooms = self._room_commands(ct)
+            for room_id, commands in rooms.items():
+                dids = [command[0] for command in commands]
+                self.room_writes += 1
+                if room_id in group_rooms:
+                    # 房间中的灯具状态一致，一条组命令即可让整个房间同时渐变
+                    success = await self.gateway.control_group(
+                        self.gateway.room_groups[room_id], ACTION_CTL, commands[0][2], CIRCADIAN_TRANSITION,
+                        dids, ROOM_ACK_TIMEOUT,
+                    )
+                    self.group_commands += 1
+                    self.frames_sent += 1
+                    succeeded = dids if success else []
+                else:
+                    # 每个灯具一帧，房间的控制帧一次写出，各灯同时开始渐变
+                    results = await self.gateway.control_many(commands, ROOM_ACK_TIMEOUT)
+                    self.frames_sent += len(commands)
+                    succeeded = [did for did in dids if results.get(did, {}).get("success")]
+                for did in succeeded:
+                    self._commanded[did] = ct
+                _LOGGER.debug(
+                    "房间 %s 的 %d 个灯具调整到 %sK，%s",
+                    room_id, len(commands), self.target_kelvin,
+                    "组命令" if room_id in group_rooms else "逐灯命令",
+                )
+        except ConnectionError as err:
+            _LOGGER.debug("网关断开，本周期节律调整中止: %s", err)
+        finally:
+            self._task = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出状态，用于诊断信息。"""
+        return {
+            "target_kelvin": self.target_kelvin,
+            "min_kelvin": self.min_kelvin,
+            "max_kelvin": self.max_kelvin,
+            "interval_min": self.interval,
+            "rooms": sorted(self.rooms),
+            "groups": len(self.gateway.room_groups),
+            "following": len(self._commanded),
+            "overridden": len(self._overridden),
+            "cycles": self.cycles,
+            "room_writes": self.room_writes,
+            "group_commands": self.group_commands,
+            "frames_sent": self.frames_sent,
+        }
\ No newline at end of file
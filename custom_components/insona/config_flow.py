@@ -1,62 +1,129 @@
 """inSona网关集成的配置流程。"""
 import asyncio
 import logging
+from typing import Dict, List, Optional
+
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_PORT
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import config_validation as cv
 
-from .const import DOMAIN, DEFAULT_PORT
+from .const import (
+    DOMAIN,
+    DEFAULT_PORT,
+    SENSOR_FILTER_PARAMS,
+    SENSOR_KINDS,
+    CONF_PROXY_ENABLED,
+    CONF_PROXY_PORT,
+    CONF_PROXY_HOST,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_PROXY_HOST,
+    CONF_CIRCADIAN_ENABLED,
+    CONF_CIRCADIAN_MIN_KELVIN,
+    CONF_CIRCADIAN_MAX_KELVIN,
+    CONF_CIRCADIAN_INTERVAL,
+    CONF_CIRCADIAN_ROOMS,
+    CONF_ROOM_GROUPS,
+    DEFAULT_CIRCADIAN_MIN_KELVIN,
+    DEFAULT_CIRCADIAN_MAX_KELVIN,
+    DEFAULT_CIRCADIAN_INTERVAL,
+)
+from .discovery import async_discover, async_local_networks, parse_networks
+from .fanout import parse_groups
 from .gateway import InSonaGateway
+from .sensor_filter import sensor_filter_options
 
 _LOGGER = logging.getLogger(__name__)
 
+CONF_SUBNETS = "subnets"
+
 class InSonaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """处理inSona网关配置流程。"""
     
     VERSION = 1
     
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> "InSonaOptionsFlow":
+        """返回选项流程。"""
+        return InSonaOptionsFlow(config_entry)
+    
+    def __init__(self) -> None:
+        """初始化配置流程。"""
+        self._discovered: List[str] = []
+    
     async def async_step_user(self, user_input=None) -> FlowResult:
+        """选择自动发现或手动输入网关地址。"""
+        return self.async_show_menu(step_id="user", menu_options=["discover", "manual"])
+    
+    async def async_step_discover(self, user_input=None) -> FlowResult:
+        """在局域网网段中发现网关。"""
+        errors = {}
+        
+        if user_input is not None:
+            try:
+                # 未填写网段时与默认值一样使用HA网络设置中已启用网卡的网段
+                networks = parse_networks(user_input.get(CONF_SUBNETS, "")) or await async_local_networks(
+                    self.hass
+                )
+            except ValueError:
+                errors["base"] = "invalid_subnet"
+            else:
+                # 已配置的网关在探测前排除，不再占用它有限的TCP连接
+                configured = {
+                    entry.data[CONF_HOST]
+                    for entry in self._async_current_entries()
+                    if entry.data.get(CONF_PORT, DEFAULT_PORT) == DEFAULT_PORT
+                }
+                found = await async_discover(networks, exclude=configured)
+                self._discovered = [f"{host}:{port}" for host, port in found]
+                if self._discovered:
+                    return await self.async_step_pick()
+                errors["base"] = "no_gateways"
+            subnets = user_input.get(CONF_SUBNETS, "")
+        else:
+            # 默认探测本机所在的网段，跨VLAN时可追加其他网段
+            subnets = ", ".join(str(subnet) for subnet in await async_local_networks(self.hass))
+        
+        return self.async_show_form(
+            step_id="discover",
+            data_schema=vol.Schema({vol.Optional(CONF_SUBNETS, default=subnets): str}),
+            errors=errors,
+        )
+    
+    async def async_step_pick(self, user_input=None) -> FlowResult:
+        """从发现的网关中选择一个。"""
+        errors = {}
+        
+        if user_input is not None:
+            host, port = user_input[CONF_HOST].rsplit(":", 1)
+            result = await self._async_create_gateway_entry(host, int(port), errors)
+            if result is not None:
+                return result
+        
+        return self.async_show_form(
+            step_id="pick",
+            data_schema=vol.Schema({vol.Required(CONF_HOST): vol.In(self._discovered)}),
+            errors=errors,
+        )
+    
+    async def async_step_manual(self, user_input=None) -> FlowResult:
         """处理用户输入配置。"""
         errors = {}
         
         if user_input is not None:
             host = user_input[CONF_HOST]
             port = user_input.get(CONF_PORT, DEFAULT_PORT)
-            
-            # 检查是否已经配置过此网关
-            await self.async_set_unique_id(f"{host}:{port}")
-            self._abort_if_unique_id_configured()
-            
-            # 测试连接
-            gateway = InSonaGateway(self.hass, host, port)
-            try:
-                await gateway.connect()
-                await gateway.query_devices()
-                await gateway.disconnect()
-                
-                return self.async_create_entry(
-                    title=f"inSona 网关 ({host})",
-                    data={
-                        CONF_HOST: host,
-                        CONF_PORT: port,
-                    },
-                )
-            except asyncio.TimeoutError:
-                errors["base"] = "timeout"
-            except ConnectionRefusedError:
-                errors["base"] = "cannot_connect"
-            except Exception as err:
-                _LOGGER.exception("连接测试失败: %s", err)
-                errors["base"] = "unknown"
-                
-            await gateway.disconnect()
+            result = await self._async_create_gateway_entry(host, port, errors)
+            if result is not None:
+                return result
         
         # 显示配置表单
         return self.async_show_form(
-            step_id="user",
+            step_id="manual",
             data_schema=vol.Schema(
                 {
                     vol.Required(CONF_HOST): str,
@@ -64,4 +131,150 @@ class InSonaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 }
             ),
             errors=errors,
-        ) 
\ No newline at end of file
+        )
+    
+    async def _async_create_gateway_entry(
+        self, host: str, port: int, errors: Dict[str, str]
+    ) -> Optional[FlowResult]:
+        """测试连接并创建配置项，失败时填写errors并返回None。"""
+        # 检查是否已经配置过此网关
+        await self.async_set_unique_id(f"{host}:{port}")
+        self._abort_if_unique_id_configured()
+        
+        # 测试连接
+        gateway = InSonaGateway(self.hass, host, port)
+        try:
+            await gateway.connect()
+            await gateway.query_devices()
+            await gateway.disconnect()
+            
+            return self.async_create_entry(
+                title=f"inSona 网关 ({host})",
+                data={
+                    CONF_HOST: host,
+                    CONF_PORT: port,
+                },
+            )
+        except asyncio.TimeoutError:
+            errors["base"] = "timeout"
+        except ConnectionRefusedError:
+            errors["base"] = "cannot_connect"
+        except Exception as err:
+            _LOGGER.exception("连接测试失败: %s", err)
+            errors["base"] = "unknown"
+            
+        await gateway.disconnect()
+        return None
+
+
+class InSonaOptionsFlow(config_entries.OptionsFlow):
+    """处理inSona网关选项。"""
+    
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """初始化选项流程。"""
+        self._entry = config_entry
+        self._options = dict(config_entry.options)
+    
+    async def async_step_init(self, user_input=None) -> FlowResult:
+        """选项菜单。"""
+        return self.async_show_menu(step_id="init", menu_options=["sensors", "proxy", "groups", "circadian"])
+    
+    async def async_step_sensors(self, user_input=None) -> FlowResult:
+        """各类型传感器的过滤参数。"""
+        if user_input is not None:
+            self._options.update(user_input)
+            return self.async_create_entry(title="", data=self._options)
+        
+        filters = sensor_filter_options(self._options)
+        schema = {}
+        for kind in SENSOR_KINDS.values():
+            for param in SENSOR_FILTER_PARAMS:
+                schema[
+                    vol.Required(f"{kind}_{param}", default=filters[kind][param])
+                ] = vol.All(vol.Coerce(float), vol.Range(min=0))
+        return self.async_show_form(step_id="sensors", data_schema=vol.Schema(schema))
+    
+    async def async_step_proxy(self, user_input=None) -> FlowResult:
+        """多路复用代理设置。"""
+        if user_input is not None:
+            self._options.update(user_input)
+            return self.async_create_entry(title="", data=self._options)
+        
+        return self.async_show_form(
+            step_id="proxy",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_PROXY_ENABLED, default=self._options.get(CONF_PROXY_ENABLED, False)
+                    ): bool,
+                    vol.Required(
+                        CONF_PROXY_PORT, default=self._options.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT)
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=65535)),
+                    vol.Required(
+                        CONF_PROXY_HOST, default=self._options.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST)
+                    ): str,
+                }
+            ),
+        )
+    
+    async def async_step_groups(self, user_input=None) -> FlowResult:
+        """房间组地址设置。"""
+        errors = {}
+        if user_input is not None:
+            try:
+                parse_groups(user_input.get(CONF_ROOM_GROUPS, ""))
+            except ValueError:
+                errors[CONF_ROOM_GROUPS] = "invalid_groups"
+            else:
+                self._options.update(user_input)
+                return self.async_create_entry(title="", data=self._options)
+        
+        return self.async_show_form(
+            step_id="groups",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_ROOM_GROUPS, default=self._options.get(CONF_ROOM_GROUPS, "")): str,
+                }
+            ),
+            errors=errors,
+        )
+    
+    async def async_step_circadian(self, user_input=None) -> FlowResult:
+        """昼夜节律色温设置。"""
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_CIRCADIAN_MIN_KELVIN] > user_input[CONF_CIRCADIAN_MAX_KELVIN]:
+                errors["base"] = "invalid_kelvin_range"
+            if not errors:
+                self._options.update(user_input)
+                return self.async_create_entry(title="", data=self._options)
+        
+        # 房间列表取自已加载的网关，选项中以字符串保存房间ID
+        gateway = self.hass.data.get(DOMAIN, {}).get(self._entry.entry_id)
+        rooms = {str(room_id): name for room_id, name in gateway.rooms.items()} if gateway else {}
+        selected = [room for room in self._options.get(CONF_CIRCADIAN_ROOMS, []) if room in rooms]
+        kelvin = vol.All(vol.Coerce(int), vol.Range(min=2700, max=6500))
+        return self.async_show_form(
+            step_id="circadian",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_CIRCADIAN_ENABLED, default=self._options.get(CONF_CIRCADIAN_ENABLED, False)
+                    ): bool,
+                    vol.Required(
+                        CONF_CIRCADIAN_MIN_KELVIN,
+                        default=self._options.get(CONF_CIRCADIAN_MIN_KELVIN, DEFAULT_CIRCADIAN_MIN_KELVIN),
+                    ): kelvin,
+                    vol.Required(
+                        CONF_CIRCADIAN_MAX_KELVIN,
+                        default=self._options.get(CONF_CIRCADIAN_MAX_KELVIN, DEFAULT_CIRCADIAN_MAX_KELVIN),
+                    ): kelvin,
+                    vol.Required(
+                        CONF_CIRCADIAN_INTERVAL,
+                        default=self._options.get(CONF_CIRCADIAN_INTERVAL, DEFAULT_CIRCADIAN_INTERVAL),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+                    vol.Optional(CONF_CIRCADIAN_ROOMS, default=selected): cv.multi_select(rooms),
+                }
+            ),
+            errors=errors,
+        )
\ No newline at end of file
@@ -3,6 +3,16 @@
 DOMAIN = "insona"
 DEFAULT_PORT = 8091
 
+# hass.data 中多网关调度中心的键
+DATA_HUB = f"{DOMAIN}_hub"
+
+# 拓扑变化信号，参数为网关ID
+SIGNAL_DEVICE_ADDED = f"{DOMAIN}_device_added_{{}}"
+SIGNAL_DEVICE_REMOVED = f"{DOMAIN}_device_removed_{{}}"
+SIGNAL_SCENE_ADDED = f"{DOMAIN}_scene_added_{{}}"
+SIGNAL_SCENE_REMOVED = f"{DOMAIN}_scene_removed_{{}}"
+SIGNAL_SCENE_LEARNED = f"{DOMAIN}_scene_learned_{{}}"
+
 # 设备类型
 DEVICE_TYPE_LIGHT = 1984
 DEVICE_TYPE_COVER = 1860 
@@ -15,10 +25,64 @@ FUNC_BRIGHTNESS = 3
 FUNC_CTL = 4  # 亮度和色温
 FUNC_HSL = 5  # HSL颜色
 FUNC_PANEL = 9  # 面板
+FUNC_SENSOR = 10  # 人感/光感传感器
+
+# 网关主动事件类型
+EVT_STATUS = "status"
+EVT_SENSOR = "sensor"
+EVT_SWITCH_KEY = "switch.key"
+EVT_MESHCHANGE = "meshchange"
+
+# 传感器和面板事件在HA总线上触发的事件名
+EVENT_INSONA = f"{DOMAIN}_event"
 
 # 控制动作
 ACTION_ONOFF = "onoff"
 ACTION_LEVEL = "level"
 ACTION_CTL = "ctl"
 ACTION_HSL = "hsl"
-ACTION_SCENE = "scene"
\ No newline at end of file
+ACTION_SCENE = "scene"
+
+# 传感器过滤选项，按传感器类型分别配置，选项键为 f"{类型}_{参数}"
+CONF_DEADBAND = "deadband"  # 死区：与上次写入值的差小于该值时不写入
+CONF_HYSTERESIS = "hysteresis"  # 回差：变化方向反转时额外需要的变化量
+CONF_MIN_INTERVAL = "min_interval"  # 两次写入的最小间隔（秒），期间的变化在间隔结束时写入
+CONF_AVERAGE_WINDOW = "average_window"  # 滑动平均窗口（秒），0表示不平滑
+
+SENSOR_FILTER_PARAMS = (CONF_DEADBAND, CONF_HYSTERESIS, CONF_MIN_INTERVAL, CONF_AVERAGE_WINDOW)
+
+# sensorType -> 选项中的传感器类型名
+SENSOR_KINDS = {
+    1: "temperature",
+    2: "humidity",
+    3: "pm25",
+    4: "illuminance",
+}
+
+# 各类型传感器的默认过滤参数，光照度和PM2.5抖动频繁，默认过滤较强
+DEFAULT_SENSOR_FILTERS = {
+    "temperature": {CONF_DEADBAND: 0, CONF_HYSTERESIS: 0, CONF_MIN_INTERVAL: 0, CONF_AVERAGE_WINDOW: 0},
+    "humidity": {CONF_DEADBAND: 0, CONF_HYSTERESIS: 0, CONF_MIN_INTERVAL: 0, CONF_AVERAGE_WINDOW: 0},
+    "pm25": {CONF_DEADBAND: 2, CONF_HYSTERESIS: 1, CONF_MIN_INTERVAL: 10, CONF_AVERAGE_WINDOW: 0},
+    "illuminance": {CONF_DEADBAND: 10, CONF_HYSTERESIS: 5, CONF_MIN_INTERVAL: 10, CONF_AVERAGE_WINDOW: 0},
+}
+
+# 多路复用代理选项
+CONF_PROXY_ENABLED = "proxy_enabled"
+CONF_PROXY_PORT = "proxy_port"
+CONF_PROXY_HOST = "proxy_host"  # 代理监听的地址，代理没有认证，默认只允许本机连接
+DEFAULT_PROXY_PORT = 8092
+DEFAULT_PROXY_HOST = "127.0.0.1"
+
+# 房间组地址选项，格式为“房间ID=组地址”，逗号分隔；多设备命令覆盖整个房间时改发组命令
+CONF_ROOM_GROUPS = "room_groups"
+
+# 昼夜节律色温选项
+CONF_CIRCADIAN_ENABLED = "circadian_enabled"
+CONF_CIRCADIAN_MIN_KELVIN = "circadian_min_kelvin"  # 夜间色温
+CONF_CIRCADIAN_MAX_KELVIN = "circadian_max_kelvin"  # 正午色温
+CONF_CIRCADIAN_INTERVAL = "circadian_interval"  # 调整间隔（分钟）
+CONF_CIRCADIAN_ROOMS = "circadian_rooms"  # 参与的房间，为空表示全部房间
+DEFAULT_CIRCADIAN_MIN_KELVIN = 2700
+DEFAULT_CIRCADIAN_MAX_KELVIN = 5500
+DEFAULT_CIRCADIAN_INTERVAL = 5
\ No newline at end of file
@@ -1,6 +1,8 @@
 """inSona网关窗帘控制平台。"""
 import logging
-from typing import Any, Optional
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
 
 from homeassistant.components.cover import (
     CoverDeviceClass,
@@ -9,6 +11,9 @@ from homeassistant.components.cover import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.restore_state import ExtraStoredData, RestoreEntity
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
@@ -16,11 +21,28 @@ from .const import (
     DOMAIN,
     DEVICE_TYPE_COVER,
     FUNC_ONOFF,
+    FUNC_BRIGHTNESS,
+    SIGNAL_DEVICE_ADDED,
 )
 from .gateway import InSonaGateway
 
 _LOGGER = logging.getLogger(__name__)
 
+# 未学习前的全程运行时间（秒）
+DEFAULT_TRAVEL_TIME = 30.0
+
+# 运动中状态写入的最小间隔
+MOVING_UPDATE_INTERVAL = timedelta(seconds=1)
+
+# 命令发出后该时间（秒）内上报目标位置视为网关回显，而非实际到位
+ECHO_WINDOW = 2.0
+
+# 超过预计运行时间的该倍数仍未收到到位上报时结束估算
+EXPIRE_FACTOR = 1.5
+
+# 学习运行时间时新样本的权重
+TRAVEL_LEARN_ALPHA = 0.3
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -31,15 +53,121 @@ async def async_setup_entry(
     
     entities = []
     
-    # 查找所有窗帘设备
-    for did, device in gateway.devices.items():
-        if device["type"] == DEVICE_TYPE_COVER:
+    # 由设备索引取出窗帘设备
+    for device in gateway.index.find(device_type=DEVICE_TYPE_COVER):
+        # 多个网关都能看到的设备只由归属网关创建实体
+        if gateway.owns_device(device["did"]):
             entities.append(InSonaCover(gateway, device))
     
     if entities:
         async_add_entities(entities)
+    
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时增量创建实体。"""
+        if device["type"] == DEVICE_TYPE_COVER and gateway.owns_device(device["did"]):
+            async_add_entities([InSonaCover(gateway, device)])
+    
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway.gateway_id), _async_device_added
+        )
+    )
+
+class CoverMotionModel:
+    """窗帘运动模型。
+
+    记录运动开始的时间、起点和目标，按学到的开/关全程时间线性估算当前位置；
+    到位时用实际耗时修正全程时间。
+    """
+
+    def __init__(self, open_time: float = DEFAULT_TRAVEL_TIME, close_time: float = DEFAULT_TRAVEL_TIME):
+        """初始化运动模型。"""
+        self.open_time = open_time
+        self.close_time = close_time
+        self.start_position: Optional[int] = None
+        self.target: Optional[int] = None
+        self.started = 0.0
+
+    @property
+    def moving(self) -> bool:
+        """是否正在运动。"""
+        return self.target is not None
+
+    @property
+    def direction(self) -> int:
+        """运动方向，1为打开，-1为关闭，0为静止。"""
+        if self.target is None or self.target == self.start_position:
+            return 0
+        return 1 if self.target > self.start_position else -1
 
-class InSonaCover(CoverEntity):
+    def _travel_time(self) -> float:
+        """当前方向的全程时间。"""
+        return self.open_time if self.direction > 0 else self.close_time
+
+    def start(self, position: int, target: int) -> None:
+        """开始向目标运动。"""
+        self.start_position = position
+        self.target = target
+        self.started = time.monotonic()
+
+    def position(self) -> Optional[int]:
+        """估算当前位置。"""
+        if self.target is None:
+            return None
+        distance = abs(self.target - self.start_position)
+        if distance == 0:
+            return self.target
+        travelled = (time.monotonic() - self.started) / self._travel_time() * 100
+        if travelled >= distance:
+            return self.target
+        return int(round(self.start_position + self.direction * travelled))
+
+    def expired(self) -> bool:
+        """超过预计时间仍未收到到位上报，放弃等待。"""
+        if self.target is None:
+            return False
+        expected = self._travel_time() * abs(self.target - self.start_position) / 100
+        return time.monotonic() - self.started > expected * EXPIRE_FACTOR + ECHO_WINDOW
+
+    def arrived(self, position: int) -> bool:
+        """处理上报的位置，到达目标时学习全程时间并结束运动。"""
+        if self.target is None:
+            return False
+        elapsed = time.monotonic() - self.started
+        distance = abs(self.target - self.start_position)
+        if position != self.target or (elapsed < ECHO_WINDOW and distance > 0):
+            return False
+        if distance >= 20:
+            sample = elapsed * 100 / distance
+            if self.direction > 0:
+                self.open_time += TRAVEL_LEARN_ALPHA * (sample - self.open_time)
+            else:
+                self.close_time += TRAVEL_LEARN_ALPHA * (sample - self.close_time)
+        self.target = None
+        return True
+
+    def stop(self) -> Optional[int]:
+        """停止运动，返回估算的停止位置。"""
+        position = self.position()
+        self.target = None
+        return position
+
+
+class CoverMotionData(ExtraStoredData):
+    """需要在重启后保留的窗帘运行时间。"""
+
+    def __init__(self, open_time: float, close_time: float):
+        """初始化。"""
+        self.open_time = open_time
+        self.close_time = close_time
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为字典。"""
+        return {"open_time": self.open_time, "close_time": self.close_time}
+
+
+class InSonaCover(CoverEntity, RestoreEntity):
     """inSona窗帘实体。"""
     
     def __init__(self, gateway: InSonaGateway, device: dict):
@@ -56,66 +184,58 @@ class InSonaCover(CoverEntity):
             CoverEntityFeature.SET_POSITION |
             CoverEntityFeature.STOP
         )
+        self._motion = CoverMotionModel()
+        self._cancel_motion_updates = None
         
-        # 设备信息
-        room_id = device.get("roomId")
-        room_name = gateway.rooms.get(room_id, "")
-        
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, self.did)},
-            name=self.name,
-            manufacturer="inSona",
-            model=f"Type {device['type']} (PID {device['pid']})",
-            via_device=(DOMAIN, f"{gateway.host}:{gateway.port}"),
-            suggested_area=room_name,
-        )
-        
-        # 注册状态更新回调
-        self._remove_status_listener = gateway.register_status_listener(
-            self.did, self._handle_status_update
+        # 设备已在启动时批量注册，实体只需携带标识挂载
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, self.did)})
+    
+    async def async_added_to_hass(self) -> None:
+        """注册回调并恢复学到的运行时间。"""
+        self.async_on_remove(
+            self.gateway.register_status_listener(self.did, self._handle_status_update)
         )
-        
-        # 注册断开连接回调
-        self._remove_disconnect_listener = gateway.register_disconnect_callback(
-            self._handle_disconnect
+        self.async_on_remove(
+            self.gateway.register_disconnect_callback(self._handle_disconnect)
         )
+        extra = await self.async_get_last_extra_data()
+        if extra is not None:
+            data = extra.as_dict()
+            self._motion.open_time = data.get("open_time", DEFAULT_TRAVEL_TIME)
+            self._motion.close_time = data.get("close_time", DEFAULT_TRAVEL_TIME)
+    
+    @property
+    def extra_restore_state_data(self) -> CoverMotionData:
+        """保存学到的运行时间。"""
+        return CoverMotionData(self._motion.open_time, self._motion.close_time)
     
     @callback
     def _handle_status_update(self) -> None:
         """处理设备状态更新。"""
+        if self._motion.moving:
+            position = self._reported_position()
+            if position is not None and self._motion.arrived(position):
+                self._stop_motion_updates()
         self.async_write_ha_state()
     
     @callback
     def _handle_disconnect(self) -> None:
         """处理网关断开连接。"""
+        self._motion.stop()
+        self._stop_motion_updates()
         self.async_write_ha_state()
         
     async def async_will_remove_from_hass(self) -> None:
         """实体从HomeAssistant移除时调用。"""
-        self._remove_status_listener()
-        self._remove_disconnect_listener()
+        self._stop_motion_updates()
     
     @property
     def available(self) -> bool:
         """设备是否可用。"""
-        return self.gateway.connected and self.device.get("alive", 0) == 1
+        return self.gateway.online and self.device.get("alive", 0) == 1
     
-    @property
-    def is_closed(self) -> Optional[bool]:
-        """窗帘是否关闭。"""
-        # 检查 func=2, value=[0] 的情况，表示窗帘关闭
-        if self.device.get("func") == FUNC_ONOFF and len(self.device["value"]) > 0 and self.device["value"][0] == 0:
-            return True
-        
-        # 根据位置判断是否关闭 (0表示全关，100表示全开)
-        if len(self.device["value"]) > 1:
-            return self.device["value"][1] == 0
-        
-        return None
-    
-    @property
-    def current_cover_position(self) -> Optional[int]:
-        """获取窗帘当前位置。"""
+    def _reported_position(self) -> Optional[int]:
+        """网关上报的窗帘位置。"""
         # 检查 func=2, value=[0] 的情况，表示窗帘关闭，位置为0
         if self.device.get("func") == FUNC_ONOFF and len(self.device["value"]) > 0 and self.device["value"][0] == 0:
             return 0
@@ -126,22 +246,92 @@ class InSonaCover(CoverEntity):
         
         return None
     
+    def _set_reported_position(self, position: int) -> None:
+        """在没有上报时按本地结果更新缓存的位置，与level状态事件的处理一致。"""
+        while len(self.device["value"]) < 2:
+            self.device["value"].append(0)
+        self.device["func"] = FUNC_BRIGHTNESS
+        self.device["value"][0] = 1
+        self.device["value"][1] = position
+    
+    @property
+    def is_closed(self) -> Optional[bool]:
+        """窗帘是否关闭。"""
+        position = self.current_cover_position
+        if position is None:
+            return None
+        return position == 0
+    
+    @property
+    def current_cover_position(self) -> Optional[int]:
+        """获取窗帘当前位置，运动中返回估算位置。"""
+        if self._motion.moving:
+            return self._motion.position()
+        return self._reported_position()
+    
+    @property
+    def is_opening(self) -> bool:
+        """窗帘是否正在打开。"""
+        return self._motion.direction > 0
+    
+    @property
+    def is_closing(self) -> bool:
+        """窗帘是否正在关闭。"""
+        return self._motion.direction < 0
+    
     async def async_open_cover(self, **kwargs: Any) -> None:
         """打开窗帘。"""
-        await self.gateway.control_device(self.did, "level", [100])
+        await self._async_move_to(100)
     
     async def async_close_cover(self, **kwargs: Any) -> None:
         """关闭窗帘。"""
-        await self.gateway.control_device(self.did, "level", [0])
+        await self._async_move_to(0)
     
     async def async_stop_cover(self, **kwargs: Any) -> None:
         """停止窗帘。"""
-        # 发送停止命令，保持当前位置
-        if len(self.device["value"]) > 1:
-            current_position = self.device["value"][1]
-            await self.gateway.control_device(self.did, "curtainstop", [current_position])
+        # 发送停止命令，使用估算的当前位置
+        position = self._motion.stop() if self._motion.moving else self._reported_position()
+        self._stop_motion_updates()
+        if position is None:
+            return
+        await self.gateway.control_device(self.did, "curtainstop", [position])
+        self._set_reported_position(position)
+        self.async_write_ha_state()
     
     async def async_set_cover_position(self, **kwargs: Any) -> None:
         """设置窗帘位置。"""
         position = kwargs.get("position", 0)
-        await self.gateway.control_device(self.did, "level", [position]) 
\ No newline at end of file
+        await self._async_move_to(position)
+    
+    async def _async_move_to(self, target: int) -> None:
+        """下发位置命令并开始估算运动。"""
+        if not await self.gateway.control_device(self.did, "level", [target]):
+            return
+        if self.gateway.is_buffered(self.did):
+            # 命令只是缓冲待重连后重放，窗帘尚未开始运动
+            return
+        position = self.current_cover_position
+        if position is None or position == target:
+            return
+        self._motion.start(position, target)
+        if self._cancel_motion_updates is None:
+            self._cancel_motion_updates = async_track_time_interval(
+                self.hass, self._handle_motion_tick, MOVING_UPDATE_INTERVAL
+            )
+        self.async_write_ha_state()
+    
+    @callback
+    def _handle_motion_tick(self, _now: Any) -> None:
+        """运动中按固定间隔写入估算位置。"""
+        if self._motion.expired():
+            # 超时仍未收到到位上报，窗帘可能受阻停在途中，回退到最后上报的位置
+            self._motion.stop()
+            self._stop_motion_updates()
+        self.async_write_ha_state()
+    
+    @callback
+    def _stop_motion_updates(self) -> None:
+        """停止运动中的定时写入。"""
+        if self._cancel_motion_updates is not None:
+            self._cancel_motion_updates()
+            self._cancel_motion_updates = None
@@ -0,0 +1,159 @@
+"""inSona设备表的二级索引。"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from .const import (
+    DEVICE_TYPE_LIGHT,
+    DEVICE_TYPE_PANEL,
+    FUNC_ONOFF,
+    FUNC_BRIGHTNESS,
+    FUNC_CTL,
+    FUNC_HSL,
+    FUNC_PANEL,
+    FUNC_SENSOR,
+    SENSOR_KINDS,
+)
+
+# 灯具能力类别，每个灯具只属于其中一类
+CAP_ONOFF = "onoff"
+CAP_DIMMABLE = "dimmable"
+CAP_CT = "ct"
+CAP_RGB = "rgb"
+CAP_DUAL = "dual"  # 同时支持色温和RGB
+
+# 其他能力
+CAP_PANEL = "panel"  # 面板按键
+CAP_MOTION = "motion"  # 人体感应，温湿度等读数传感器同样带有传感器功能，不属于此类
+
+
+def light_capability(device: Dict[str, Any]) -> Optional[str]:
+    """根据功能列表判断灯具的能力类别，与灯光实体类一一对应。"""
+    if device["type"] != DEVICE_TYPE_LIGHT:
+        return None
+    funcs = device.get("funcs", [])
+    if FUNC_CTL in funcs and FUNC_HSL in funcs:
+        return CAP_DUAL
+    if FUNC_HSL in funcs:
+        return CAP_RGB
+    if FUNC_CTL in funcs:
+        return CAP_CT
+    if FUNC_BRIGHTNESS in funcs:
+        return CAP_DIMMABLE
+    if FUNC_ONOFF in funcs:
+        return CAP_ONOFF
+    return None
+
+
+def capabilities(device: Dict[str, Any]) -> Tuple[str, ...]:
+    """设备的全部能力。"""
+    caps = []
+    light = light_capability(device)
+    if light is not None:
+        caps.append(light)
+    funcs = device.get("funcs", [])
+    if device["type"] == DEVICE_TYPE_PANEL or FUNC_PANEL in funcs:
+        caps.append(CAP_PANEL)
+    if FUNC_SENSOR in funcs and device.get("sensorType") not in SENSOR_KINDS:
+        caps.append(CAP_MOTION)
+    return tuple(caps)
+
+
+class DeviceIndex:
+    """按类型、能力和房间索引网关的设备表。
+
+    设备新增、变化和移除时增量更新，能力只在功能列表变化时重新判断。
+    每个索引项是以did为键的字典，保持设备加入的顺序；按条件查找时只遍历
+    最小的索引项，耗时与结果数相当，而不是与设备总数相当。
+    """
+
+    def __init__(self, devices: Dict[str, Dict[str, Any]]) -> None:
+        """初始化索引，devices为网关的设备表。"""
+        self._devices = devices
+        self._by_type: Dict[Any, Dict[str, None]] = {}
+        self._by_capability: Dict[str, Dict[str, None]] = {}
+        self._by_room: Dict[Any, Dict[str, None]] = {}
+        # did -> (类型, 能力, 房间)，用于移除和判断是否需要重新索引
+        self._keys: Dict[str, Tuple[Any, Tuple[str, ...], Any]] = {}
+
+    def __len__(self) -> int:
+        """已索引的设备数。"""
+        return len(self._keys)
+
+    def add(self, device: Dict[str, Any]) -> None:
+        """索引一个设备。"""
+        did = device["did"]
+        keys = (device["type"], capabilities(device), device.get("roomId"))
+        self._keys[did] = keys
+        self._by_type.setdefault(keys[0], {})[did] = None
+        for cap in keys[1]:
+            self._by_capability.setdefault(cap, {})[did] = None
+        self._by_room.setdefault(keys[2], {})[did] = None
+
+    def update(self, device: Dict[str, Any]) -> None:
+        """设备信息变化，类型、功能或房间改变时重新索引。"""
+        keys = self._keys.get(device["did"])
+        if keys is None or keys[0] != device["type"] or keys[2] != device.get("roomId") or (
+            keys[1] != capabilities(device)
+        ):
+            self.remove(device["did"])
+            self.add(device)
+
+    def remove(self, did: str) -> None:
+        """移除一个设备。"""
+        keys = self._keys.pop(did, None)
+        if keys is None:
+            return
+        _discard(self._by_type, keys[0], did)
+        for cap in keys[1]:
+            _discard(self._by_capability, cap, did)
+        _discard(self._by_room, keys[2], did)
+
+    def find(
+        self,
+        device_type: Optional[int] = None,
+        capability: Optional[str] = None,
+        room_id: Optional[Any] = None,
+    ) -> List[Dict[str, Any]]:
+        """按类型、能力和房间查找设备，多个条件同时满足，不指定条件时返回全部设备。"""
+        buckets = []
+        if device_type is not None:
+            buckets.append(self._by_type.get(device_type, {}))
+        if capability is not None:
+            buckets.append(self._by_capability.get(capability, {}))
+        if room_id is not None:
+            buckets.append(self._by_room.get(room_id, {}))
+        if not buckets:
+            return list(self._devices.values())
+        buckets.sort(key=len)
+        first, rest = buckets[0], buckets[1:]
+        return [
+            self._devices[did]
+            for did in first
+            if all(did in bucket for bucket in rest)
+        ]
+
+    def count(self, device_type: Optional[int] = None, capability: Optional[str] = None) -> int:
+        """某类型或某能力的设备数。"""
+        if device_type is not None:
+            return len(self._by_type.get(device_type, {}))
+        if capability is not None:
+            return len(self._by_capability.get(capability, {}))
+        return len(self._keys)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出各索引项的设备数，用于诊断信息。"""
+        return {
+            "devices": len(self._keys),
+            "by_type": {str(key): len(dids) for key, dids in self._by_type.items()},
+            "by_capability": {key: len(dids) for key, dids in self._by_capability.items()},
+            "by_room": {str(key): len(dids) for key, dids in self._by_room.items()},
+        }
+
+
+def _discard(index: Dict[Any, Dict[str, None]], key: Any, did: str) -> None:
+    """从索引项中移除设备，索引项为空时一并删除。"""
+    dids = index.get(key)
+    if dids is None:
+        return
+    dids.pop(did, None)
+    if not dids:
+        del index[key]
\ No newline at end of file
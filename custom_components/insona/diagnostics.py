@@ -0,0 +1,42 @@
+"""inSona网关诊断信息。"""
+from typing import Any, Dict
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_HUB
+from .resources import process_rss_kb
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """返回配置项的诊断信息。"""
+    gateway = hass.data[DOMAIN][entry.entry_id]
+    hub = hass.data.get(DATA_HUB)
+
+    return {
+        "gateway": {
+            "id": gateway.gateway_id,
+            "connected": gateway.connected,
+            "online": gateway.online,
+            "devices": len(gateway.devices),
+            "rooms": len(gateway.rooms),
+            "scenes": len(gateway.scenes),
+        },
+        "index": gateway.index.as_dict(),
+        "metrics": gateway.metrics.as_dict(),
+        "offline_buffer": gateway.offline.as_dict(),
+        "write_filter": gateway.write_filter.as_dict(),
+        "scenes": gateway.scene_learner.as_dict(),
+        "liveness": gateway.liveness.as_dict(),
+        "latency": gateway.latency.as_dict(),
+        "history": gateway.history.as_dict(),
+        "resources": {
+            **gateway.resources(),
+            "rss_kb": await hass.async_add_executor_job(process_rss_kb),
+        },
+        "hub": hub.as_dict() if hub is not None else None,
+        "proxy": gateway.proxy.as_dict() if gateway.proxy is not None else None,
+        "circadian": gateway.circadian.as_dict() if gateway.circadian is not None else None,
+    }
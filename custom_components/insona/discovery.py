@@ -0,0 +1,120 @@
+"""inSona网关局域网发现。"""
+import asyncio
+import ipaddress
+import json
+import logging
+from typing import Collection, Iterable, List, Tuple
+
+from homeassistant.components import network
+from homeassistant.core import HomeAssistant
+
+from .const import DEFAULT_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+# 同时探测的最大主机数
+PROBE_CONCURRENCY = 256
+
+# 建立TCP连接的超时时间（秒）
+CONNECT_TIMEOUT = 0.4
+
+# 等待握手响应的超时时间（秒）
+HANDSHAKE_TIMEOUT = 1.5
+
+# 单个网段最多探测的地址数，更大的网段只探测本机所在的/24
+MAX_HOSTS_PER_NETWORK = 1024
+
+# 握手只读取响应的开头，确认方法名后立即断开，不下载完整的场景列表
+HANDSHAKE_READ_LIMIT = 4096
+
+_HANDSHAKE = (json.dumps({"version": 1, "uuid": 1, "method": "c.query.scene"}) + "\r\n").encode("utf-8")
+
+
+async def async_local_networks(hass: HomeAssistant) -> List[ipaddress.IPv4Network]:
+    """返回已启用网卡所在的IPv4网段。"""
+    networks = []
+    for adapter in await network.async_get_adapters(hass):
+        if not adapter["enabled"]:
+            continue
+        for ip_info in adapter["ipv4"]:
+            address = ipaddress.IPv4Address(ip_info["address"])
+            if address.is_loopback or address.is_link_local:
+                continue
+            subnet = ipaddress.IPv4Network(f"{address}/{ip_info['network_prefix']}", strict=False)
+            if subnet.num_addresses > MAX_HOSTS_PER_NETWORK:
+                subnet = ipaddress.IPv4Network(f"{address}/24", strict=False)
+            if subnet not in networks:
+                networks.append(subnet)
+    return networks
+
+
+def parse_networks(text: str) -> List[ipaddress.IPv4Network]:
+    """解析逗号或空格分隔的网段，单个地址视为其所在的/24。"""
+    networks = []
+    for item in text.replace(",", " ").split():
+        if "/" not in item:
+            item = f"{item}/24"
+        subnet = ipaddress.IPv4Network(item, strict=False)
+        if subnet.num_addresses > MAX_HOSTS_PER_NETWORK:
+            raise ValueError(f"网段 {subnet} 过大")
+        if subnet not in networks:
+            networks.append(subnet)
+    return networks
+
+
+async def async_probe(host: str, port: int = DEFAULT_PORT) -> bool:
+    """探测主机是否为inSona网关。"""
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+    try:
+        writer.write(_HANDSHAKE)
+        await writer.drain()
+        received = b""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + HANDSHAKE_TIMEOUT
+        # 响应前可能夹杂事件帧，读到场景查询响应的方法名即可确认
+        while b"s.query.scene" not in received and len(received) < HANDSHAKE_READ_LIMIT:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            chunk = await asyncio.wait_for(reader.read(HANDSHAKE_READ_LIMIT), remaining)
+            if not chunk:
+                return False
+            received += chunk
+        return b"s.query.scene" in received
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+async def async_discover(
+    networks: Iterable[ipaddress.IPv4Network],
+    port: int = DEFAULT_PORT,
+    exclude: Collection[str] = (),
+) -> List[Tuple[str, int]]:
+    """并发探测网段内的所有主机，返回确认为网关的(host, port)；exclude中的主机不探测。"""
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+    hosts = [
+        host
+        for host in dict.fromkeys(str(host) for subnet in networks for host in subnet.hosts())
+        if host not in exclude
+    ]
+
+    async def _probe(host: str) -> bool:
+        async with semaphore:
+            return await async_probe(host, port)
+
+    results = await asyncio.gather(*(_probe(host) for host in hosts))
+    found = [(host, port) for host, ok in zip(hosts, results) if ok]
+    _LOGGER.debug("探测了 %d 个地址，发现 %d 个inSona网关", len(hosts), len(found))
+    return found
\ No newline at end of file
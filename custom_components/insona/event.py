@@ -0,0 +1,104 @@
+"""inSona网关面板按键事件平台。"""
+import logging
+from typing import List
+
+from homeassistant.components.event import EventEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import (
+    DOMAIN,
+    DEVICE_TYPE_PANEL,
+    FUNC_PANEL,
+    SIGNAL_DEVICE_ADDED,
+)
+from .device_index import CAP_PANEL
+from .gateway import InSonaGateway
+
+_LOGGER = logging.getLogger(__name__)
+
+# 面板按键事件类型，按键编号和动作放在事件属性中
+EVENT_TYPE_KEY = "key"
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """设置inSona面板按键事件实体。"""
+    gateway = hass.data[DOMAIN][entry.entry_id]
+
+    entities = [
+        InSonaPanelEvent(gateway, device)
+        for device in gateway.index.find(capability=CAP_PANEL)
+        if gateway.owns_device(device["did"])
+    ]
+
+    if entities:
+        async_add_entities(entities)
+
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时增量创建实体。"""
+        if _is_panel(gateway, device):
+            async_add_entities([InSonaPanelEvent(gateway, device)])
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway.gateway_id), _async_device_added
+        )
+    )
+
+
+def _is_panel(gateway: InSonaGateway, device: dict) -> bool:
+    """设备是否为面板。"""
+    if not gateway.owns_device(device["did"]):
+        return False
+    return device["type"] == DEVICE_TYPE_PANEL or FUNC_PANEL in device.get("funcs", [])
+
+
+class InSonaPanelEvent(EventEntity):
+    """inSona面板按键事件实体。"""
+
+    _attr_should_poll = False
+    _attr_event_types = [EVENT_TYPE_KEY]
+
+    def __init__(self, gateway: InSonaGateway, device: dict):
+        """初始化面板事件实体。"""
+        self.gateway = gateway
+        self.device = device
+        self.did = device["did"]
+        self._attr_unique_id = f"{DOMAIN}_{self.did}"
+        self._attr_name = device["name"]
+
+        # 设备已在启动时批量注册，实体只需携带标识挂载
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, self.did)})
+
+    async def async_added_to_hass(self) -> None:
+        """实体加入HomeAssistant时注册按键回调，移除时自动注销。"""
+        self.async_on_remove(
+            self.gateway.register_event_listener(self.did, self._handle_event)
+        )
+        self.async_on_remove(
+            self.gateway.register_disconnect_callback(self.async_write_ha_state)
+        )
+
+    @property
+    def available(self) -> bool:
+        """设备是否可用。"""
+        return self.gateway.online and self.device.get("alive", 0) == 1
+
+    @callback
+    def _handle_event(self, evt: str, value: List[int]) -> None:
+        """处理面板按键事件，value为[按键编号, 动作]。"""
+        if not value:
+            return
+        self._trigger_event(
+            EVENT_TYPE_KEY,
+            {"key": value[0], "action": value[1] if len(value) > 1 else None},
+        )
+        self.async_write_ha_state()
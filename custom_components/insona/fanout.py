@@ -0,0 +1,69 @@
+"""inSona多设备下发：房间组地址和起始偏差测量。"""
+import asyncio
+from typing import Any, Dict, Iterable, Optional
+
+# 下发后等待状态反馈的最长时间（秒），超时后按已收到的反馈计算偏差
+FANOUT_WINDOW = 5.0
+
+
+def parse_groups(text: str) -> Dict[int, str]:
+    """解析“房间ID=组地址”列表，逗号或空格分隔。"""
+    groups = {}
+    for item in text.replace(",", " ").split():
+        room_id, sep, address = item.partition("=")
+        if not sep or not address:
+            raise ValueError(f"无效的房间组地址 {item}")
+        groups[int(room_id)] = address
+    return groups
+
+
+class FanoutProbe:
+    """测量一次多设备下发中各设备开始执行的时间偏差。
+
+    以同一次写入中的设备为一组，记录每个设备下发后收到的第一条状态事件的时间，
+    最早与最晚之差即为起始偏差。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, dids: Iterable[str], sent_at: float) -> None:
+        """初始化测量。"""
+        self.sent_at = sent_at
+        self._pending = set(dids)
+        self.size = len(self._pending)
+        self._first_status: Dict[str, float] = {}
+        self.future = loop.create_future()
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+    def observe(self, did: str, received_at: float) -> bool:
+        """记录设备的第一条状态事件，所有设备都已反馈时返回True。"""
+        if did in self._pending:
+            self._pending.discard(did)
+            self._first_status[did] = received_at
+        return not self._pending
+
+    def start_ms(self, did: str) -> Optional[float]:
+        """设备收到第一条状态事件相对下发时刻的毫秒数。"""
+        received_at = self._first_status.get(did)
+        return None if received_at is None else round((received_at - self.sent_at) * 1000, 1)
+
+    def finish(self) -> Dict[str, Any]:
+        """结束测量并返回结果。"""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        result = self.result()
+        if not self.future.done():
+            self.future.set_result(result)
+        return result
+
+    def result(self) -> Dict[str, Any]:
+        """计算起始偏差，时间均为相对下发时刻的毫秒数。"""
+        times = sorted(self._first_status.values())
+        if not times:
+            return {"devices": self.size, "observed": 0, "skew_ms": None, "first_ms": None, "last_ms": None}
+        return {
+            "devices": self.size,
+            "observed": len(times),
+            "skew_ms": round((times[-1] - times[0]) * 1000, 1),
+            "first_ms": round((times[0] - self.sent_at) * 1000, 1),
+            "last_ms": round((times[-1] - self.sent_at) * 1000, 1),
+        }
\ No newline at end of file
@@ -1,33 +1,107 @@
 """inSona网关通信类。"""
 import asyncio
+import itertools
 import json
 import logging
-import random
+import time
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
 
 from .const import (
     DEVICE_TYPE_LIGHT,
     DEVICE_TYPE_COVER,
-    DEVICE_TYPE_PANEL,
     DEVICE_TYPE_SENSOR,
     FUNC_ONOFF,
     FUNC_BRIGHTNESS,
     FUNC_CTL,
     FUNC_HSL,
-    FUNC_PANEL,
-    ACTION_ONOFF,
-    ACTION_LEVEL,
-    ACTION_CTL,
-    ACTION_HSL,
+    FUNC_SENSOR,
+    EVT_STATUS,
+    EVT_SENSOR,
+    EVT_SWITCH_KEY,
+    EVT_MESHCHANGE,
+    EVENT_INSONA,
+    SIGNAL_DEVICE_ADDED,
+    SIGNAL_DEVICE_REMOVED,
+    SIGNAL_SCENE_ADDED,
+    SIGNAL_SCENE_REMOVED,
 )
+from .device_index import DeviceIndex
+from .fanout import FANOUT_WINDOW, FanoutProbe
+from .history import StateHistory
+from .latency import STATUS_WINDOW, LatencyProfiler
+from .metrics import GatewayMetrics
+from .offline import OfflineCommandBuffer
+from .stream import FRAME, FRAME_DELIMITER, ITEM, FrameParser
+from .write_filter import RedundantCommandFilter
 
 # 场景相关常量
 SCENE_ACTION = "scene"
 
+# 等待控制确认的最长时间（秒），超时的记录会被清理
+ACK_TIMEOUT = 30.0
+
+# meshchange事件后等待该时间（秒）再同步，合并连续的拓扑变化
+MESHCHANGE_DEBOUNCE = 2.0
+
+# 批量控制等待确认的默认时间（秒）
+BULK_ACK_TIMEOUT = 5.0
+
+# 断线重连的退避间隔（秒）
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+# 按键事件后该时间（秒）内的第一条控制命令视为由自动化触发
+KEY_COMMAND_WINDOW = 5.0
+
+# 超过该大小（字节）的帧在线程池中解码，避免阻塞事件循环
+LARGE_FRAME_THRESHOLD = 64 * 1024
+
+# 每次从连接读取的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 走快速通道分发的事件类型
+FAST_EVENTS = (EVT_SENSOR, EVT_SWITCH_KEY)
+
+# 标记帧中的设备已在解码时完成规范化
+NORMALIZED_KEY = "_normalized"
+
 _LOGGER = logging.getLogger(__name__)
 
+
+def normalize_device(device: dict) -> dict:
+    """根据设备当前func补齐value数组长度。"""
+    func = device.get("func", 0)
+    length = len(device.get("value", []))
+    
+    # 确保value数组长度足够
+    if func == FUNC_ONOFF:  # 开关功能
+        if length < 1:
+            device["value"] = [0]
+    elif func == FUNC_BRIGHTNESS:  # 亮度功能
+        if length < 2:
+            device["value"] = [0, 0]
+    elif func == FUNC_CTL:  # 亮度色温功能
+        if length < 3:
+            device["value"] = [0, 0, 50]
+    elif func == FUNC_HSL:  # HSL功能
+        if length < 4:
+            device["value"] = [0, 0, 0, 100]
+    return device
+
+
+def decode_large_frame(data: bytes) -> dict:
+    """解码大帧并规范化其中的设备，在线程池中运行。"""
+    response = json.loads(data)
+    if response.get("method") == "s.query":
+        for device in response.get("devices", []):
+            normalize_device(device)
+        response[NORMALIZED_KEY] = True
+    return response
+
 class InSonaGateway:
     """inSona网关通信类。"""
 
@@ -41,14 +115,85 @@ class InSonaGateway:
         self.connected = False
         
         self.devices = {}
+        self.index = DeviceIndex(self.devices)  # 按类型、能力和房间的设备索引
         self.rooms = {}
         self.scenes = {}  # 添加场景列表
         self.status_listeners = {}
+        self.event_listeners = {}  # did -> 传感器/面板事件回调
+        self.bindings = None  # 面板按键本地绑定表
+        self.scene_learner = None  # 场景成员学习器
+        self.liveness = None  # 设备在线状态跟踪
+        self.circadian = None  # 昼夜节律色温调整，未启用时为None
+        self.proxy = None  # 下游客户端代理，未启用时为None
+        self.room_groups: Dict[int, str] = {}  # 房间ID -> 网关中配置的组地址
+        self.platforms = set()  # 已加载的HA平台
+        self.offline = OfflineCommandBuffer()  # 断线期间的控制命令缓冲
+        self._reconnect_task = None
+        self._outage_started = None
+        self._cancel_grace = None
+        self._last_key_event_at = None  # 未命中绑定的最近一次按键时间，用于对比自动化链路延迟
         self._disconnect_callbacks = set()
         self._read_task = None
         self._event_task = None
         self._response_queue = asyncio.Queue()  # 添加响应队列
         self._waiting_commands = {}  # 存储等待响应的命令
+        self._pending_acks = {}  # uuid -> (did, 发送时间)，用于统计控制确认延迟
+        self._ack_waiters = {}  # uuid -> 批量控制中等待确认的future
+        self._write_buffer = []  # 同一轮事件循环内待写出的帧
+        self._write_dids = []  # 待写出帧中的控制目标
+        self._flush_future = None
+        self._drain_tasks: Set[asyncio.Task] = set()  # 等待写出完成的任务
+        self._fanout_probes = set()  # 正在测量起始偏差的多设备下发
+        self._topology_task = None  # 进行中的拓扑同步
+        self._cancel_topology_sync = None
+        self._topology_resync = False  # 同步进行中又收到拓扑变化，结束后需要再同步一次
+        self._uuid_counter = itertools.count(1000)
+        self._hub = None
+        self.metrics = GatewayMetrics()
+        self.latency = LatencyProfiler()  # 按设备的控制延迟统计
+        self.history = StateHistory()  # 按设备的最近状态事件
+        self.write_filter = RedundantCommandFilter()  # 跳过目标状态已确认一致的命令
+        self._awaiting_status = {}  # did -> 最近一次控制命令的发送时间，等待状态事件
+        # 本轮同步中已出现的设备和场景，同步完成时据此找出被移除的部分
+        self._synced_devices = set()
+        self._synced_scenes = set()
+
+    @property
+    def gateway_id(self) -> str:
+        """网关唯一标识。"""
+        return f"{self.host}:{self.port}"
+
+    def attach_hub(self, hub) -> None:
+        """接入多网关调度中心，由其共享分发任务处理本网关的帧。"""
+        self._hub = hub
+        hub.add_gateway(self)
+
+    @property
+    def online(self) -> bool:
+        """网关是否可用；短暂断线期间命令会被缓冲，在命令有效期内仍视为可用。"""
+        if self.connected:
+            return True
+        return (
+            self._outage_started is not None
+            and time.monotonic() - self._outage_started < self.offline.ttl
+        )
+
+    def owns_device(self, did: str) -> bool:
+        """设备实体是否应由本网关创建（多网关时去重）。"""
+        return self._hub is None or self._hub.owner(did) in (None, self.gateway_id)
+
+    def is_buffered(self, did: str) -> bool:
+        """设备是否有断线期间缓冲、尚未下发的控制命令。"""
+        gateways = self._hub.gateways.values() if self._hub is not None else (self,)
+        return any(did in gateway.offline for gateway in gateways)
+
+    def _new_uuid(self) -> int:
+        """生成请求uuid，保证短时间内不重复。"""
+        uuid = next(self._uuid_counter)
+        if uuid > 65535:
+            self._uuid_counter = itertools.count(1000)
+            uuid = next(self._uuid_counter)
+        return uuid
         
     async def connect(self) -> None:
         """连接到inSona网关。"""
@@ -56,15 +201,16 @@ class InSonaGateway:
             return
             
         try:
-            # 增加缓冲区大小到 1MB
+            # 帧由增量解析器切分，不再受流缓冲区大小限制
             self.reader, self.writer = await asyncio.open_connection(
-                self.host, self.port, limit=1024*1024
+                self.host, self.port
             )
             self.connected = True
             
-            # 先启动读取任务，再启动事件处理任务
+            # 先启动读取任务，再启动事件处理任务；接入调度中心时由其统一分发
             self._read_task = asyncio.create_task(self._read_data_task())
-            self._event_task = asyncio.create_task(self._event_listener())
+            if self._hub is None:
+                self._event_task = asyncio.create_task(self._event_listener())
             
             _LOGGER.info("已连接到inSona网关 %s:%s", self.host, self.port)
         except Exception as err:
@@ -74,6 +220,11 @@ class InSonaGateway:
     
     async def disconnect(self) -> None:
         """断开连接。"""
+        await self._async_cancel_reconnect()
+        await self._async_cancel_topology_sync()
+        self._cancel_drains()
+        for probe in list(self._fanout_probes):
+            self._finish_fanout(probe)
         if not self.connected:
             return
             
@@ -105,67 +256,338 @@ class InSonaGateway:
                 pass
             self.writer = None
             self.reader = None
+        self._fail_pending()
         
         _LOGGER.info("已断开与inSona网关的连接")
         
         # 调用所有断开回调
-        for callback_func in self._disconnect_callbacks:
-            callback_func()
+        self._notify_connection_state()
     
+    @callback
+    def _handle_connection_lost(self) -> None:
+        """连接意外断开：清理连接并在后台重连，期间的控制命令进入缓冲。"""
+        self.connected = False
+        self._read_task = None
+        if self._event_task is not None:
+            self._event_task.cancel()
+            self._event_task = None
+        self._cancel_drains()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+        self._fail_pending()
+        # 断线期间设备状态可能被其他方式改变
+        self.write_filter.forget()
+        
+        self._outage_started = time.monotonic()
+        self._cancel_grace = async_call_later(
+            self.hass, self.offline.ttl, self._handle_grace_expired
+        )
+        self._notify_connection_state()
+        self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    @callback
+    def _handle_grace_expired(self, _now: Any) -> None:
+        """断线超过命令有效期，实体变为不可用。"""
+        self._cancel_grace = None
+        self._notify_connection_state()
+
+    @callback
+    def _notify_connection_state(self) -> None:
+        """通知连接状态变化。"""
+        for callback_func in list(self._disconnect_callbacks):
+            callback_func()
+
+    async def _reconnect_loop(self) -> None:
+        """按退避间隔重连，重连后重新同步并重放缓冲的命令。"""
+        delay = RECONNECT_MIN_DELAY
+        while not self.connected:
+            try:
+                await self.connect()
+            except Exception:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        
+        _LOGGER.info("已重新连接inSona网关 %s，开始同步", self.gateway_id)
+        self._outage_started = None
+        if self._cancel_grace is not None:
+            self._cancel_grace()
+            self._cancel_grace = None
+        self._reconnect_task = None
+        
+        await self.async_sync_topology()
+        await self._async_replay_offline()
+        self._notify_connection_state()
+
+    async def _async_replay_offline(self) -> None:
+        """重放断线期间缓冲的、仍在有效期内的最终状态。"""
+        commands = self.offline.drain()
+        for did, action, value, transition in commands:
+            if did in self.devices and await self._async_control(did, action, value, transition):
+                self.offline.replayed += 1
+        if commands:
+            _LOGGER.info("重放了 %d 条断线期间的控制命令", len(commands))
+
+    async def _async_cancel_reconnect(self) -> None:
+        """取消后台重连。"""
+        if self._cancel_grace is not None:
+            self._cancel_grace()
+            self._cancel_grace = None
+        self._outage_started = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+
+    @callback
+    def _fail_pending(self) -> None:
+        """连接断开时结束所有等待中的请求，避免future和记录悬挂。"""
+        for _, future in self._waiting_commands.values():
+            if not future.done():
+                future.set_exception(ConnectionError("网关连接已断开"))
+        self._waiting_commands.clear()
+        for future in self._ack_waiters.values():
+            future.cancel()
+        self._ack_waiters.clear()
+        self._pending_acks.clear()
+        self._awaiting_status.clear()
+
+    @callback
+    def _schedule_topology_sync(self) -> None:
+        """去抖地安排一次拓扑同步，同步进行中再次触发时在结束后补一次。"""
+        if self._cancel_topology_sync is not None:
+            return
+        if self._topology_task is not None:
+            self._topology_resync = True
+            return
+        self._cancel_topology_sync = async_call_later(
+            self.hass, MESHCHANGE_DEBOUNCE, self._start_topology_sync
+        )
+
+    @callback
+    def _start_topology_sync(self, _now: Any) -> None:
+        """开始拓扑同步任务。"""
+        self._cancel_topology_sync = None
+        self._topology_task = self.hass.async_create_task(self._async_topology_task())
+
+    async def _async_topology_task(self) -> None:
+        """执行拓扑同步。"""
+        try:
+            await self.async_sync_topology()
+        finally:
+            self._topology_task = None
+        if self._topology_resync:
+            self._topology_resync = False
+            self._schedule_topology_sync()
+
+    async def _async_cancel_topology_sync(self) -> None:
+        """取消等待中和进行中的拓扑同步。"""
+        self._topology_resync = False
+        if self._cancel_topology_sync is not None:
+            self._cancel_topology_sync()
+            self._cancel_topology_sync = None
+        if self._topology_task is not None:
+            self._topology_task.cancel()
+            try:
+                await self._topology_task
+            except asyncio.CancelledError:
+                pass
+            self._topology_task = None
+
+    def resources(self) -> Dict[str, int]:
+        """统计回调和等待中的请求数，用于发现泄漏。"""
+        return {
+            "status_listeners": sum(len(listeners) for listeners in self.status_listeners.values()),
+            "event_listeners": sum(len(listeners) for listeners in self.event_listeners.values()),
+            "disconnect_callbacks": len(self._disconnect_callbacks),
+            "waiting_commands": len(self._waiting_commands),
+            "pending_acks": len(self._pending_acks),
+            "ack_waiters": len(self._ack_waiters),
+            "awaiting_status": len(self._awaiting_status),
+            "fanout_probes": len(self._fanout_probes),
+        }
+
     def register_disconnect_callback(self, callback_func: Callable[[], None]) -> Callable[[], None]:
         """注册断开连接的回调函数。"""
         self._disconnect_callbacks.add(callback_func)
         
         def remove_callback() -> None:
-            self._disconnect_callbacks.remove(callback_func)
+            self._disconnect_callbacks.discard(callback_func)
             
         return remove_callback
     
     async def _send_command(self, command: dict) -> None:
         """发送命令到网关。"""
+        await self._write_frames((json.dumps(command) + "\r\n").encode("utf-8"))
+    
+    async def _write_frames(
+        self, data: bytes, count: int = 1, dids: Tuple[str, ...] = ()
+    ) -> Optional[FanoutProbe]:
+        """写入一段已编码的帧。
+
+        同一轮事件循环内的所有写入合并为一次写出并共用一次drain，
+        多个设备同时控制时控制帧成组到达网关；写出多个控制目标时返回起始偏差测量。
+        """
         if not self.connected:
+            if self._reconnect_task is not None:
+                raise ConnectionError("网关正在重连")
             await self.connect()
-            
-        cmd_str = json.dumps(command) + "\r\n"
-        self.writer.write(cmd_str.encode("utf-8"))
-        await self.writer.drain()
+        
+        self._write_buffer.append(data)
+        self._write_dids.extend(dids)
+        self.metrics.commands_sent += count
+        if self._flush_future is None:
+            loop = asyncio.get_running_loop()
+            self._flush_future = loop.create_future()
+            loop.call_soon(self._flush_writes)
+        return await asyncio.shield(self._flush_future)
+    
+    @callback
+    def _flush_writes(self) -> None:
+        """把本轮累积的帧一次写出。"""
+        future = self._flush_future
+        self._flush_future = None
+        data = b"".join(self._write_buffer)
+        dids = self._write_dids
+        self._write_buffer = []
+        self._write_dids = []
+        
+        try:
+            if self.writer is None:
+                raise ConnectionError("网关连接已关闭")
+            self.writer.write(data)
+        except Exception as err:
+            future.set_exception(err)
+            future.exception()
+            return
+        self.metrics.write_flushed(len(data))
+        
+        probe = None
+        if len(set(dids)) > 1:
+            loop = asyncio.get_running_loop()
+            probe = FanoutProbe(loop, dids, time.monotonic())
+            probe.handle = loop.call_later(FANOUT_WINDOW, self._finish_fanout, probe)
+            self._fanout_probes.add(probe)
+        task = asyncio.create_task(self._async_drain(self.writer, future, probe))
+        self._drain_tasks.add(task)
+        task.add_done_callback(self._drain_tasks.discard)
+    
+    async def _async_drain(
+        self, writer: asyncio.StreamWriter, future: asyncio.Future, probe: Optional[FanoutProbe]
+    ) -> None:
+        """等待写出完成，通知所有写入方。"""
+        try:
+            await writer.drain()
+        except asyncio.CancelledError:
+            if not future.done():
+                future.set_exception(ConnectionError("网关连接已关闭"))
+                future.exception()
+            raise
+        except Exception as err:
+            if not future.done():
+                future.set_exception(err)
+                # 写入方可能已被取消，避免未读取异常的警告
+                future.exception()
+            return
+        if not future.done():
+            future.set_result(probe)
+    
+    @callback
+    def _cancel_drains(self) -> None:
+        """连接关闭时取消等待写出的任务，写入方收到连接错误。"""
+        for task in list(self._drain_tasks):
+            task.cancel()
+        self._drain_tasks.clear()
+    
+    @callback
+    def _observe_fanout(self, did: str) -> None:
+        """记录多设备下发后设备的第一条状态事件。"""
+        received_at = time.monotonic()
+        for probe in list(self._fanout_probes):
+            if probe.observe(did, received_at):
+                self._finish_fanout(probe)
+    
+    @callback
+    def _finish_fanout(self, probe: FanoutProbe) -> None:
+        """结束一次起始偏差测量并记录指标。"""
+        self._fanout_probes.discard(probe)
+        result = probe.finish()
+        if result["observed"] > 1:
+            self.metrics.fanout_measured(result["skew_ms"])
+            _LOGGER.debug("多设备下发起始偏差: %s", result)
     
     async def _read_data_task(self) -> None:
         """持续读取网关数据的任务。"""
+        parser = FrameParser()
         while self.connected and self.reader is not None:
             try:
-                data = await self.reader.readuntil(b"\r\n")
-                response = json.loads(data.decode("utf-8"))
+                chunk = await self.reader.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise ConnectionResetError("网关关闭了连接")
+                received_at = time.perf_counter()
                 
-                # 将响应放入队列
-                await self._response_queue.put(response)
-            except asyncio.LimitOverrunError as err:
-                _LOGGER.error("读取数据超出缓冲区限制: %s", err)
-                # 尝试读取剩余数据以清空缓冲区
-                try:
-                    await self.reader.readexactly(err.consumed)
-                except Exception as e:
-                    _LOGGER.error("清空缓冲区时出错: %s", e)
-                await asyncio.sleep(1)
+                for event in parser.feed(chunk):
+                    kind = event[0]
+                    if kind == ITEM:
+                        # 超大s.query帧中的元素到达即处理，无需等待整帧
+                        self._apply_query_item(event[1], event[2])
+                        continue
+                    
+                    if kind == FRAME:
+                        data = event[1]
+                        self.metrics.frame_received(len(data))
+                        try:
+                            if len(data) >= LARGE_FRAME_THRESHOLD:
+                                # 大帧（如完整的s.query）在线程池中解码和规范化
+                                response = await self.hass.async_add_executor_job(decode_large_frame, data)
+                                self.metrics.large_frames += 1
+                            else:
+                                response = json.loads(data.decode("utf-8"))
+                        except ValueError as err:
+                            _LOGGER.error("解析网关数据失败: %s", err)
+                            continue
+                        
+                        # 启用代理时事件原样广播给下游客户端，下游请求的响应直接送回
+                        if self.proxy is not None:
+                            if response.get("method") == "s.event":
+                                self.proxy.broadcast(data + FRAME_DELIMITER)
+                            elif self.proxy.route_response(response):
+                                continue
+                        
+                        # 传感器和面板事件走专用快速通道，不经过队列
+                        if response.get("evt") in FAST_EVENTS and response.get("method") == "s.event":
+                            self._dispatch_event(response, received_at)
+                            continue
+                    else:
+                        # 流式帧的帧头，其中的数组元素已逐个处理
+                        response = event[1]
+                        self.metrics.streamed_frames += 1
+                    
+                    # 将响应放入队列，接入调度中心时放入共享队列
+                    if self._hub is not None:
+                        self._hub.queue.put_nowait((self, response))
+                        self.metrics.queue_depth(self._hub.queue.qsize())
+                    else:
+                        self._response_queue.put_nowait(response)
+                        self.metrics.queue_depth(self._response_queue.qsize())
             except asyncio.CancelledError:
                 break
             except Exception as err:
                 _LOGGER.error("读取数据出错: %s", err)
-                await asyncio.sleep(1)
+                # 丢弃未完成的帧，从下一帧重新开始解析
+                parser = FrameParser()
+                self._synced_devices = set()
                 
-                # 检查连接状态
-                if self.connected and (self.reader is None or self.reader.at_eof()):
-                    self.connected = False
-                    
-                    # 通知断开连接
-                    for callback_func in self._disconnect_callbacks:
-                        callback_func()
-                    
-                    # 尝试重新连接
-                    try:
-                        await self.connect()
-                    except Exception as conn_err:
-                        _LOGGER.error("重新连接失败: %s", conn_err)
+                # 连接已断开时交给后台重连，本任务结束
+                if isinstance(err, ConnectionError) or self.reader is None or self.reader.at_eof():
+                    if self.connected:
+                        self._handle_connection_lost()
+                    break
+                await asyncio.sleep(1)
     
     async def _wait_for_specific_response(self, method: str, uuid: int, timeout: float = 10.0) -> Optional[dict]:
         """等待特定的响应。"""
@@ -186,178 +608,359 @@ class InSonaGateway:
             try:
                 # 从队列获取响应
                 response = await self._response_queue.get()
-                method = response.get("method", "")
-                uuid = response.get("uuid")
+                self.handle_response(response)
+            except asyncio.CancelledError:
+                break
+            except Exception as err:
+                _LOGGER.error("事件处理出错: %s", err)
+                await asyncio.sleep(0.1)
+
+    @callback
+    def handle_response(self, response: dict) -> None:
+        """处理一条网关响应或事件。"""
+        method = response.get("method", "")
+        uuid = response.get("uuid")
+        
+        # 处理s.query方法的响应，用于初始化设备和房间信息
+        if method == "s.query" and response.get("result") == "ok":
+            _LOGGER.debug("收到s.query响应: %s", response)
+            # 解析房间信息
+            for room in response.get("rooms", []):
+                self._apply_query_item("rooms", room)
+            
+            # 解析设备信息，大帧已在线程池中完成规范化
+            normalized = response.get(NORMALIZED_KEY, False)
+            for device in response.get("devices", []):
+                self._apply_query_item("devices", device, normalized)
+            
+            # 解析场景信息
+            for scene in response.get("scenes", []):
+                self._apply_query_item("scenes", scene)
+            
+            self._finish_device_sync()
+            
+            # 处理等待中的命令响应
+            if uuid in self._waiting_commands:
+                expected_method, future = self._waiting_commands[uuid]
+                if method == expected_method and not future.done():
+                    future.set_result(response)
+        
+        # 处理控制确认，统计控制延迟
+        elif method == "s.control" and uuid in self._pending_acks:
+            did, sent_at = self._pending_acks.pop(uuid)
+            latency_ms = (time.monotonic() - sent_at) * 1000
+            self.metrics.ack_received(latency_ms)
+            if did in self.devices:
+                self.latency.ack(did, latency_ms)
+                if self._hub is not None:
+                    self._hub.record_latency(self, did, latency_ms)
+            waiter = self._ack_waiters.pop(uuid, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result((response.get("result", "ok") == "ok", latency_ms))
+        
+        # 处理等待中的命令响应
+        elif uuid in self._waiting_commands:
+            expected_method, future = self._waiting_commands[uuid]
+            if method == expected_method and not future.done():
+                _LOGGER.debug("设置等待命令的结果: uuid=%s, method=%s, response=%s", uuid, method, response)
+                future.set_result(response)
+        
+        # 处理状态事件
+        elif method == "s.event" and response.get("evt") == EVT_STATUS:
+            did = response.get("did")
+            func = response.get("func")
+            value = response.get("value", [])
+            status = response.get("status")
+            
+            _LOGGER.debug(
+                "收到状态更新: did=%s, func=%s, value=%s, status=%s",
+                did, func, value, status
+            )
+            if self._fanout_probes:
+                self._observe_fanout(did)
+            self._device_seen(did)
+            sent_at = self._awaiting_status.pop(did, None)
+            if sent_at is not None:
+                elapsed = time.monotonic() - sent_at
+                if elapsed < STATUS_WINDOW:
+                    self.latency.status(did, elapsed * 1000)
+            self._apply_status(did, func, value, status)
+        
+        # 处理meshchange事件，主动同步网关数据
+        elif method == "s.event" and response.get("evt") == EVT_MESHCHANGE:
+            _LOGGER.info("收到meshchange事件，主动同步网关数据")
+            # 连续的拓扑变化合并为一次后台同步
+            self._schedule_topology_sync()
+
+    @callback
+    def _dispatch_event(self, response: dict, received_at: float) -> None:
+        """分发传感器和面板按键事件。
+
+        只通知该设备自己的事件回调并在总线上触发事件，不修改设备状态字典。
+        """
+        did = response.get("did")
+        evt = response.get("evt")
+        value = response.get("value", [])
+        self._device_seen(did)
+        # 传感器读数同状态事件一样记入历史
+        if evt == EVT_SENSOR and did in self.devices:
+            self.history.record(did, response.get("func"), value)
+        # 多个网关都能看到同一设备时只由归属网关执行绑定和触发事件，避免重复
+        if not self.owns_device(did):
+            return
+        
+        # 命中本地绑定的按键直接下发预编译的控制帧，HA状态随后由状态事件更新
+        if evt == EVT_SWITCH_KEY:
+            frames = self.bindings.lookup(did, value) if self.bindings is not None else None
+            if frames is not None and self.connected and self.writer is not None:
+                self.writer.write(frames)
+                self.write_filter.forget()
+                self.metrics.binding_fired((time.perf_counter() - received_at) * 1e6)
+            else:
+                self._last_key_event_at = received_at
+        
+        listeners = self.event_listeners.get(did)
+        if listeners:
+            for callback_func in list(listeners):
+                callback_func(evt, value)
+        
+        self.hass.bus.async_fire(
+            EVENT_INSONA,
+            {
+                "gateway": self.gateway_id,
+                "did": did,
+                "type": evt,
+                "func": response.get("func"),
+                "value": value,
+            },
+        )
+        self.metrics.event_dispatched((time.perf_counter() - received_at) * 1e6)
+
+    @callback
+    def _device_seen(self, did: str) -> None:
+        """设备发来消息，刷新最后出现时间；离线的设备立即恢复在线。"""
+        if self.liveness is None:
+            return
+        self.liveness.touch(did)
+        device = self.devices.get(did)
+        if device is not None and device.get("alive", 0) != 1:
+            device["alive"] = 1
+            self.notify_status(did)
+
+    def register_event_listener(
+        self, did: str, callback_func: Callable[[str, List[int]], None]
+    ) -> Callable[[], None]:
+        """注册设备传感器/面板事件的回调函数。"""
+        if did not in self.event_listeners:
+            self.event_listeners[did] = set()
+            
+        self.event_listeners[did].add(callback_func)
+        
+        def remove_callback() -> None:
+            if did in self.event_listeners:
+                self.event_listeners[did].discard(callback_func)
+                if not self.event_listeners[did]:
+                    del self.event_listeners[did]
                 
-                # 处理s.query方法的响应，用于初始化设备和房间信息
-                _LOGGER.debug("收到s.query响应: %s", response)
-                if method == "s.query" and response.get("result") == "ok":
-                    # 解析房间信息
-                    for room in response.get("rooms", []):
-                        self.rooms[room["roomId"]] = room["name"]
+        return remove_callback
+
+    @callback
+    def _apply_query_item(self, key: str, item: dict, normalized: bool = False) -> None:
+        """处理查询结果中的一个房间、设备或场景。"""
+        if key == "devices":
+            if not normalized:
+                normalize_device(item)
+            did = item["did"]
+            self._synced_devices.add(did)
+            self.write_filter.confirm(did)
+            if self.liveness is not None and item.get("alive", 0) == 1:
+                self.liveness.touch(did)
+            existing = self.devices.get(did)
+            if existing is None:
+                self.devices[did] = item
+                self.index.add(item)
+                if self._hub is not None:
+                    self._hub.device_seen(self, did)
+                # 新设备到达即通知平台创建实体
+                async_dispatcher_send(
+                    self.hass, SIGNAL_DEVICE_ADDED.format(self.gateway_id), item
+                )
+            elif existing != item:
+                # 原地更新，实体持有的设备字典保持有效
+                existing.clear()
+                existing.update(item)
+                self.index.update(existing)
+                self.notify_status(did)
+        elif key == "rooms":
+            self.rooms[item["roomId"]] = item["name"]
+        elif key == "scenes":
+            scene_id = item["sceneId"]
+            self._synced_scenes.add(scene_id)
+            is_new = scene_id not in self.scenes
+            self.scenes[scene_id] = item["name"]
+            if is_new:
+                async_dispatcher_send(
+                    self.hass, SIGNAL_SCENE_ADDED.format(self.gateway_id), scene_id, item["name"]
+                )
+
+    @callback
+    def _finish_device_sync(self) -> None:
+        """设备同步完成，移除网关不再上报的设备。"""
+        removed = [did for did in self.devices if did not in self._synced_devices]
+        self._synced_devices = set()
+        for did in removed:
+            del self.devices[did]
+            self.index.remove(did)
+            if self._hub is not None:
+                self._hub.device_lost(self, did)
+            if self.liveness is not None:
+                self.liveness.discard(did)
+            self.latency.discard(did)
+            self.history.discard(did)
+            self.write_filter.forget(did)
+            if self.circadian is not None:
+                self.circadian.discard(did)
+            self._awaiting_status.pop(did, None)
+            _LOGGER.info("设备 %s 已从网关移除", did)
+            async_dispatcher_send(self.hass, SIGNAL_DEVICE_REMOVED.format(self.gateway_id), did)
+
+    @callback
+    def _finish_scene_sync(self) -> None:
+        """场景同步完成，移除网关不再上报的场景。"""
+        removed = [scene_id for scene_id in self.scenes if scene_id not in self._synced_scenes]
+        self._synced_scenes = set()
+        for scene_id in removed:
+            del self.scenes[scene_id]
+            _LOGGER.info("场景 %s 已从网关移除", scene_id)
+            async_dispatcher_send(self.hass, SIGNAL_SCENE_REMOVED.format(self.gateway_id), scene_id)
+
+    async def async_sync_topology(self) -> None:
+        """重新同步设备和场景，增量通知平台增删实体。"""
+        try:
+            await self.query_devices()
+            await self.query_scenes()
+        except Exception as err:
+            _LOGGER.error("同步网关数据失败: %s", err)
+
+    @callback
+    def notify_status(self, did: str) -> None:
+        """通知设备的状态监听者。"""
+        if did in self.status_listeners:
+            for callback_func in list(self.status_listeners[did]):
+                callback_func()
+
+    @callback
+    def _apply_status(self, did: str, func: int, value: List[int], status: Optional[List[int]]) -> None:
+        """根据状态事件更新设备状态并通知监听者。"""
+        if did not in self.devices:
+            return
+        device = self.devices[did]
+        self.history.record(did, func, value)
+        self.write_filter.confirm(did)
+        
+        # 处理灯光设备状态更新
+        if device["type"] == DEVICE_TYPE_LIGHT:
+            # 更新当前func，这对于双模式灯具特别重要
+            device["func"] = func
+            
+            # 根据不同func处理状态
+            if func == FUNC_ONOFF:  # 开关控制
+                if value and len(value) > 0:
+                    device["value"][0] = value[0]  # 更新开关状态
                     
-                    # 解析设备信息
-                    for device in response.get("devices", []):
-                        # 根据设备类型和func初始化value数组
-                        func = device.get("func", 0)
-                        funcs = device.get("funcs", [])
+                    # 当灯打开时，如果有status信息，需要根据status[0]更新模式和值
+                    if value[0] == 1 and status:
+                        mode = status[0]
+                        if mode == 3:  # 亮度模式
+                            device["func"] = FUNC_BRIGHTNESS
+                            if len(device["value"]) < 2:
+                                device["value"].append(0)
+                            device["value"][1] = status[1]  # 亮度值
                         
-                        # 确保value数组长度足够
-                        if func == FUNC_ONOFF:  # 开关功能
-                            if len(device.get("value", [])) < 1:
-                                device["value"] = [0]
-                        elif func == FUNC_BRIGHTNESS:  # 亮度功能
-                            if len(device.get("value", [])) < 2:
-                                device["value"] = [0, 0]
-                        elif func == FUNC_CTL:  # 亮度色温功能
-                            if len(device.get("value", [])) < 3:
-                                device["value"] = [0, 0, 50]
-                        elif func == FUNC_HSL:  # HSL功能
-                            if len(device.get("value", [])) < 4:
-                                device["value"] = [0, 0, 0, 100]
+                        elif mode == 4:  # 亮度色温模式
+                            device["func"] = FUNC_CTL
+                            while len(device["value"]) < 3:
+                                device["value"].append(0)
+                            device["value"][1] = status[1]  # 亮度值
+                            device["value"][2] = status[2]  # 色温值
                         
-                        self.devices[device["did"]] = device
+                        elif mode == 5:  # HSL模式
+                            device["func"] = FUNC_HSL
+                            while len(device["value"]) < 4:
+                                device["value"].append(0)
+                            device["value"][1] = status[1]  # 亮度值
+                            device["value"][2] = status[2]  # hue值
+                            device["value"][3] = status[3]  # 饱和度值
+            
+            elif func == FUNC_BRIGHTNESS:  # 亮度控制
+                device["func"] = FUNC_BRIGHTNESS
+                device["value"][0] = 1  # 设置为开启状态
+                if value and len(value) > 0:
+                    device["value"][1] = value[0]  # 更新亮度值（第一个值为亮度）
+            
+            elif func == FUNC_CTL:  # 色温控制
+                # 确保value列表长度足够
+                while len(device["value"]) < 3:
+                    device["value"].append(0)
+                
+                device["value"][0] = 1  # 设置为开启状态
+                if value:
+                    if len(value) > 0:
+                        device["value"][1] = value[0]  # 亮度
+                    if len(value) > 1:
+                        device["value"][2] = value[1]  # 色温
+            
+            elif func == FUNC_HSL:  # HSL控制
+                device["func"] = FUNC_HSL
+                # 确保 value 列表有足够长度
+                while len(device["value"]) < 4:
+                    device["value"].append(0)
                     
-                    # 解析场景信息
-                    for scene in response.get("scenes", []):
-                        self.scenes[scene["sceneId"]] = scene["name"]
+                device["value"][0] = 1  # 设置为开启状态
+                if value:
+                    if len(value) > 0:
+                        device["value"][1] = value[0]  # 亮度
+                    if len(value) > 1:
+                        device["value"][2] = value[1]  # hue
+                    if len(value) > 2:
+                        device["value"][3] = value[2]  # 饱和度
+        
+        # 处理窗帘类型设备
+        elif device["type"] == DEVICE_TYPE_COVER:
+            if func == FUNC_ONOFF:  # func=2 开关控制
+                # 确保 value 列表有足够长度
+                while len(device["value"]) < 2:
+                    device["value"].append(0)
                     
-                    # 处理等待中的命令响应
-                    if uuid in self._waiting_commands:
-                        expected_method, future = self._waiting_commands[uuid]
-                        if method == expected_method and not future.done():
-                            future.set_result(response)
-                
-                # 处理等待中的命令响应
-                elif uuid in self._waiting_commands:
-                    expected_method, future = self._waiting_commands[uuid]
-                    if method == expected_method and not future.done():
-                        _LOGGER.debug("设置等待命令的结果: uuid=%s, method=%s, response=%s", uuid, method, response)
-                        future.set_result(response)
-                
-                # 处理状态事件
-                elif method == "s.event" and response.get("evt") == "status":
-                    did = response.get("did")
-                    func = response.get("func")
-                    value = response.get("value", [])
-                    status = response.get("status")
+                if value and len(value) > 0:
+                    device["func"] = func
+                    device["value"][0] = value[0]  # 更新开关状态 0=关闭 1=打开
                     
-                    _LOGGER.debug(
-                        "收到状态更新: did=%s, func=%s, value=%s, status=%s",
-                        did, func, value, status
-                    )
-                
-                # 处理meshchange事件，主动同步网关数据
-                elif method == "s.event" and response.get("evt") == "meshchange":
-                    _LOGGER.info("收到meshchange事件，主动同步网关数据")
-                    # 在后台任务中执行查询，避免阻塞事件循环
-                    asyncio.create_task(self.query_devices())
+                    # 当收到 func=2, value=[0] 时，窗帘位置设置为0（全关）
+                    if value[0] == 0:
+                        device["value"][1] = 0
+            elif func == 3:  # level控制
+                # 确保 value 列表有足够长度
+                while len(device["value"]) < 2:
+                    device["value"].append(0)
                     
-                    # 更新设备状态
-                    if did in self.devices:
-                        device = self.devices[did]
-                        
-                        # 处理灯光设备状态更新
-                        if device["type"] == DEVICE_TYPE_LIGHT:
-                            # 更新当前func，这对于双模式灯具特别重要
-                            device["func"] = func
-                            
-                            # 根据不同func处理状态
-                            if func == FUNC_ONOFF:  # 开关控制
-                                if value and len(value) > 0:
-                                    device["value"][0] = value[0]  # 更新开关状态
-                                    
-                                    # 当灯打开时，如果有status信息，需要根据status[0]更新模式和值
-                                    if value[0] == 1 and status:
-                                        mode = status[0]
-                                        if mode == 3:  # 亮度模式
-                                            device["func"] = FUNC_BRIGHTNESS
-                                            if len(device["value"]) < 2:
-                                                device["value"].append(0)
-                                            device["value"][1] = status[1]  # 亮度值
-                                        
-                                        elif mode == 4:  # 亮度色温模式
-                                            device["func"] = FUNC_CTL
-                                            while len(device["value"]) < 3:
-                                                device["value"].append(0)
-                                            device["value"][1] = status[1]  # 亮度值
-                                            device["value"][2] = status[2]  # 色温值
-                                        
-                                        elif mode == 5:  # HSL模式
-                                            device["func"] = FUNC_HSL
-                                            while len(device["value"]) < 4:
-                                                device["value"].append(0)
-                                            device["value"][1] = status[1]  # 亮度值
-                                            device["value"][2] = status[2]  # hue值
-                                            device["value"][3] = status[3]  # 饱和度值
-                            
-                            elif func == FUNC_BRIGHTNESS:  # 亮度控制
-                                device["func"] = FUNC_BRIGHTNESS
-                                device["value"][0] = 1  # 设置为开启状态
-                                if value and len(value) > 0:
-                                    device["value"][1] = value[0]  # 更新亮度值（第一个值为亮度）
-                            
-                            elif func == FUNC_CTL:  # 色温控制
-                                # 确保value列表长度足够
-                                while len(device["value"]) < 3:
-                                    device["value"].append(0)
-                                
-                                device["value"][0] = 1  # 设置为开启状态
-                                if value:
-                                    if len(value) > 0:
-                                        device["value"][1] = value[0]  # 亮度
-                                    if len(value) > 1:
-                                        device["value"][2] = value[1]  # 色温
-                            
-                            elif func == FUNC_HSL:  # HSL控制
-                                device["func"] = FUNC_HSL
-                                # 确保 value 列表有足够长度
-                                while len(device["value"]) < 4:
-                                    device["value"].append(0)
-                                    
-                                device["value"][0] = 1  # 设置为开启状态
-                                if value:
-                                    if len(value) > 0:
-                                        device["value"][1] = value[0]  # 亮度
-                                    if len(value) > 1:
-                                        device["value"][2] = value[1]  # hue
-                                    if len(value) > 2:
-                                        device["value"][3] = value[2]  # 饱和度
-                        
-                        # 处理窗帘类型设备
-                        elif device["type"] == DEVICE_TYPE_COVER:
-                            if func == FUNC_ONOFF:  # func=2 开关控制
-                                # 确保 value 列表有足够长度
-                                while len(device["value"]) < 2:
-                                    device["value"].append(0)
-                                    
-                                if value and len(value) > 0:
-                                    device["func"] = func
-                                    device["value"][0] = value[0]  # 更新开关状态 0=关闭 1=打开
-                                    
-                                    # 当收到 func=2, value=[0] 时，窗帘位置设置为0（全关）
-                                    if value[0] == 0:
-                                        device["value"][1] = 0
-                            elif func == 3:  # level控制
-                                # 确保 value 列表有足够长度
-                                while len(device["value"]) < 2:
-                                    device["value"].append(0)
-                                    
-                                device["func"] = func
-                                device["value"][0] = 1  # 设置为开启状态
-                                if value and len(value) > 0:
-                                    device["value"][1] = value[0]  # 更新位置值
-                        
-                        # 调用状态更新回调
-                        if did in self.status_listeners:
-                            for callback_func in self.status_listeners[did]:
-                                callback_func()
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as err:
-                _LOGGER.error("事件处理出错: %s", err)
-                await asyncio.sleep(0.1)
+                device["func"] = func
+                device["value"][0] = 1  # 设置为开启状态
+                if value and len(value) > 0:
+                    device["value"][1] = value[0]  # 更新位置值
+        
+        # 处理传感器设备，func=10 的value为传感器读数，实体经过滤后写入
+        elif device["type"] == DEVICE_TYPE_SENSOR:
+            if func == FUNC_SENSOR and value:
+                device["func"] = func
+                device["value"] = list(value)
+        
+        # 场景执行后的观察窗口内记录成员状态
+        if self.scene_learner is not None:
+            self.scene_learner.observe(did, device)
+        
+        # 调用状态更新回调
+        self.notify_status(did)
     
     def register_status_listener(self, did: str, callback_func: Callable[[], None]) -> Callable[[], None]:
         """注册设备状态更新的回调函数。"""
@@ -368,7 +971,7 @@ class InSonaGateway:
         
         def remove_callback() -> None:
             if did in self.status_listeners:
-                self.status_listeners[did].remove(callback_func)
+                self.status_listeners[did].discard(callback_func)
                 if not self.status_listeners[did]:
                     del self.status_listeners[did]
                 
@@ -376,7 +979,7 @@ class InSonaGateway:
     
     async def query_devices(self) -> None:
         """查询所有设备和房间信息。"""
-        uuid = random.randint(1000, 9999)
+        uuid = self._new_uuid()
         command = {
             "version": 1,
             "uuid": uuid,
@@ -397,32 +1000,242 @@ class InSonaGateway:
             _LOGGER.error("查询设备失败: %s", response)
             raise Exception("查询设备失败")
     
-    async def control_device(self, did: str, action: str, value: List[int], transition: int = 0) -> bool:
-        """控制设备。"""
+    async def control_device(
+        self, did: str, action: str, value: List[int], transition: int = 0, force: bool = False
+    ) -> bool:
+        """控制设备。
+        
+        设备状态最近已确认且与目标一致时跳过下发，force为True时总是下发。
+        """
         if did not in self.devices:
             _LOGGER.error("设备 %s 不存在", did)
             return False
-            
-        command = {
-            "version": 1,
-            "uuid": random.randint(1000, 9999),
-            "method": "c.control",
-            "did": did,
-            "action": action,
-            "value": value,
-            "transition": transition
-        }
+        
+        if not force and self.write_filter.check(did, self.devices[did], action, value):
+            _LOGGER.debug("设备 %s 已处于目标状态，跳过命令 %s %s", did, action, value)
+            return True
+        
+        # 多网关时选择延迟最低的网关下发
+        gateway = self._hub.route(did, self) if self._hub is not None else self
+        return await gateway._async_control(did, action, value, transition)
+    
+    async def _async_control(self, did: str, action: str, value: List[int], transition: int) -> bool:
+        """通过本网关下发控制命令。"""
+        if not self.connected:
+            # 断线期间缓冲命令并立即返回，重连后重放
+            self.offline.put(did, action, value, transition)
+            return True
+        
+        uuid = self._new_uuid()
+        command = _control_command(uuid, did, action, value, transition)
+        
+        # 按键后经自动化发出的第一条控制命令，用于对比绑定快速通道的延迟
+        if self._last_key_event_at is not None:
+            elapsed = time.perf_counter() - self._last_key_event_at
+            self._last_key_event_at = None
+            if elapsed < KEY_COMMAND_WINDOW:
+                self.metrics.automation_path(elapsed * 1e6)
         
         try:
-            await self._send_command(command)
+            self._track_ack(uuid, did)
+            await self._write_frames((json.dumps(command) + "\r\n").encode("utf-8"), 1, (did,))
+            return True
+        except ConnectionError as err:
+            self._pending_acks.pop(uuid, None)
+            _LOGGER.warning("连接已断开，命令进入缓冲: %s", err)
+            self.offline.put(did, action, value, transition)
             return True
         except Exception as err:
+            self._pending_acks.pop(uuid, None)
             _LOGGER.error("控制设备失败: %s", err)
             return False
     
+    async def control_many(
+        self,
+        commands: List[Tuple[str, str, List[int], int]],
+        timeout: float = BULK_ACK_TIMEOUT,
+        sync: bool = False,
+        force: bool = False,
+    ) -> Dict[str, Dict[str, Any]]:
+        """批量控制设备，返回每个设备的结果。
+
+        commands为(did, action, value, transition)列表，同一设备只保留最后一条。
+        与control_device一样跳过目标与已确认状态一致的命令，结果中标记skipped，force为True时总是下发。
+        每个网关的控制帧合并为一次写入，然后并发等待所有确认。
+        命令覆盖某个已配置组地址的房间中的全部灯具且内容相同时，改为向组地址发一条命令，
+        这些设备的结果取组命令的结果并标记group；其余命令逐设备下发。
+        同步模式下全部经本网关一次写出，不按延迟分流到多个网关，也不合并为组命令，
+        并等待状态反馈，结果中附带每个设备相对下发时刻的起始时间start_ms。
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        latest = {}
+        for did, action, value, transition in commands:
+            if did not in self.devices:
+                results[did] = {"success": False, "error": "unknown_device"}
+                continue
+            latest.pop(did, None)
+            if not force and self.write_filter.check(did, self.devices[did], action, value):
+                results[did] = {"success": True, "skipped": True}
+                continue
+            results.pop(did, None)
+            latest[did] = (did, action, value, transition)
+        
+        # 能由房间组地址代替的命令合并为一条组命令
+        room_commands = [] if sync else self._room_group_commands(latest)
+        for _, _, members in room_commands:
+            for did in members:
+                del latest[did]
+        
+        # 多网关时按路由结果分组，各网关并行下发
+        groups: Dict[InSonaGateway, list] = {}
+        for command in latest.values():
+            if sync or self._hub is None:
+                gateway = self
+            else:
+                gateway = self._hub.route(command[0], self)
+            groups.setdefault(gateway, []).append(command)
+        for partial in await asyncio.gather(
+            *(gateway._async_control_many(group, timeout, sync) for gateway, group in groups.items()),
+            *(
+                self._async_control_room(address, command, members, timeout)
+                for address, command, members in room_commands
+            ),
+        ):
+            results.update(partial)
+        return results
+    
+    def _room_group_commands(
+        self, commands: Dict[str, Tuple[str, str, List[int], int]]
+    ) -> List[Tuple[str, Tuple[str, str, List[int], int], List[str]]]:
+        """找出可以用房间组地址代替的命令，返回(组地址, 命令, 组内设备)列表。
+
+        组命令作用于组内所有灯具，只有命令覆盖房间中的全部灯具且动作、值和渐变时间都相同时才能代替。
+        """
+        by_room: Dict[int, list] = {}
+        for command in commands.values():
+            room_id = self.devices[command[0]].get("roomId")
+            if room_id in self.room_groups:
+                by_room.setdefault(room_id, []).append(command)
+        room_commands = []
+        for room_id, members in by_room.items():
+            lights = {device["did"] for device in self.index.find(device_type=DEVICE_TYPE_LIGHT, room_id=room_id)}
+            if len(lights) < 2 or {command[0] for command in members} != lights:
+                continue
+            if len({json.dumps(command[1:]) for command in members}) != 1:
+                continue
+            room_commands.append((self.room_groups[room_id], members[0], sorted(lights)))
+        return room_commands
+    
+    async def _async_control_room(
+        self,
+        address: str,
+        command: Tuple[str, str, List[int], int],
+        members: List[str],
+        timeout: float,
+    ) -> Dict[str, Dict[str, Any]]:
+        """向房间组地址下发一条命令，组内每个设备的结果取组命令的结果。"""
+        _, action, value, transition = command
+        success = await self.control_group(address, action, value, transition, members, timeout)
+        return {did: {"success": success, "group": address} for did in members}
+    
+    async def control_group(
+        self,
+        address: str,
+        action: str,
+        value: List[int],
+        transition: int,
+        members: List[str],
+        timeout: float = BULK_ACK_TIMEOUT,
+    ) -> bool:
+        """向组地址下发一条控制命令，返回网关是否确认。
+
+        members为组内的设备，它们的状态确认随之失效，实际状态由各自的状态事件更新。
+        """
+        for did in members:
+            self.write_filter.forget(did)
+        results = await self._async_control_many([(address, action, value, transition)], timeout)
+        return results[address]["success"]
+    
+    async def _async_control_many(
+        self, commands: List[Tuple[str, str, List[int], int]], timeout: float, sync: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """通过本网关一次写入多条控制命令，并发等待确认。"""
+        if not self.connected:
+            for command in commands:
+                self.offline.put(*command)
+            return {command[0]: {"success": True, "buffered": True} for command in commands}
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        frames = []
+        waiters = {}
+        for did, action, value, transition in commands:
+            uuid = self._new_uuid()
+            frames.append(
+                (json.dumps(_control_command(uuid, did, action, value, transition)) + "\r\n").encode("utf-8")
+            )
+            self._track_ack(uuid, did)
+            waiters[did] = (uuid, loop.create_future())
+            self._ack_waiters[uuid] = waiters[did][1]
+        
+        try:
+            probe = await self._write_frames(b"".join(frames), len(frames), tuple(waiters))
+        except Exception as err:
+            for uuid, _ in waiters.values():
+                self._pending_acks.pop(uuid, None)
+                self._ack_waiters.pop(uuid, None)
+            if isinstance(err, ConnectionError):
+                _LOGGER.warning("连接已断开，%d 条命令进入缓冲: %s", len(commands), err)
+                for command in commands:
+                    self.offline.put(*command)
+                return {command[0]: {"success": True, "buffered": True} for command in commands}
+            _LOGGER.error("批量控制设备失败: %s", err)
+            return {did: {"success": False, "error": str(err)} for did in waiters}
+        
+        await asyncio.wait([future for _, future in waiters.values()], timeout=timeout)
+        if sync and probe is not None:
+            remaining = max(timeout - (loop.time() - started), 0)
+            try:
+                await asyncio.wait_for(asyncio.shield(probe.future), remaining)
+            except asyncio.TimeoutError:
+                pass
+        
+        results = {}
+        for did, (uuid, future) in waiters.items():
+            self._ack_waiters.pop(uuid, None)
+            if future.cancelled():
+                results[did] = {"success": False, "error": "disconnected"}
+            elif future.done():
+                success, latency_ms = future.result()
+                results[did] = {"success": success, "latency_ms": round(latency_ms, 1)}
+            else:
+                future.cancel()
+                if self._pending_acks.pop(uuid, None) is not None:
+                    self.metrics.ack_timeouts += 1
+                results[did] = {"success": False, "error": "timeout"}
+            if sync and probe is not None:
+                results[did]["start_ms"] = probe.start_ms(did)
+        return results
+    
+    def _track_ack(self, uuid: int, did: str) -> None:
+        """记录等待确认和状态事件的控制命令，并清理超时未确认的记录。"""
+        now = time.monotonic()
+        if did in self.devices:
+            # 组地址没有自己的状态事件
+            self._awaiting_status[did] = now
+        if len(self._pending_acks) > 256:
+            expired = [
+                key for key, (_, sent_at) in self._pending_acks.items()
+                if now - sent_at > ACK_TIMEOUT
+            ]
+            for key in expired:
+                del self._pending_acks[key]
+            self.metrics.ack_timeouts += len(expired)
+        self._pending_acks[uuid] = (did, now)
+    
     async def query_scenes(self) -> None:
         """查询场景列表。"""
-        uuid = random.randint(1000, 9999)
+        uuid = self._new_uuid()
         command = {
             "version": 1,
             "uuid": uuid,
@@ -452,29 +1265,44 @@ class InSonaGateway:
             _LOGGER.error("查询场景失败: 收到意外的响应方法: %s", response.get("method"))
             raise Exception(f"查询场景失败: 收到意外的响应方法: {response.get('method')}")
         
-        # 解析场景信息
-        scenes = response.get("scenes", [])
-        if not scenes:
+        # 解析场景信息，超大响应中的场景已在读取时逐个处理
+        for scene in response.get("scenes", []):
+            self._apply_query_item("scenes", scene)
+        self._finish_scene_sync()
+        if not self.scenes:
             _LOGGER.warning("未获取到任何场景信息")
         else:
-            for scene in scenes:
-                self.scenes[scene["sceneId"]] = scene["name"]
             _LOGGER.info("成功获取到 %d 个场景", len(self.scenes))
     
     async def activate_scene(self, scene_id: int) -> bool:
         """激活场景。"""
         command = {
             "version": 1,
-            "uuid": random.randint(1000, 9999),
+            "uuid": self._new_uuid(),
             "method": "c.control",
             "action": SCENE_ACTION,
             "value": [str(scene_id)],
             "transition": 0
         }
         
+        # 场景成员未知，所有设备的状态确认失效
+        self.write_filter.forget()
         try:
             await self._send_command(command)
             return True
         except Exception as err:
             _LOGGER.error("激活场景失败: %s", err)
-            return False
\ No newline at end of file
+            return False
+
+
+def _control_command(uuid: int, did: str, action: str, value: List[int], transition: int) -> dict:
+    """生成一条控制命令。"""
+    return {
+        "version": 1,
+        "uuid": uuid,
+        "method": "c.control",
+        "did": did,
+        "action": action,
+        "value": value,
+        "transition": transition
+    }
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""inSona设备状态历史。"""
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Union
+
+# 每个设备保留的最近状态变化条数
+HISTORY_SIZE = 64
+
+# 每条记录保存的最多状态值个数，HSL灯具为[开关, 亮度, 色调, 饱和度]
+MAX_VALUES = 4
+
+# 读出单精度状态值时保留的有效数字位数
+VALUE_DIGITS = 7
+
+
+class DeviceHistory:
+    """单个设备的定长环形缓冲，时间、func和状态值分别存放在数组中。
+
+    状态值以单精度浮点保存，传感器的小数读数和超出16位的整数（如照度）都能原样记录。
+    """
+
+    __slots__ = ("_times", "_funcs", "_lengths", "_values", "_next", "count")
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        """初始化缓冲。"""
+        self._times = array("d", bytes(8 * size))
+        self._funcs = array("B", bytes(size))
+        self._lengths = array("B", bytes(size))
+        self._values = array("f", bytes(4 * size * MAX_VALUES))
+        self._next = 0
+        self.count = 0
+
+    def add(self, timestamp: float, func: int, value: List[float]) -> None:
+        """写入一条记录，缓冲满时覆盖最早的记录。"""
+        size = len(self._times)
+        index = self._next
+        self._times[index] = timestamp
+        self._funcs[index] = (func or 0) & 0xFF
+        value = value[:MAX_VALUES]
+        self._lengths[index] = len(value)
+        offset = index * MAX_VALUES
+        for position, item in enumerate(value):
+            self._values[offset + position] = float(item)
+        self._next = (index + 1) % size
+        self.count = min(self.count + 1, size)
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按时间从新到旧返回记录。"""
+        size = len(self._times)
+        total = self.count if limit is None else min(limit, self.count)
+        result = []
+        for step in range(1, total + 1):
+            index = (self._next - step) % size
+            offset = index * MAX_VALUES
+            result.append(
+                {
+                    "time": self._times[index],
+                    "func": self._funcs[index],
+                    "value": [
+                        _restore(item) for item in self._values[offset:offset + self._lengths[index]]
+                    ],
+                }
+            )
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲占用的字节数。"""
+        return sum(
+            len(data) * data.itemsize
+            for data in (self._times, self._funcs, self._lengths, self._values)
+        )
+
+
+def _restore(item: float) -> Union[int, float]:
+    """还原保存的状态值：整数值返回int，小数去掉单精度带来的尾数。"""
+    if item.is_integer():
+        return int(item)
+    return float(f"{item:.{VALUE_DIGITS}g}")
+
+
+class StateHistory:
+    """按设备记录最近的状态事件，内存占用与设备数成正比、与运行时长无关。"""
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        """初始化历史。"""
+        self.size = size
+        self._devices: Dict[str, DeviceHistory] = {}
+        self.recorded = 0
+
+    def record(self, did: str, func: int, value: List[float]) -> None:
+        """记录设备的一条状态事件。"""
+        history = self._devices.get(did)
+        if history is None:
+            history = self._devices[did] = DeviceHistory(self.size)
+        history.add(time.time(), func, value)
+        self.recorded += 1
+
+    def discard(self, did: str) -> None:
+        """设备移除时丢弃历史。"""
+        self._devices.pop(did, None)
+
+    def entries(self, did: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """返回设备从新到旧的记录，没有记录时返回空列表。"""
+        history = self._devices.get(did)
+        return history.entries(limit) if history is not None else []
+
+    def latest(self, limit: int) -> List[Dict[str, Any]]:
+        """返回所有设备中最近的记录，按时间从新到旧排列。"""
+        merged = [
+            {"did": did, **entry}
+            for did, history in self._devices.items()
+            for entry in history.entries(limit)
+        ]
+        merged.sort(key=lambda entry: entry["time"], reverse=True)
+        return merged[:limit]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出概要，用于诊断信息。"""
+        return {
+            "size": self.size,
+            "devices": len(self._devices),
+            "recorded": self.recorded,
+            "memory_kb": round(
+                sum(history.nbytes for history in self._devices.values()) / 1024, 1
+            ),
+        }
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""inSona多网关调度中心。"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .const import SIGNAL_DEVICE_ADDED
+from .metrics import ewma
+
+if TYPE_CHECKING:
+    from .gateway import InSonaGateway
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class InSonaHub:
+    """多网关共享调度器。
+
+    所有网关的读取任务把收到的帧放入同一个队列，由唯一的分发任务依次处理；
+    同时记录每个设备被哪些网关看到，用于去重和按延迟选择控制路由。
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """初始化调度中心。"""
+        self.hass = hass
+        self.gateways: Dict[str, "InSonaGateway"] = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._dispatch_task: Optional[asyncio.Task] = None
+        # did -> 按发现顺序排列的网关ID，第一个为实体归属网关
+        self._device_gateways: Dict[str, list] = {}
+        # (网关ID, did) -> 控制确认延迟的EWMA（毫秒）
+        self._latency: Dict[Tuple[str, str], float] = {}
+
+    def add_gateway(self, gateway: "InSonaGateway") -> None:
+        """登记网关，并在需要时启动分发任务。"""
+        self.gateways[gateway.gateway_id] = gateway
+        if self._dispatch_task is None:
+            self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+
+    async def async_remove_gateway(self, gateway: "InSonaGateway") -> None:
+        """移除网关，没有网关时停止分发任务。"""
+        gateway_id = gateway.gateway_id
+        self.gateways.pop(gateway_id, None)
+        for did in list(self._device_gateways):
+            self.device_lost(gateway, did)
+        for key in [key for key in self._latency if key[0] == gateway_id]:
+            del self._latency[key]
+
+        if not self.gateways and self._dispatch_task is not None:
+            self._dispatch_task.cancel()
+            try:
+                await self._dispatch_task
+            except asyncio.CancelledError:
+                pass
+            self._dispatch_task = None
+
+    @property
+    def empty(self) -> bool:
+        """是否已没有登记的网关。"""
+        return not self.gateways
+
+    async def _dispatch_loop(self) -> None:
+        """从共享队列取帧并交给对应网关处理。"""
+        while True:
+            try:
+                gateway, response = await self.queue.get()
+                if gateway.gateway_id not in self.gateways:
+                    continue
+                gateway.handle_response(response)
+            except asyncio.CancelledError:
+                break
+            except Exception as err:
+                _LOGGER.error("共享分发处理出错: %s", err)
+
+    def device_seen(self, gateway: "InSonaGateway", did: str) -> None:
+        """记录某网关看到了设备。"""
+        seen = self._device_gateways.setdefault(did, [])
+        if gateway.gateway_id not in seen:
+            seen.append(gateway.gateway_id)
+
+    def device_lost(self, gateway: "InSonaGateway", did: str) -> None:
+        """记录某网关不再看到设备，归属网关失去设备时转交给下一个网关。"""
+        seen = self._device_gateways.get(did)
+        if not seen or gateway.gateway_id not in seen:
+            return
+        was_owner = seen[0] == gateway.gateway_id
+        seen.remove(gateway.gateway_id)
+        self._latency.pop((gateway.gateway_id, did), None)
+        if not seen:
+            del self._device_gateways[did]
+        elif was_owner:
+            self._transfer(did, seen[0])
+
+    def _transfer(self, did: str, gateway_id: str) -> None:
+        """设备归属转到另一个网关，由其按新增设备创建实体。"""
+        gateway = self.gateways.get(gateway_id)
+        device = gateway.devices.get(did) if gateway is not None else None
+        if device is None:
+            return
+        _LOGGER.info("设备 %s 的归属转到网关 %s", did, gateway_id)
+        async_dispatcher_send(self.hass, SIGNAL_DEVICE_ADDED.format(gateway_id), device)
+
+    def owner(self, did: str) -> Optional[str]:
+        """返回设备的归属网关ID（最先发现该设备的网关）。"""
+        seen = self._device_gateways.get(did)
+        return seen[0] if seen else None
+
+    def record_latency(self, gateway: "InSonaGateway", did: str, latency_ms: float) -> None:
+        """记录经某网关控制设备的确认延迟。"""
+        key = (gateway.gateway_id, did)
+        self._latency[key] = ewma(self._latency.get(key), latency_ms)
+
+    def route(self, did: str, default: "InSonaGateway") -> "InSonaGateway":
+        """选择控制该设备延迟最低的已连接网关。"""
+        seen = self._device_gateways.get(did)
+        if not seen or len(seen) == 1:
+            return default
+
+        best = default
+        best_latency = self._latency.get((default.gateway_id, did), float("inf"))
+        for gateway_id in seen:
+            gateway = self.gateways.get(gateway_id)
+            if gateway is None or not gateway.connected:
+                continue
+            latency = self._latency.get((gateway_id, did), float("inf"))
+            if latency < best_latency:
+                best, best_latency = gateway, latency
+
+        if not best.connected:
+            for gateway_id in seen:
+                gateway = self.gateways.get(gateway_id)
+                if gateway is not None and gateway.connected:
+                    return gateway
+        return best
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出调度中心状态，用于诊断信息。"""
+        shared = {did: seen for did, seen in self._device_gateways.items() if len(seen) > 1}
+        return {
+            "queue_depth": self.queue.qsize(),
+            "gateways": {
+                gateway_id: {
+                    "connected": gateway.connected,
+                    "devices": len(gateway.devices),
+                    "owned_devices": sum(
+                        1 for seen in self._device_gateways.values() if seen[0] == gateway_id
+                    ),
+                    **gateway.metrics.as_dict(),
+                }
+                for gateway_id, gateway in self.gateways.items()
+            },
+            "shared_devices": len(shared),
+            "routes": {
+                f"{gateway_id}/{did}": round(latency, 1)
+                for (gateway_id, did), latency in self._latency.items()
+                if did in shared
+            },
+        }
@@ -0,0 +1,124 @@
+"""inSona设备控制延迟统计。"""
+import math
+from array import array
+from typing import Any, Dict, List, Optional
+
+# 分桶下限（毫秒），不超过该值的样本都计入第一个桶
+SKETCH_MIN_MS = 1.0
+
+# 相邻桶边界的比例，分位数的相对误差约为其一半
+SKETCH_GAMMA = 1.15
+
+# 桶数，覆盖约1毫秒到60秒，超出上限的样本计入最后一个桶
+SKETCH_BUCKETS = 80
+
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+# 控制命令后等待状态事件的最长时间（秒），超时的记录不再计入
+STATUS_WINDOW = 30.0
+
+# 参与慢节点排名所需的最少样本数
+MIN_SAMPLES = 3
+
+
+class LatencySketch:
+    """对数分桶的流式分位数草图，内存固定，与样本数无关。"""
+
+    __slots__ = ("_counts", "count", "max")
+
+    def __init__(self) -> None:
+        """初始化草图。"""
+        self._counts = array("I", bytes(4 * SKETCH_BUCKETS))
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value_ms: float) -> None:
+        """加入一个延迟样本（毫秒）。"""
+        if value_ms <= SKETCH_MIN_MS:
+            index = 0
+        else:
+            index = min(int(math.log(value_ms / SKETCH_MIN_MS) / _LOG_GAMMA) + 1, SKETCH_BUCKETS - 1)
+        self._counts[index] += 1
+        self.count += 1
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估算分位数（毫秒）。"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative > rank:
+                if index == 0:
+                    return SKETCH_MIN_MS
+                # 取桶边界的几何中点，不超过实际最大值
+                return min(SKETCH_MIN_MS * SKETCH_GAMMA ** (index - 0.5), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """导出样本数和常用分位数。"""
+        return {
+            "samples": self.count,
+            "p50_ms": _round(self.quantile(0.5)),
+            "p95_ms": _round(self.quantile(0.95)),
+            "p99_ms": _round(self.quantile(0.99)),
+            "max_ms": round(self.max, 1),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    """四舍五入，保留空值。"""
+    return None if value is None else round(value, 1)
+
+
+class LatencyProfiler:
+    """按设备统计控制命令到确认、到状态事件的延迟。"""
+
+    def __init__(self) -> None:
+        """初始化统计。"""
+        self._ack: Dict[str, LatencySketch] = {}
+        self._status: Dict[str, LatencySketch] = {}
+
+    def ack(self, did: str, latency_ms: float) -> None:
+        """记录控制命令到网关确认的延迟。"""
+        sketch = self._ack.get(did)
+        if sketch is None:
+            sketch = self._ack[did] = LatencySketch()
+        sketch.add(latency_ms)
+
+    def status(self, did: str, latency_ms: float) -> None:
+        """记录控制命令到设备状态事件的延迟。"""
+        sketch = self._status.get(did)
+        if sketch is None:
+            sketch = self._status[did] = LatencySketch()
+        sketch.add(latency_ms)
+
+    def discard(self, did: str) -> None:
+        """设备移除时丢弃统计。"""
+        self._ack.pop(did, None)
+        self._status.pop(did, None)
+
+    def slow_nodes(self, metric: str = "status", limit: int = 10) -> List[Dict[str, Any]]:
+        """按p95延迟从高到低返回最慢的设备。"""
+        sketches = self._status if metric == "status" else self._ack
+        ranked = sorted(
+            (
+                (sketch.quantile(0.95), did, sketch)
+                for did, sketch in sketches.items()
+                if sketch.count >= MIN_SAMPLES
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        return [{"did": did, **sketch.summary()} for _, did, sketch in ranked[:limit]]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出概要，用于诊断信息。"""
+        return {
+            "devices": len(self._status.keys() | self._ack.keys()),
+            "slow_status": self.slow_nodes("status"),
+            "slow_ack": self.slow_nodes("ack"),
+        }
\ No newline at end of file
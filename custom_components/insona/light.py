@@ -1,5 +1,6 @@
 """inSona网关灯光控制平台。"""
 import logging
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 import voluptuous as vol
@@ -15,6 +16,7 @@ from homeassistant.components.light import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
@@ -26,19 +28,43 @@ from homeassistant.util.color import (
 from .const import (
     DOMAIN,
     DEVICE_TYPE_LIGHT,
-    FUNC_ONOFF,
-    FUNC_BRIGHTNESS,
     FUNC_CTL,
     FUNC_HSL,
     ACTION_ONOFF,
     ACTION_LEVEL,
     ACTION_CTL,
     ACTION_HSL,
+    SIGNAL_DEVICE_ADDED,
 )
+from .device_index import CAP_CT, CAP_DIMMABLE, CAP_DUAL, CAP_ONOFF, CAP_RGB, light_capability
 from .gateway import InSonaGateway
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def _brightness(value: List[int]) -> Optional[int]:
+    """把设备亮度(0-100)换算为HA亮度(0-255)。"""
+    if len(value) > 1:
+        return int(value[1] * 255 / 100)
+    return None
+
+
+def _kelvin(light: LightEntity, value: List[int]) -> Optional[int]:
+    """把设备色温值(0-100)换算为开尔文温度。"""
+    if len(value) > 2:
+        # inSona: 0(最暖) -> 100(最冷)；HomeAssistant: 2700K(最暖) -> 6500K(最冷)
+        min_kelvin = light._attr_min_color_temp_kelvin
+        return int(min_kelvin + (value[2] / 100) * (light._attr_max_color_temp_kelvin - min_kelvin))
+    return None
+
+
+def _hs_color(value: List[int]) -> Optional[Tuple[float, float]]:
+    """取设备的色调(0-360)和饱和度(0-100)。"""
+    if len(value) > 3:
+        return (value[2], value[3])
+    return None
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -49,28 +75,52 @@ async def async_setup_entry(
     
     entities = []
     
-    # 查找所有灯光设备
-    for did, device in gateway.devices.items():
-        if device["type"] == DEVICE_TYPE_LIGHT:
-            funcs = device.get("funcs", [])
-            
-            # 检查是否为双模式灯具（同时支持色温和RGB）
-            if FUNC_CTL in funcs and FUNC_HSL in funcs:
-                entities.append(InSonaDualModeLight(gateway, device))
-            elif FUNC_HSL in funcs:
-                entities.append(InSonaRGBLight(gateway, device))
-            elif FUNC_CTL in funcs:
-                entities.append(InSonaColorTempLight(gateway, device))
-            elif FUNC_BRIGHTNESS in funcs:
-                entities.append(InSonaDimmableLight(gateway, device))
-            elif FUNC_ONOFF in funcs:
-                entities.append(InSonaLight(gateway, device))
+    # 由设备索引取出灯光设备
+    for device in gateway.index.find(device_type=DEVICE_TYPE_LIGHT):
+        # 多个网关都能看到的设备只由归属网关创建实体
+        if not gateway.owns_device(device["did"]):
+            continue
+        entity = _create_light(gateway, device)
+        if entity is not None:
+            entities.append(entity)
     
     if entities:
         async_add_entities(entities)
+    
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时增量创建实体。"""
+        if not gateway.owns_device(device["did"]):
+            return
+        entity = _create_light(gateway, device)
+        if entity is not None:
+            async_add_entities([entity])
+    
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway.gateway_id), _async_device_added
+        )
+    )
+
+def _create_light(gateway: InSonaGateway, device: dict) -> Optional["InSonaLightBase"]:
+    """根据设备的灯具能力类别创建对应的灯光实体。"""
+    entity_class = {
+        CAP_DUAL: InSonaDualModeLight,  # 同时支持色温和RGB
+        CAP_RGB: InSonaRGBLight,
+        CAP_CT: InSonaColorTempLight,
+        CAP_DIMMABLE: InSonaDimmableLight,
+        CAP_ONOFF: InSonaLight,
+    }.get(light_capability(device))
+    return entity_class(gateway, device) if entity_class is not None else None
 
 class InSonaLightBase(LightEntity):
-    """inSona灯光基础类。"""
+    """inSona灯光基础类。
+    
+    实体属性在每次状态变化时由_update_attrs计算一次并缓存在_attr_*中，
+    HA写入状态时直接读取缓存，不再在属性中重复换算。
+    """
+    
+    _attr_should_poll = False
     
     def __init__(self, gateway: InSonaGateway, device: dict):
         """初始化inSona灯光。"""
@@ -80,53 +130,45 @@ class InSonaLightBase(LightEntity):
         self._attr_unique_id = f"{DOMAIN}_{self.did}"
         self._attr_name = device["name"]
         
-        # 设备信息
-        room_id = device.get("roomId")
-        room_name = gateway.rooms.get(room_id, "")
-        
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, self.did)},
-            name=self.name,
-            manufacturer="inSona",
-            model=f"Type {device['type']} (PID {device['pid']})",
-            via_device=(DOMAIN, f"{gateway.host}:{gateway.port}"),
-            suggested_area=room_name,
-        )
-        
-        # 注册状态更新回调
-        self._remove_status_listener = gateway.register_status_listener(
-            self.did, self._handle_status_update
+        # 设备已在启动时批量注册，实体只需携带标识挂载
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, self.did)})
+    
+    async def async_added_to_hass(self) -> None:
+        """实体加入HomeAssistant时计算初始属性并注册回调，移除时自动注销。"""
+        self._update_attrs()
+        self.async_on_remove(
+            self.gateway.register_status_listener(self.did, self._handle_status_update)
         )
-        
-        # 注册断开连接回调
-        self._remove_disconnect_listener = gateway.register_disconnect_callback(
-            self._handle_disconnect
+        self.async_on_remove(
+            self.gateway.register_disconnect_callback(self._handle_disconnect)
         )
     
     @callback
     def _handle_status_update(self) -> None:
         """处理设备状态更新。"""
-        self.async_write_ha_state()
+        self._write_state()
     
     @callback
     def _handle_disconnect(self) -> None:
         """处理网关断开连接。"""
-        self.async_write_ha_state()
-        
-    async def async_will_remove_from_hass(self) -> None:
-        """实体从HomeAssistant移除时调用。"""
-        self._remove_status_listener()
-        self._remove_disconnect_listener()
+        self._write_state()
     
-    @property
-    def available(self) -> bool:
-        """设备是否可用。"""
-        return self.gateway.connected and self.device.get("alive", 0) == 1
+    @callback
+    def _write_state(self) -> None:
+        """重新计算属性并写入状态，按实体类记录写入耗时。"""
+        started = time.perf_counter()
+        self._update_attrs()
+        self.async_write_ha_state()
+        self.gateway.metrics.state_written(
+            type(self).__name__, (time.perf_counter() - started) * 1e6
+        )
     
-    @property
-    def is_on(self) -> bool:
-        """灯是否打开。"""
-        return self.device["value"][0] == 1
+    @callback
+    def _update_attrs(self) -> None:
+        """根据设备状态计算实体属性。"""
+        self._attr_available = self.gateway.online and self.device.get("alive", 0) == 1
+        value = self.device["value"]
+        self._attr_is_on = bool(value) and value[0] == 1
     
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开灯。"""
@@ -154,12 +196,11 @@ class InSonaDimmableLight(InSonaLightBase):
         self._attr_color_mode = ColorMode.BRIGHTNESS
         self._attr_supported_color_modes = {ColorMode.BRIGHTNESS}
     
-    @property
-    def brightness(self) -> Optional[int]:
-        """获取灯的亮度。"""
-        if len(self.device["value"]) > 1:
-            return int(self.device["value"][1] * 255 / 100)
-        return None
+    @callback
+    def _update_attrs(self) -> None:
+        """根据设备状态计算实体属性。"""
+        super()._update_attrs()
+        self._attr_brightness = _brightness(self.device["value"])
     
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开灯，设置亮度。"""
@@ -182,18 +223,11 @@ class InSonaColorTempLight(InSonaDimmableLight):
         self._attr_min_color_temp_kelvin = 2700  # 最低色温 2700K (最暖)
         self._attr_max_color_temp_kelvin = 6500  # 最高色温 6500K (最冷)
     
-    @property
-    def color_temp_kelvin(self) -> Optional[int]:
-        """获取灯的色温（开尔文温度）。"""
-        if len(self.device["value"]) > 2:
-            # 将设备的色温值(0-100)转换为开尔文温度(2700K-6500K)
-            # inSona: 0(最暖) -> 100(最冷)
-            # HomeAssistant: 2700K(最暖) -> 6500K(最冷)
-            ct_device_value = self.device["value"][2]
-            # 正确映射: 0 -> 2700K, 100 -> 6500K
-            kelvin = self.min_color_temp_kelvin + (ct_device_value / 100) * (self.max_color_temp_kelvin - self.min_color_temp_kelvin)
-            return int(kelvin)
-        return None
+    @callback
+    def _update_attrs(self) -> None:
+        """根据设备状态计算实体属性。"""
+        super()._update_attrs()
+        self._attr_color_temp_kelvin = _kelvin(self, self.device["value"])
     
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开灯，设置亮度和色温。"""
@@ -230,21 +264,13 @@ class InSonaRGBLight(InSonaLightBase):
         self._attr_supported_color_modes = {ColorMode.HS}
         self._attr_supported_features = LightEntityFeature.TRANSITION
     
-    @property
-    def brightness(self) -> Optional[int]:
-        """获取灯的亮度。"""
-        if len(self.device["value"]) > 1:
-            return int(self.device["value"][1] * 255 / 100)
-        return None
-    
-    @property
-    def hs_color(self) -> Optional[Tuple[float, float]]:
-        """获取灯的HSL颜色。"""
-        if len(self.device["value"]) > 3:
-            hue = self.device["value"][2]  # hue值(0-360)
-            saturation = self.device["value"][3]  # 饱和度(0-100)
-            return (hue, saturation)
-        return None
+    @callback
+    def _update_attrs(self) -> None:
+        """根据设备状态计算实体属性。"""
+        super()._update_attrs()
+        value = self.device["value"]
+        self._attr_brightness = _brightness(value)
+        self._attr_hs_color = _hs_color(value)
     
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开灯，设置亮度和颜色。"""
@@ -295,38 +321,18 @@ class InSonaDualModeLight(InSonaLightBase):
             self._attr_color_mode = ColorMode.COLOR_TEMP
     
     @callback
-    def _handle_status_update(self) -> None:
-        """处理设备状态更新。"""
-        # 当设备状态更新时，根据func更新颜色模式
+    def _update_attrs(self) -> None:
+        """根据设备状态计算实体属性，颜色模式随当前func切换。"""
+        super()._update_attrs()
         self._update_color_mode_from_func()
-        self.async_write_ha_state()
-    
-    @property
-    def brightness(self) -> Optional[int]:
-        """获取灯的亮度。"""
-        if len(self.device["value"]) > 1:
-            return int(self.device["value"][1] * 255 / 100)
-        return None
-    
-    @property
-    def color_temp_kelvin(self) -> Optional[int]:
-        """获取灯的色温（开尔文温度）。"""
-        if self.color_mode == ColorMode.COLOR_TEMP and len(self.device["value"]) > 2:
-            # 将设备的色温值(0-100)转换为开尔文温度(2700K-6500K)
-            ct_device_value = self.device["value"][2]
-            # 正确映射: 0 -> 2700K, 100 -> 6500K
-            kelvin = self.min_color_temp_kelvin + (ct_device_value / 100) * (self.max_color_temp_kelvin - self.min_color_temp_kelvin)
-            return int(kelvin)
-        return None
-    
-    @property
-    def hs_color(self) -> Optional[Tuple[float, float]]:
-        """获取灯的HSL颜色。"""
-        if self.color_mode == ColorMode.HS and len(self.device["value"]) > 3:
-            hue = self.device["value"][2]  # hue值(0-360)
-            saturation = self.device["value"][3]  # 饱和度(0-100)
-            return (hue, saturation)
-        return None
+        value = self.device["value"]
+        self._attr_brightness = _brightness(value)
+        if self._attr_color_mode == ColorMode.COLOR_TEMP:
+            self._attr_color_temp_kelvin = _kelvin(self, value)
+            self._attr_hs_color = None
+        else:
+            self._attr_color_temp_kelvin = None
+            self._attr_hs_color = _hs_color(value)
     
     async def async_turn_on(self, **kwargs: Any) -> None:
         """打开灯，设置亮度和颜色。"""
@@ -350,7 +356,7 @@ class InSonaDualModeLight(InSonaLightBase):
             await self.gateway.control_device(self.did, ACTION_CTL, [brightness, ct_device_value], transition)
             # 更新当前模式
             self.device["func"] = FUNC_CTL
-            self._attr_color_mode = ColorMode.COLOR_TEMP
+            self._update_attrs()
             return
             
         # 处理RGB模式
@@ -370,7 +376,7 @@ class InSonaDualModeLight(InSonaLightBase):
             await self.gateway.control_device(self.did, ACTION_HSL, [brightness, hue, saturation], transition)
             # 更新当前模式
             self.device["func"] = FUNC_HSL
-            self._attr_color_mode = ColorMode.HS
+            self._update_attrs()
             return
             
         # 只调节亮度
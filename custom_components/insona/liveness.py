@@ -0,0 +1,197 @@
+"""inSona设备在线状态跟踪。"""
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+_LOGGER = logging.getLogger(__name__)
+
+# 设备超过该时间（秒）没有任何消息即视为可疑
+LIVENESS_TIMEOUT = 15 * 60
+
+# 时间轮的刻度（秒）
+LIVENESS_TICK = 10
+
+# 两次因可疑设备触发的重新同步之间的最小间隔（秒）
+RESYNC_MIN_INTERVAL = 5 * 60
+
+
+class TimerWheel:
+    """哈希时间轮。
+
+    touch只更新最后出现时间，为O(1)；每个设备在轮上最多占一个槽位，
+    槽位到期时才检查最后出现时间，仍然新鲜的设备重新挂到对应槽位，
+    每个刻度只处理当前槽位中的设备，不需要每个设备一个定时器，也不需要全量扫描。
+    """
+
+    def __init__(self, timeout: float, tick: float, now: float) -> None:
+        """初始化时间轮。"""
+        self.timeout = timeout
+        self.tick = tick
+        self._slots: List[Set[str]] = [set() for _ in range(math.ceil(timeout / tick) + 1)]
+        self._slot_of: Dict[str, int] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._cursor = 0
+        self._cursor_time = now
+
+    def __len__(self) -> int:
+        """轮上的设备数。"""
+        return len(self._slot_of)
+
+    def last_seen(self, key: str) -> Optional[float]:
+        """设备最后出现的时间。"""
+        return self._last_seen.get(key)
+
+    def touch(self, key: str, now: float) -> None:
+        """记录设备出现。"""
+        self._last_seen[key] = now
+        if key not in self._slot_of:
+            self._schedule(key, now + self.timeout)
+
+    def discard(self, key: str) -> None:
+        """移除设备。"""
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._slots[slot].discard(key)
+        self._last_seen.pop(key, None)
+
+    def _schedule(self, key: str, deadline: float) -> None:
+        """把设备挂到到期时间对应的槽位。"""
+        ticks = math.ceil((deadline - self._cursor_time) / self.tick)
+        ticks = min(max(ticks, 1), len(self._slots) - 1)
+        slot = (self._cursor + ticks) % len(self._slots)
+        self._slots[slot].add(key)
+        self._slot_of[key] = slot
+
+    def advance(self, now: float) -> List[str]:
+        """推进到当前时间，返回已到期的设备。"""
+        expired = []
+        while self._cursor_time + self.tick <= now:
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            self._cursor_time += self.tick
+            slot = self._slots[self._cursor]
+            if not slot:
+                continue
+            keys = list(slot)
+            slot.clear()
+            for key in keys:
+                del self._slot_of[key]
+                deadline = self._last_seen[key] + self.timeout
+                if deadline <= self._cursor_time:
+                    expired.append(key)
+                else:
+                    self._schedule(key, deadline)
+        return expired
+
+
+class LivenessMonitor:
+    """根据设备的最后出现时间维护在线状态。
+
+    网关的每条带did的消息都会刷新设备的最后出现时间，长时间没有消息的设备
+    成为可疑设备，并触发一次去抖的重新同步，由网关返回的alive标志统一确认；
+    确认离线的设备在同步结果中一次性变为不可用，之后又出现消息的设备立即恢复。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        gateway,
+        timeout: float = LIVENESS_TIMEOUT,
+        tick: float = LIVENESS_TICK,
+    ) -> None:
+        """初始化在线状态跟踪。"""
+        self.hass = hass
+        self.gateway = gateway
+        self.wheel = TimerWheel(timeout, tick, time.monotonic())
+        self._tick = tick
+        self._unsub = None
+        self._suspects: Set[str] = set()
+        self._last_resync: Optional[float] = None
+        self._resync_task = None
+        self.expired = 0
+        self.resyncs = 0
+
+    @callback
+    def async_start(self) -> None:
+        """开始跟踪，已知在线的设备从现在开始计时。"""
+        now = time.monotonic()
+        for did, device in self.gateway.devices.items():
+            if device.get("alive", 0) == 1:
+                self.wheel.touch(did, now)
+        self._unsub = async_track_time_interval(
+            self.hass, self._async_tick, timedelta(seconds=self._tick)
+        )
+
+    @callback
+    def async_unload(self) -> None:
+        """停止跟踪。"""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+
+    @callback
+    def touch(self, did: str) -> None:
+        """记录设备出现。"""
+        self.wheel.touch(did, time.monotonic())
+        self._suspects.discard(did)
+
+    @callback
+    def discard(self, did: str) -> None:
+        """设备被移除时停止跟踪。"""
+        self.wheel.discard(did)
+        self._suspects.discard(did)
+
+    @callback
+    def _async_tick(self, _now: Any) -> None:
+        """推进时间轮，收集可疑设备。"""
+        # 断线期间收不到任何消息，暂停计时，重连后的同步会刷新所有设备
+        if not self.gateway.connected:
+            return
+        devices = self.gateway.devices
+        for did in self.wheel.advance(time.monotonic()):
+            device = devices.get(did)
+            # 已经离线的设备不再计为可疑，再次出现消息时重新加入时间轮
+            if device is not None and device.get("alive", 0) == 1:
+                self._suspects.add(did)
+                self.expired += 1
+        if self._suspects:
+            self._schedule_resync()
+
+    @callback
+    def _schedule_resync(self) -> None:
+        """去抖地触发一次重新同步。"""
+        if self._resync_task is not None:
+            return
+        now = time.monotonic()
+        if self._last_resync is not None and now - self._last_resync < RESYNC_MIN_INTERVAL:
+            return
+        self._last_resync = now
+        self._resync_task = self.hass.async_create_task(self._async_resync())
+
+    async def _async_resync(self) -> None:
+        """重新同步拓扑，由网关确认可疑设备的在线状态。"""
+        suspects = len(self._suspects)
+        _LOGGER.debug("%d 个设备长时间没有消息，重新同步确认在线状态", suspects)
+        self.resyncs += 1
+        try:
+            await self.gateway.async_sync_topology()
+        finally:
+            self._resync_task = None
+        # 同步结果中在线的设备已刷新，其余可疑设备已按网关的alive标志更新
+        self._suspects.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出状态，用于诊断信息。"""
+        return {
+            "tracked": len(self.wheel),
+            "suspects": len(self._suspects),
+            "expired": self.expired,
+            "resyncs": self.resyncs,
+        }
\ No newline at end of file
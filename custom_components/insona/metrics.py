@@ -0,0 +1,158 @@
+"""inSona网关运行指标。"""
+import time
+from typing import Any, Dict, Optional
+
+# 指数加权平均的平滑系数
+EWMA_ALPHA = 0.2
+
+
+def ewma(previous: Optional[float], sample: float, alpha: float = EWMA_ALPHA) -> float:
+    """计算指数加权移动平均。"""
+    if previous is None:
+        return sample
+    return previous + alpha * (sample - previous)
+
+
+def _round(value: Optional[float], digits: int = 1) -> Optional[float]:
+    """四舍五入，保留空值。"""
+    return None if value is None else round(value, digits)
+
+
+class GatewayMetrics:
+    """单个网关的负载指标。"""
+
+    def __init__(self) -> None:
+        """初始化指标。"""
+        self.started = time.monotonic()
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.large_frames = 0
+        self.streamed_frames = 0
+        self.commands_sent = 0
+        self.acks_received = 0
+        self.ack_timeouts = 0
+        self.ack_latency_ms: Optional[float] = None
+        self.max_queue_depth = 0
+        self.registry_ms: Optional[float] = None
+        self.setup_timing: Dict[str, Any] = {}
+        self.events_dispatched = 0
+        self.event_dispatch_us: Optional[float] = None
+        self.event_dispatch_max_us = 0.0
+        self.bindings_fired = 0
+        self.binding_latency_us: Optional[float] = None
+        self.automation_path_us: Optional[float] = None
+        self.write_batches = 0
+        self.write_batch_bytes: Optional[float] = None
+        self.fanout_bursts = 0
+        self.fanout_skew_ms: Optional[float] = None
+        self.fanout_skew_last_ms: Optional[float] = None
+        self.fanout_skew_max_ms = 0.0
+        self.sensor_updates: Dict[str, Dict[str, int]] = {}
+        self.state_writes: Dict[str, Dict[str, Any]] = {}
+
+    def frame_received(self, size: int) -> None:
+        """记录收到的一帧数据。"""
+        self.frames_received += 1
+        self.bytes_received += size
+
+    def ack_received(self, latency_ms: float) -> None:
+        """记录一次命令确认及其延迟。"""
+        self.acks_received += 1
+        self.ack_latency_ms = ewma(self.ack_latency_ms, latency_ms)
+
+    def event_dispatched(self, latency_us: float) -> None:
+        """记录一次传感器/面板事件从收到到分发完成的耗时（微秒）。"""
+        self.events_dispatched += 1
+        self.event_dispatch_us = ewma(self.event_dispatch_us, latency_us)
+        if latency_us > self.event_dispatch_max_us:
+            self.event_dispatch_max_us = latency_us
+
+    def binding_fired(self, latency_us: float) -> None:
+        """记录一次本地绑定从收到按键到写出控制帧的耗时（微秒）。"""
+        self.bindings_fired += 1
+        self.binding_latency_us = ewma(self.binding_latency_us, latency_us)
+
+    def automation_path(self, latency_us: float) -> None:
+        """记录未命中绑定时从收到按键到自动化发出控制命令的耗时（微秒）。"""
+        self.automation_path_us = ewma(self.automation_path_us, latency_us)
+
+    def write_flushed(self, size: int) -> None:
+        """记录一次合并写出。"""
+        self.write_batches += 1
+        self.write_batch_bytes = ewma(self.write_batch_bytes, size)
+
+    def fanout_measured(self, skew_ms: float) -> None:
+        """记录一次多设备下发的起始偏差（毫秒）。"""
+        self.fanout_bursts += 1
+        self.fanout_skew_ms = ewma(self.fanout_skew_ms, skew_ms)
+        self.fanout_skew_last_ms = skew_ms
+        if skew_ms > self.fanout_skew_max_ms:
+            self.fanout_skew_max_ms = skew_ms
+
+    def sensor_update(self, kind: str, written: bool) -> None:
+        """记录一次传感器上报（written=False）或一次状态写入（written=True）。"""
+        counts = self.sensor_updates.get(kind)
+        if counts is None:
+            counts = self.sensor_updates[kind] = {"raw": 0, "written": 0}
+        counts["written" if written else "raw"] += 1
+
+    def state_written(self, entity_class: str, elapsed_us: float) -> None:
+        """记录一次实体计算属性并写入状态的耗时（微秒），按实体类统计。"""
+        stats = self.state_writes.get(entity_class)
+        if stats is None:
+            stats = self.state_writes[entity_class] = {"count": 0, "ewma_us": None, "max_us": 0.0}
+        stats["count"] += 1
+        stats["ewma_us"] = ewma(stats["ewma_us"], elapsed_us)
+        if elapsed_us > stats["max_us"]:
+            stats["max_us"] = elapsed_us
+
+    def queue_depth(self, depth: int) -> None:
+        """记录队列深度峰值。"""
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出为字典，用于诊断信息。"""
+        uptime = max(time.monotonic() - self.started, 1e-6)
+        return {
+            "frames_received": self.frames_received,
+            "bytes_received": self.bytes_received,
+            "frames_per_second": round(self.frames_received / uptime, 3),
+            "large_frames": self.large_frames,
+            "streamed_frames": self.streamed_frames,
+            "commands_sent": self.commands_sent,
+            "write_batches": self.write_batches,
+            "write_batch_bytes": _round(self.write_batch_bytes),
+            "acks_received": self.acks_received,
+            "ack_timeouts": self.ack_timeouts,
+            "ack_latency_ms": _round(self.ack_latency_ms),
+            "max_queue_depth": self.max_queue_depth,
+            "registry_ms": _round(self.registry_ms),
+            "setup_timing": self.setup_timing,
+            "events_dispatched": self.events_dispatched,
+            "event_dispatch_us": _round(self.event_dispatch_us),
+            "event_dispatch_max_us": round(self.event_dispatch_max_us, 1),
+            "bindings_fired": self.bindings_fired,
+            "binding_latency_us": _round(self.binding_latency_us),
+            "automation_path_us": _round(self.automation_path_us),
+            "fanout_bursts": self.fanout_bursts,
+            "fanout_skew_ms": _round(self.fanout_skew_ms),
+            "fanout_skew_last_ms": self.fanout_skew_last_ms,
+            "fanout_skew_max_ms": round(self.fanout_skew_max_ms, 1),
+            "state_writes": {
+                entity_class: {
+                    "count": stats["count"],
+                    "ewma_us": _round(stats["ewma_us"]),
+                    "max_us": round(stats["max_us"], 1),
+                }
+                for entity_class, stats in self.state_writes.items()
+            },
+            "sensor_updates": {
+                kind: {
+                    **counts,
+                    "suppressed_pct": round(100 * (1 - counts["written"] / counts["raw"]), 1)
+                    if counts["raw"] else None,
+                }
+                for kind, counts in self.sensor_updates.items()
+            },
+        }
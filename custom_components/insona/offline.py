@@ -0,0 +1,71 @@
+"""inSona网关离线命令缓冲。"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+# 缓冲命令的默认有效期（秒）
+DEFAULT_TTL = 30.0
+
+# 缓冲的最大设备数，超出时丢弃最早的命令
+MAX_BUFFERED = 512
+
+
+class OfflineCommandBuffer:
+    """网关断开期间的控制命令缓冲。
+
+    按设备合并，同一设备只保留最后一条命令，即最终状态；每条命令带有效期，
+    重连后只重放仍然有效的命令。
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_size: int = MAX_BUFFERED) -> None:
+        """初始化缓冲。"""
+        self.ttl = ttl
+        self.max_size = max_size
+        self._commands: "OrderedDict[str, tuple]" = OrderedDict()
+        self.buffered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.expired = 0
+        self.replayed = 0
+
+    def __len__(self) -> int:
+        """当前缓冲的命令数。"""
+        return len(self._commands)
+
+    def __contains__(self, did: str) -> bool:
+        """设备是否有缓冲的命令。"""
+        return did in self._commands
+
+    def put(self, did: str, action: str, value: List[int], transition: int) -> None:
+        """缓冲一条命令，覆盖该设备之前的命令。"""
+        self.buffered += 1
+        if did in self._commands:
+            self.coalesced += 1
+            del self._commands[did]
+        elif len(self._commands) >= self.max_size:
+            self._commands.popitem(last=False)
+            self.dropped += 1
+        self._commands[did] = (action, value, transition, time.monotonic() + self.ttl)
+
+    def drain(self) -> List[tuple]:
+        """取出所有未过期的命令，返回(did, action, value, transition)列表。"""
+        now = time.monotonic()
+        commands = []
+        for did, (action, value, transition, expires_at) in self._commands.items():
+            if expires_at < now:
+                self.expired += 1
+            else:
+                commands.append((did, action, value, transition))
+        self._commands.clear()
+        return commands
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出统计，用于诊断信息。"""
+        return {
+            "pending": len(self._commands),
+            "buffered": self.buffered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "expired": self.expired,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,92 @@
+"""inSona网关热路径的采样分析。"""
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+# 事件循环空闲时所在的帧，统计热点时排除
+IDLE_FRAMES = ("selectors.py:select", "selectors.py:poll")
+
+# 热路径分类，样本的调用栈中包含任一函数即计入该分类
+HOT_PATHS = {
+    "读取与切帧": ("_read_data_task", "feed"),
+    "JSON解码": ("loads", "raw_decode", "decode_large_frame"),
+    "分发": ("_dispatch_loop", "_event_listener", "handle_response", "_dispatch_event"),
+    "状态写入": ("async_write_ha_state", "_async_write_ha_state"),
+}
+
+# 通知中列出的热点数
+TOP_COUNT = 10
+
+
+def sample_thread(thread_id: int, duration: float, interval: float) -> Counter:
+    """在当前线程中周期采样目标线程的调用栈，返回折叠调用栈的计数。"""
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            labels.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        if labels:
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def write_collapsed(path: str, stacks: Counter) -> None:
+    """按折叠调用栈格式写入文件，可直接用于火焰图工具。"""
+    with open(path, "w", encoding="utf-8") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{stack} {count}\n")
+
+
+def summarize(stacks: Counter) -> Dict[str, Any]:
+    """统计繁忙比例、热路径分类占比和自身耗时最多的函数。"""
+    total = sum(stacks.values())
+    busy: Dict[str, int] = {}
+    hot_paths = dict.fromkeys(HOT_PATHS, 0)
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        labels = stack.split(";")
+        if labels[-1] in IDLE_FRAMES:
+            continue
+        busy[stack] = count
+        leaves[labels[-1]] += count
+        names = {label.rsplit(":", 1)[-1] for label in labels}
+        for category, functions in HOT_PATHS.items():
+            if names.intersection(functions):
+                hot_paths[category] += count
+
+    busy_samples = sum(busy.values())
+    return {
+        "samples": total,
+        "busy_pct": _pct(busy_samples, total),
+        "hot_paths": {category: _pct(count, busy_samples) for category, count in hot_paths.items()},
+        "top": [
+            {"function": label, "self_pct": _pct(count, busy_samples)}
+            for label, count in leaves.most_common(TOP_COUNT)
+        ],
+    }
+
+
+def format_report(summary: Dict[str, Any], path: str) -> str:
+    """生成通知内容。"""
+    lines: List[str] = [
+        f"共采样 {summary['samples']} 次，事件循环繁忙 {summary['busy_pct']}%。",
+        "",
+        "热路径占繁忙时间的比例：",
+    ]
+    lines.extend(f"- {category}: {pct}%" for category, pct in summary["hot_paths"].items())
+    lines.extend(["", "自身耗时最多的函数："])
+    lines.extend(f"- `{item['function']}`: {item['self_pct']}%" for item in summary["top"])
+    lines.extend(["", f"完整调用栈已写入 `{path}`"])
+    return "\n".join(lines)
+
+
+def _pct(count: int, total: int) -> float:
+    """计算百分比。"""
+    return round(100 * count / total, 1) if total else 0.0
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""inSona网关多路复用代理。"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DEFAULT_PROXY_HOST
+from .stream import FRAME, FrameParser, FrameTooLargeError
+
+_LOGGER = logging.getLogger(__name__)
+
+# 每个下游客户端的发送队列长度
+CLIENT_QUEUE_SIZE = 512
+
+# 客户端连续丢弃的事件超过该数量时断开，避免长期滞后
+MAX_CONSECUTIVE_DROPS = 256
+
+# 转发请求等待网关响应的最长时间（秒），超时的映射会被清理
+REQUEST_TIMEOUT = 30.0
+
+# 从下游连接每次读取的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 下游请求帧的最大长度（字节），客户端只发送控制和查询等小帧，超过时断开连接
+MAX_REQUEST_FRAME = 64 * 1024
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    """编码一帧。"""
+    return (json.dumps(message) + "\r\n").encode("utf-8")
+
+
+class ProxyClient:
+    """一个下游客户端连接。"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """初始化客户端。"""
+        self.reader = reader
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.closed = False
+        self.dropped = 0
+        self.consecutive_drops = 0
+
+    def close(self) -> None:
+        """关闭连接。"""
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+
+class GatewayProxy:
+    """让多个客户端共用网关的唯一上游连接。
+
+    下游客户端使用与网关相同的以\\r\\n分隔的JSON协议：设备和场景查询直接由缓存应答，
+    其余请求改写uuid后经上游连接转发，响应按uuid还原并送回发起的客户端；
+    网关的s.event事件原样广播给所有客户端。每个客户端有独立的有界发送队列，
+    慢客户端只会丢弃自己的事件，不会阻塞网关读取或其他客户端。
+    代理不做认证，只监听指定的地址，默认为本机回环地址。
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, gateway, port: int, host: str = DEFAULT_PROXY_HOST
+    ) -> None:
+        """初始化代理。"""
+        self.hass = hass
+        self.gateway = gateway
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[ProxyClient] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # 代理uuid -> (客户端, 原uuid, 转发时间)
+        self._pending: Dict[int, Tuple[ProxyClient, Any, float]] = {}
+        self.requests_forwarded = 0
+        self.queries_cached = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+        self.clients_dropped = 0
+
+    async def async_start(self) -> None:
+        """开始监听下游连接。"""
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        _LOGGER.info("inSona网关代理已在端口 %s 上启动", self.port)
+
+    async def async_stop(self) -> None:
+        """停止代理并断开所有客户端。"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for client in list(self._clients):
+            client.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._pending.clear()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个下游客户端。"""
+        client = ProxyClient(reader, writer)
+        self._clients.add(client)
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        sender = asyncio.create_task(self._async_send_loop(client))
+        self._tasks.add(sender)
+        _LOGGER.info("代理客户端 %s 已连接", client.peer)
+
+        parser = FrameParser(max_frame=MAX_REQUEST_FRAME)
+        try:
+            while not client.closed:
+                chunk = await reader.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                for event in parser.feed(chunk):
+                    if event[0] == FRAME:
+                        await self._async_handle_request(client, event[1])
+        except FrameTooLargeError as err:
+            self.clients_dropped += 1
+            _LOGGER.warning("代理客户端 %s 的请求%s，断开连接", client.peer, err)
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("代理客户端 %s 连接出错: %s", client.peer, err)
+        except asyncio.CancelledError:
+            # 代理停止时取消；连接处理任务以取消结束时asyncio会记录为错误
+            pass
+        finally:
+            self._clients.discard(client)
+            for uuid in [uuid for uuid, entry in self._pending.items() if entry[0] is client]:
+                del self._pending[uuid]
+            client.close()
+            sender.cancel()
+            self._tasks.discard(sender)
+            self._tasks.discard(task)
+            _LOGGER.info("代理客户端 %s 已断开", client.peer)
+
+    async def _async_send_loop(self, client: ProxyClient) -> None:
+        """把客户端队列中的帧合并写出。"""
+        try:
+            while not client.closed:
+                frames = [await client.queue.get()]
+                while not client.queue.empty():
+                    frames.append(client.queue.get_nowait())
+                client.writer.write(b"".join(frames))
+                await client.writer.drain()
+        except OSError:
+            client.close()
+
+    async def _async_handle_request(self, client: ProxyClient, data: bytes) -> None:
+        """处理客户端的一条请求。"""
+        try:
+            request = json.loads(data)
+        except ValueError:
+            _LOGGER.debug("代理客户端 %s 发送了无法解析的数据", client.peer)
+            return
+        method = request.get("method")
+        uuid = request.get("uuid")
+
+        # 查询由缓存直接应答，不占用网关
+        if method == "c.query":
+            self.queries_cached += 1
+            self._send(client, _encode(self._query_response(uuid)))
+            return
+        if method == "c.query.scene":
+            self.queries_cached += 1
+            self._send(client, _encode(self._scene_response(uuid)))
+            return
+
+        if not self.gateway.connected:
+            self._send(client, _encode(_error_response(method, uuid, "gateway offline")))
+            return
+
+        proxy_uuid = self.gateway._new_uuid()
+        self._expire_pending()
+        self._pending[proxy_uuid] = (client, uuid, time.monotonic())
+        request["uuid"] = proxy_uuid
+        try:
+            await self.gateway._write_frames(_encode(request))
+            self.requests_forwarded += 1
+        except Exception as err:  # pylint: disable=broad-except
+            self._pending.pop(proxy_uuid, None)
+            self._send(client, _encode(_error_response(method, uuid, str(err))))
+
+    def _expire_pending(self) -> None:
+        """清理长时间没有响应的转发记录。"""
+        if len(self._pending) < 1024:
+            return
+        deadline = time.monotonic() - REQUEST_TIMEOUT
+        for uuid in [uuid for uuid, entry in self._pending.items() if entry[2] < deadline]:
+            del self._pending[uuid]
+
+    @callback
+    def route_response(self, response: Dict[str, Any]) -> bool:
+        """把转发请求的响应送回发起的客户端，不属于代理的响应返回False。"""
+        entry = self._pending.pop(response.get("uuid"), None)
+        if entry is None:
+            return False
+        client, uuid, _ = entry
+        if not client.closed:
+            self._send(client, _encode({**response, "uuid": uuid}))
+        return True
+
+    @callback
+    def broadcast(self, frame: bytes) -> None:
+        """把一条网关事件原样广播给所有客户端，frame需包含分隔符。"""
+        for client in list(self._clients):
+            self._send(client, frame, droppable=True)
+
+    @callback
+    def _send(self, client: ProxyClient, frame: bytes, droppable: bool = False) -> None:
+        """放入客户端的发送队列，队列已满时丢弃事件，丢弃过多或响应无法送达时断开。"""
+        if client.closed:
+            return
+        try:
+            client.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if not droppable:
+                _LOGGER.warning("代理客户端 %s 接收过慢，断开连接", client.peer)
+                self.clients_dropped += 1
+                client.close()
+                return
+            client.dropped += 1
+            client.consecutive_drops += 1
+            self.events_dropped += 1
+            if client.consecutive_drops > MAX_CONSECUTIVE_DROPS:
+                _LOGGER.warning("代理客户端 %s 持续滞后，断开连接", client.peer)
+                self.clients_dropped += 1
+                client.close()
+            return
+        client.consecutive_drops = 0
+        if droppable:
+            self.events_sent += 1
+
+    def _query_response(self, uuid: Any) -> Dict[str, Any]:
+        """由缓存生成s.query响应。"""
+        return {
+            "version": 1,
+            "uuid": uuid,
+            "method": "s.query",
+            "result": "ok",
+            "rooms": [{"roomId": room_id, "name": name} for room_id, name in self.gateway.rooms.items()],
+            "devices": list(self.gateway.devices.values()),
+        }
+
+    def _scene_response(self, uuid: Any) -> Dict[str, Any]:
+        """由缓存生成s.query.scene响应。"""
+        return {
+            "version": 1,
+            "uuid": uuid,
+            "method": "s.query.scene",
+            "result": "ok",
+            "scenes": [{"sceneId": scene_id, "name": name} for scene_id, name in self.gateway.scenes.items()],
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出状态，用于诊断信息。"""
+        return {
+            "port": self.port,
+            "clients": len(self._clients),
+            "pending_requests": len(self._pending),
+            "requests_forwarded": self.requests_forwarded,
+            "queries_cached": self.queries_cached,
+            "events_sent": self.events_sent,
+            "events_dropped": self.events_dropped,
+            "clients_dropped": self.clients_dropped,
+        }
+
+
+def _error_response(method: Optional[str], uuid: Any, error: str) -> Dict[str, Any]:
+    """生成错误响应，方法名按协议由c.改为s.。"""
+    if isinstance(method, str) and method.startswith("c."):
+        method = "s." + method[2:]
+    return {"version": 1, "uuid": uuid, "method": method, "result": "error", "error": error}
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""inSona设备注册。"""
+import logging
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import area_registry as ar
+from homeassistant.helpers import device_registry as dr
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_register_gateway(hass: HomeAssistant, entry: ConfigEntry, gateway) -> None:
+    """注册网关设备，并移除旧版本以host为标识创建的重复网关设备。"""
+    device_registry = dr.async_get(hass)
+    device_registry.async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={(DOMAIN, gateway.gateway_id)},
+        manufacturer="inSona",
+        name=f"inSona 网关 ({gateway.host})",
+        model="inSona Gateway",
+    )
+
+    legacy = device_registry.async_get_device(identifiers={(DOMAIN, gateway.host)})
+    if legacy is not None and entry.entry_id in legacy.config_entries:
+        device_registry.async_update_device(legacy.id, remove_config_entry_id=entry.entry_id)
+
+
+@callback
+def async_register_device(hass: HomeAssistant, entry: ConfigEntry, gateway, device: dict) -> None:
+    """注册单个子设备。"""
+    if not gateway.owns_device(device["did"]):
+        return
+    dr.async_get(hass).async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={(DOMAIN, device["did"])},
+        name=device["name"],
+        manufacturer="inSona",
+        model=f"Type {device['type']} (PID {device['pid']})",
+        via_device=(DOMAIN, gateway.gateway_id),
+        suggested_area=gateway.rooms.get(device.get("roomId")) or None,
+    )
+
+
+@callback
+def async_register_topology(hass: HomeAssistant, entry: ConfigEntry, gateway) -> float:
+    """根据拓扑快照一次性注册房间区域、网关和全部子设备，返回耗时（毫秒）。
+
+    实体随后只携带设备标识即可挂载到已注册的设备上，不必逐个构建完整的设备信息。
+    """
+    started = time.perf_counter()
+
+    area_registry = ar.async_get(hass)
+    for room_name in set(gateway.rooms.values()):
+        if room_name:
+            area_registry.async_get_or_create(room_name)
+
+    async_register_gateway(hass, entry, gateway)
+    for device in gateway.devices.values():
+        async_register_device(hass, entry, gateway, device)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _LOGGER.info(
+        "已注册 %d 个房间区域和 %d 个设备，耗时 %.1f ms",
+        len(gateway.rooms), len(gateway.devices), elapsed_ms,
+    )
+    return elapsed_ms
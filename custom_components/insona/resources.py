@@ -0,0 +1,38 @@
+"""inSona集成的资源占用统计，用于发现回调、任务和内存泄漏。"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+def process_rss_kb() -> Optional[int]:
+    """读取当前进程的常驻内存（KB）。"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        # 非Linux平台只能取峰值
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return None
+
+
+def collect(hass: HomeAssistant) -> Dict[str, Any]:
+    """统计所有网关的回调数、等待中的请求数，以及任务数和常驻内存。"""
+    gateways = {
+        gateway.gateway_id: gateway.resources()
+        for gateway in hass.data.get(DOMAIN, {}).values()
+    }
+    return {
+        "gateways": gateways,
+        "tasks": len(asyncio.all_tasks()),
+        "bus_listeners": sum(hass.bus.async_listeners().values()),
+    }
\ No newline at end of file
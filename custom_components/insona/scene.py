@@ -4,11 +4,12 @@ from typing import List, Dict, Any
 
 from homeassistant.components.scene import Scene
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .const import DOMAIN, SIGNAL_SCENE_ADDED, SIGNAL_SCENE_LEARNED
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +29,17 @@ async def async_setup_entry(
     
     async_add_entities(entities)
     _LOGGER.info("已添加 %d 个inSona场景", len(entities))
+    
+    @callback
+    def _async_scene_added(scene_id: int, scene_name: str) -> None:
+        """网关新增场景时增量创建实体。"""
+        async_add_entities([InSonaScene(gateway, scene_id, scene_name)])
+    
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_SCENE_ADDED.format(gateway.gateway_id), _async_scene_added
+        )
+    )
 
 
 class InSonaScene(Scene):
@@ -43,14 +55,31 @@ class InSonaScene(Scene):
     @property
     def device_info(self) -> DeviceInfo:
         """返回设备信息。"""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._gateway.host)},
-            manufacturer="inSona",
-            name=f"inSona 网关 ({self._gateway.host})",
-            model="inSona Gateway",
+        # 与__init__中注册的网关设备使用同一标识（host:port）
+        return DeviceInfo(identifiers={(DOMAIN, self._gateway.gateway_id)})
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        """返回学到的场景成员数量和稳定时间。"""
+        return self._gateway.scene_learner.info(self._scene_id)
+
+    async def async_added_to_hass(self) -> None:
+        """实体加入HomeAssistant时监听学习结果。"""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_SCENE_LEARNED.format(self._gateway.gateway_id),
+                self._handle_learned,
+            )
         )
 
+    @callback
+    def _handle_learned(self, scene_id: int) -> None:
+        """场景学习完成后刷新属性。"""
+        if scene_id == self._scene_id:
+            self.async_write_ha_state()
+
     async def async_activate(self, **kwargs: Any) -> None:
         """激活场景。"""
         _LOGGER.debug("激活场景: %s (ID: %s)", self._attr_name, self._scene_id)
-        await self._gateway.activate_scene(self._scene_id)
\ No newline at end of file
+        await self._gateway.scene_learner.async_activate(self._scene_id)
@@ -0,0 +1,200 @@
+"""inSona场景成员学习。"""
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, SIGNAL_SCENE_LEARNED
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# 最后一条状态事件后静默该时间（秒）视为场景执行完成
+SETTLE_QUIET = 1.5
+
+# 观察窗口的最长时间（秒）
+SETTLE_MAX = 15.0
+
+# 成员置信度上限，连续未出现的成员逐次扣减，归零后移除
+MAX_HITS = 3
+
+# 预先应用状态所需的最低置信度，只出现过一次的成员可能只是恰好在窗口内上报的无关设备
+MIN_PREDICT_HITS = 2
+
+# 学习结果延迟保存的时间（秒）
+SAVE_DELAY = 10
+
+
+class SceneLearner:
+    """通过场景执行后的状态事件学习场景成员。
+
+    场景执行后开启观察窗口，记录窗口内每个设备最终的func和value，
+    直到状态事件静默为止；窗口长度即场景的稳定时间。再次执行场景时，
+    先把学到的状态一次性应用到置信度足够的成员实体，真实状态事件到达后自然校正；
+    窗口结束或场景执行失败时，仍未上报状态的成员恢复为预测前的状态。
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, gateway) -> None:
+        """初始化场景学习器。"""
+        self.hass = hass
+        self.gateway = gateway
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.scenes.{entry_id}")
+        # sceneId -> {"members": {did: {"func", "value", "hits"}}, "settle_ms": 毫秒}
+        self._scenes: Dict[str, Dict[str, Any]] = {}
+        self._scene_id: Optional[int] = None
+        self._started = 0.0
+        self._last_status = 0.0
+        self._captured: Dict[str, Dict[str, Any]] = {}
+        # 已预先应用但尚未上报状态的成员：did -> 预测前的func和value
+        self._predicted: Dict[str, Dict[str, Any]] = {}
+        self._cancel_timer = None
+
+    async def async_load(self) -> None:
+        """从存储加载学习结果。"""
+        data = await self._store.async_load() or {}
+        self._scenes = data.get("scenes", {})
+
+    @callback
+    def async_unload(self) -> None:
+        """停止观察窗口。"""
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        self._scene_id = None
+        self._predicted = {}
+
+    def info(self, scene_id: int) -> Dict[str, Any]:
+        """返回场景的学习结果摘要。"""
+        scene = self._scenes.get(str(scene_id))
+        if scene is None:
+            return {"members": 0, "settle_time_ms": None}
+        return {"members": len(scene["members"]), "settle_time_ms": scene.get("settle_ms")}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出全部学习结果，用于诊断信息。"""
+        return {scene_id: self.info(scene_id) for scene_id in self._scenes}
+
+    async def async_activate(self, scene_id: int) -> bool:
+        """执行场景，应用学到的状态并开启观察窗口。"""
+        self._finish()
+        self._apply_learned(scene_id)
+
+        self._scene_id = scene_id
+        self._started = self._last_status = time.monotonic()
+        self._captured = {}
+        self._schedule_check(SETTLE_QUIET)
+        if await self.gateway.activate_scene(scene_id):
+            return True
+        # 场景没有下发，撤销预测且不学习窗口内的状态
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        self._scene_id = None
+        self._captured = {}
+        self._rollback()
+        return False
+
+    @callback
+    def observe(self, did: str, device: dict) -> None:
+        """记录观察窗口内设备的最新状态。"""
+        if self._scene_id is None:
+            return
+        self._last_status = time.monotonic()
+        self._captured[did] = {"func": device.get("func"), "value": list(device.get("value", []))}
+        # 真实状态已到达，不再需要回滚
+        self._predicted.pop(did, None)
+
+    @callback
+    def _apply_learned(self, scene_id: int) -> None:
+        """把置信度足够的成员状态一次性应用到设备并通知实体。"""
+        scene = self._scenes.get(str(scene_id))
+        if not scene:
+            return
+        devices = self.gateway.devices
+        updated = []
+        for did, state in scene["members"].items():
+            device = devices.get(did)
+            if device is None or state.get("hits", 1) < MIN_PREDICT_HITS:
+                continue
+            self._predicted[did] = {"func": device.get("func"), "value": list(device.get("value", []))}
+            device["func"] = state["func"]
+            device["value"] = list(state["value"])
+            # 预测的状态不作为确认，等待真实的状态事件
+            self.gateway.write_filter.forget(did)
+            updated.append(did)
+        for did in updated:
+            self.gateway.notify_status(did)
+        _LOGGER.debug("场景 %s 预先应用了 %d 个成员状态", scene_id, len(updated))
+
+    @callback
+    def _rollback(self) -> None:
+        """把预测后仍未上报状态的成员恢复为预测前的状态。"""
+        predicted, self._predicted = self._predicted, {}
+        devices = self.gateway.devices
+        restored = []
+        for did, state in predicted.items():
+            device = devices.get(did)
+            if device is None:
+                continue
+            device["func"] = state["func"]
+            device["value"] = state["value"]
+            restored.append(did)
+        for did in restored:
+            self.gateway.notify_status(did)
+        if restored:
+            _LOGGER.debug("%d 个场景成员没有上报状态，已恢复预测前的状态", len(restored))
+
+    @callback
+    def _schedule_check(self, delay: float) -> None:
+        """安排一次静默检查。"""
+        self._cancel_timer = async_call_later(self.hass, delay, self._check_settled)
+
+    @callback
+    def _check_settled(self, _now: Any) -> None:
+        """检查状态事件是否已经静默。"""
+        self._cancel_timer = None
+        now = time.monotonic()
+        quiet = now - self._last_status
+        if quiet < SETTLE_QUIET and now - self._started < SETTLE_MAX:
+            self._schedule_check(SETTLE_QUIET - quiet)
+            return
+        self._finish()
+
+    @callback
+    def _finish(self) -> None:
+        """结束观察窗口，合并学到的成员。"""
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        self._rollback()
+        scene_id = self._scene_id
+        if scene_id is None:
+            return
+        self._scene_id = None
+        if not self._captured:
+            return
+
+        key = str(scene_id)
+        previous = self._scenes.get(key, {}).get("members", {})
+        members = {}
+        for did, state in previous.items():
+            if did not in self._captured and state.get("hits", 1) > 1:
+                members[did] = {**state, "hits": state.get("hits", 1) - 1}
+        for did, state in self._captured.items():
+            hits = previous.get(did, {}).get("hits", 0) + 1
+            members[did] = {**state, "hits": min(hits, MAX_HITS)}
+
+        settle_ms = round((self._last_status - self._started) * 1000)
+        self._scenes[key] = {"members": members, "settle_ms": settle_ms}
+        self._captured = {}
+        _LOGGER.debug("场景 %s 学习完成: %d 个成员，稳定时间 %d ms", scene_id, len(members), settle_ms)
+
+        self._store.async_delay_save(lambda: {"scenes": self._scenes}, SAVE_DELAY)
+        async_dispatcher_send(
+            self.hass, SIGNAL_SCENE_LEARNED.format(self.gateway.gateway_id), scene_id
+        )
@@ -1,6 +1,7 @@
 """inSona网关传感器平台。"""
 import logging
-from typing import Any, Optional
+import time
+from typing import Any, Dict, Optional
 
 from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
 from homeassistant.const import (
@@ -9,11 +10,15 @@ from homeassistant.const import (
     PERCENTAGE,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 
-from .const import DOMAIN, DEVICE_TYPE_SENSOR
+from .const import DOMAIN, DEVICE_TYPE_SENSOR, SENSOR_KINDS, SIGNAL_DEVICE_ADDED
 from .gateway import InSonaGateway
+from .sensor_filter import SensorFilter, sensor_filter_options
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -51,40 +56,85 @@ async def async_setup_entry(
 ) -> None:
     """设置inSona网关传感器平台。"""
     gateway: InSonaGateway = hass.data[DOMAIN][config_entry.entry_id]
+    filters = sensor_filter_options(config_entry.options)
     entities = []
     
     # 为每个传感器设备创建实体
-    for device in gateway.devices.values():
-        if device["type"] == DEVICE_TYPE_SENSOR:
-            sensor_type = device.get("sensorType", 0)
-            if sensor_type in SENSOR_TYPES:
-                entities.append(InSonaSensor(gateway, device, sensor_type))
+    for device in gateway.index.find(device_type=DEVICE_TYPE_SENSOR):
+        entity = _create_sensor(gateway, device, filters)
+        if entity is not None:
+            entities.append(entity)
     
     async_add_entities(entities)
+    
+    @callback
+    def _async_device_added(device: dict) -> None:
+        """网关新增设备时增量创建实体。"""
+        entity = _create_sensor(gateway, device, filters)
+        if entity is not None:
+            async_add_entities([entity])
+    
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_DEVICE_ADDED.format(gateway.gateway_id), _async_device_added
+        )
+    )
+
+
+def _create_sensor(
+    gateway: InSonaGateway, device: dict, filters: Dict[str, Dict[str, float]]
+) -> Optional["InSonaSensor"]:
+    """为传感器设备创建实体。"""
+    # 多个网关都能看到的设备只由归属网关创建实体
+    if device["type"] != DEVICE_TYPE_SENSOR or not gateway.owns_device(device["did"]):
+        return None
+    sensor_type = device.get("sensorType", 0)
+    if sensor_type not in SENSOR_TYPES:
+        return None
+    return InSonaSensor(gateway, device, sensor_type, filters[SENSOR_KINDS[sensor_type]])
 
 
 class InSonaSensor(SensorEntity):
-    """inSona传感器实体。"""
+    """inSona传感器实体。
+    
+    上报值经过死区、回差、最小间隔和滑动平均过滤后才写入HA状态，
+    减少抖动传感器对记录器和前端的写入压力。
+    """
+    
+    _attr_should_poll = False
     
-    def __init__(self, gateway: InSonaGateway, device: dict, sensor_type: int):
+    def __init__(
+        self, gateway: InSonaGateway, device: dict, sensor_type: int, filter_options: Dict[str, float]
+    ):
         """初始化传感器实体。"""
         self.gateway = gateway
         self.device = device
         self.sensor_type = sensor_type
+        self._kind = SENSOR_KINDS[sensor_type]
+        self._filter = SensorFilter(**filter_options)
+        self._pending_value: Optional[float] = None
+        self._cancel_trailing = None
+        self._attr_native_value = self._raw_value()
+        if self._attr_native_value is not None:
+            self._filter.written(self._attr_native_value, time.monotonic())
         self._attr_unique_id = f"{DOMAIN}_{device['did']}"
         self._attr_name = f"{device['name']} {SENSOR_TYPES[sensor_type]['name']}"
         self._attr_device_class = SENSOR_TYPES[sensor_type]["device_class"]
         self._attr_native_unit_of_measurement = SENSOR_TYPES[sensor_type]["native_unit_of_measurement"]
         self._attr_state_class = SENSOR_TYPES[sensor_type]["state_class"]
-        
-        # 注册状态更新回调
-        self._remove_listener = self.gateway.register_status_listener(
-            self.device["did"], self._handle_status_update
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, device["did"])})
+    
+    async def async_added_to_hass(self) -> None:
+        """实体加入HomeAssistant时注册回调，移除时自动注销。"""
+        self.async_on_remove(
+            self.gateway.register_status_listener(self.device["did"], self._handle_status_update)
+        )
+        self.async_on_remove(
+            self.gateway.register_disconnect_callback(self._handle_disconnect)
         )
     
-    @property
-    def native_value(self) -> Optional[Any]:
-        """获取传感器的值。"""
+    def _raw_value(self) -> Optional[Any]:
+        """获取传感器的原始值。"""
         # 传感器值通常存储在value数组的第一个元素
         if self.device["value"] and len(self.device["value"]) > 0:
             return self.device["value"][0]
@@ -93,13 +143,52 @@ class InSonaSensor(SensorEntity):
     @property
     def available(self) -> bool:
         """传感器是否可用。"""
-        return self.gateway.connected
+        return self.gateway.online
     
+    @callback
     def _handle_status_update(self) -> None:
-        """处理状态更新。"""
+        """处理状态更新，过滤后决定是否写入。"""
+        self.gateway.metrics.sensor_update(self._kind, written=False)
+        raw = self._raw_value()
+        if raw is None:
+            return
+        now = time.monotonic()
+        value = self._filter.sample(raw, now)
+        self._pending_value = value
+        if not self._filter.should_write(value):
+            return
+        
+        delay = self._filter.wait_time(now)
+        if delay > 0:
+            # 最小间隔内的变化在间隔结束时写入最新值
+            if self._cancel_trailing is None:
+                self._cancel_trailing = async_call_later(self.hass, delay, self._handle_trailing)
+            return
+        self._write_value(value, now)
+    
+    @callback
+    def _handle_disconnect(self) -> None:
+        """网关连接状态变化时更新可用性。"""
+        self.async_write_ha_state()
+    
+    @callback
+    def _handle_trailing(self, _now: Any) -> None:
+        """最小间隔结束，写入期间的最新值。"""
+        self._cancel_trailing = None
+        value = self._pending_value
+        if value is not None and self._filter.should_write(value):
+            self._write_value(value, time.monotonic())
+    
+    @callback
+    def _write_value(self, value: float, now: float) -> None:
+        """写入过滤后的值。"""
+        self._filter.written(value, now)
+        self._attr_native_value = value
+        self.gateway.metrics.sensor_update(self._kind, written=True)
         self.async_write_ha_state()
     
     async def async_will_remove_from_hass(self) -> None:
         """从HA中移除时的清理工作。"""
-        if self._remove_listener:
-            self._remove_listener()
\ No newline at end of file
+        if self._cancel_trailing is not None:
+            self._cancel_trailing()
+            self._cancel_trailing = None
\ No newline at end of file
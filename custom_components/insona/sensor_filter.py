@@ -0,0 +1,77 @@
+"""inSona传感器上报值过滤。"""
+from collections import deque
+from typing import Any, Dict, Mapping, Optional
+
+from .const import DEFAULT_SENSOR_FILTERS, SENSOR_FILTER_PARAMS, SENSOR_KINDS
+
+
+def sensor_filter_options(options: Mapping[str, Any]) -> Dict[str, Dict[str, float]]:
+    """从配置项选项中读取各类型传感器的过滤参数。"""
+    filters = {}
+    for kind in SENSOR_KINDS.values():
+        defaults = DEFAULT_SENSOR_FILTERS[kind]
+        filters[kind] = {
+            param: float(options.get(f"{kind}_{param}", defaults[param]))
+            for param in SENSOR_FILTER_PARAMS
+        }
+    return filters
+
+
+class SensorFilter:
+    """传感器上报值的死区、回差、最小间隔和滑动平均过滤。
+
+    只有与上次写入值的差超过死区才写入；变化方向与上次相反时还需额外超过回差，
+    避免在两个值之间来回跳动。两次写入之间不足最小间隔时由调用方延后写入最新值。
+    """
+
+    def __init__(
+        self,
+        deadband: float = 0.0,
+        hysteresis: float = 0.0,
+        min_interval: float = 0.0,
+        average_window: float = 0.0,
+    ) -> None:
+        """初始化过滤器。"""
+        self.deadband = deadband
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self.average_window = average_window
+        self._samples: deque = deque()
+        self._direction = 0
+        self.last_written: Optional[float] = None
+        self._last_written_at: Optional[float] = None
+
+    def sample(self, value: float, now: float) -> float:
+        """输入原始值，启用滑动平均时返回窗口内的平均值。"""
+        if self.average_window <= 0:
+            return value
+        samples = self._samples
+        samples.append((now, value))
+        while samples[0][0] < now - self.average_window:
+            samples.popleft()
+        return round(sum(sample for _, sample in samples) / len(samples), 2)
+
+    def should_write(self, value: float) -> bool:
+        """判断值的变化是否超过死区（方向反转时加上回差）。"""
+        if self.last_written is None:
+            return True
+        delta = value - self.last_written
+        if delta == 0:
+            return False
+        threshold = self.deadband
+        if self._direction and (delta > 0) != (self._direction > 0):
+            threshold += self.hysteresis
+        return abs(delta) >= threshold
+
+    def wait_time(self, now: float) -> float:
+        """距离允许下一次写入还需等待的时间（秒）。"""
+        if self._last_written_at is None or self.min_interval <= 0:
+            return 0.0
+        return max(self._last_written_at + self.min_interval - now, 0.0)
+
+    def written(self, value: float, now: float) -> None:
+        """记录一次写入。"""
+        if self.last_written is not None and value != self.last_written:
+            self._direction = 1 if value > self.last_written else -1
+        self.last_written = value
+        self._last_written_at = now
\ No newline at end of file
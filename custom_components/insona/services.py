@@ -0,0 +1,337 @@
+"""inSona网关服务。"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+import voluptuous as vol
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    ACTION_ONOFF,
+    ACTION_LEVEL,
+    ACTION_CTL,
+    ACTION_HSL,
+)
+from .gateway import BULK_ACK_TIMEOUT, InSonaGateway
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BIND_KEY = "bind_key"
+SERVICE_UNBIND_KEY = "unbind_key"
+SERVICE_LIST_BINDINGS = "list_bindings"
+SERVICE_BULK_CONTROL = "bulk_control"
+SERVICE_SLOW_NODES = "slow_nodes"
+SERVICE_PROFILE = "profile"
+SERVICE_HISTORY = "history"
+
+ATTR_PANEL = "panel"
+ATTR_KEY = "key"
+ATTR_KEY_ACTION = "key_action"
+ATTR_TARGETS = "targets"
+ATTR_ROOM = "room"
+ATTR_ACTION = "action"
+ATTR_VALUE = "value"
+ATTR_TRANSITION = "transition"
+ATTR_COMMANDS = "commands"
+ATTR_DID = "did"
+ATTR_TIMEOUT = "timeout"
+ATTR_SYNC = "sync"
+ATTR_FORCE = "force"
+ATTR_METRIC = "metric"
+ATTR_LIMIT = "limit"
+ATTR_DURATION = "duration"
+ATTR_INTERVAL = "interval"
+
+CONTROL_ACTIONS = [ACTION_ONOFF, ACTION_LEVEL, ACTION_CTL, ACTION_HSL, "curtainstop"]
+
+BIND_KEY_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_PANEL): cv.string,
+            vol.Required(ATTR_KEY): vol.Coerce(int),
+            vol.Optional(ATTR_KEY_ACTION): vol.Coerce(int),
+            vol.Optional(ATTR_TARGETS, default=[]): vol.All(cv.ensure_list, [cv.string]),
+            vol.Optional(ATTR_ROOM): vol.Coerce(int),
+            vol.Required(ATTR_ACTION): vol.In(CONTROL_ACTIONS),
+            vol.Required(ATTR_VALUE): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+            vol.Optional(ATTR_TRANSITION, default=0): vol.Coerce(int),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_TARGETS, ATTR_ROOM),
+)
+
+UNBIND_KEY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_PANEL): cv.string,
+        vol.Required(ATTR_KEY): vol.Coerce(int),
+        vol.Optional(ATTR_KEY_ACTION): vol.Coerce(int),
+    }
+)
+
+BULK_CONTROL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_COMMANDS): vol.All(
+            cv.ensure_list,
+            vol.Length(min=1),
+            [
+                vol.Schema(
+                    {
+                        vol.Required(ATTR_DID): cv.string,
+                        vol.Required(ATTR_ACTION): vol.In(CONTROL_ACTIONS),
+                        vol.Required(ATTR_VALUE): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+                        vol.Optional(ATTR_TRANSITION, default=0): vol.Coerce(int),
+                    }
+                )
+            ],
+        ),
+        vol.Optional(ATTR_TIMEOUT, default=BULK_ACK_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1, max=60)
+        ),
+        vol.Optional(ATTR_SYNC, default=False): cv.boolean,
+        vol.Optional(ATTR_FORCE, default=False): cv.boolean,
+    }
+)
+
+SLOW_NODES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_METRIC, default="status"): vol.In(["status", "ack"]),
+        vol.Optional(ATTR_LIMIT, default=10): vol.All(vol.Coerce(int), vol.Range(min=1, max=500)),
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=30): vol.All(vol.Coerce(float), vol.Range(min=1, max=300)),
+        vol.Optional(ATTR_INTERVAL, default=5): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+    }
+)
+
+HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DID): cv.string,
+        vol.Optional(ATTR_LIMIT, default=20): vol.All(vol.Coerce(int), vol.Range(min=1, max=500)),
+    }
+)
+
+
+def _gateways(hass: HomeAssistant):
+    """返回所有已加载的网关。"""
+    return list(hass.data.get(DOMAIN, {}).values())
+
+
+def _gateway_for_device(hass: HomeAssistant, did: str) -> InSonaGateway:
+    """找到管理该设备的网关。"""
+    for gateway in _gateways(hass):
+        if did in gateway.devices and gateway.owns_device(did):
+            return gateway
+    raise HomeAssistantError(f"未找到设备 {did}")
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """注册inSona服务，多个配置项共用一份。"""
+    if hass.services.has_service(DOMAIN, SERVICE_BIND_KEY):
+        return
+
+    async def async_bind_key(call: ServiceCall) -> None:
+        """把面板按键绑定到灯具或房间。"""
+        gateway = _gateway_for_device(hass, call.data[ATTR_PANEL])
+        binding = {
+            "panel": call.data[ATTR_PANEL],
+            "key": call.data[ATTR_KEY],
+            "key_action": call.data.get(ATTR_KEY_ACTION),
+            "targets": call.data[ATTR_TARGETS],
+            "room": call.data.get(ATTR_ROOM),
+            "action": call.data[ATTR_ACTION],
+            "value": call.data[ATTR_VALUE],
+            "transition": call.data[ATTR_TRANSITION],
+        }
+        await gateway.bindings.async_set(binding)
+
+    async def async_unbind_key(call: ServiceCall) -> None:
+        """删除面板按键绑定。"""
+        gateway = _gateway_for_device(hass, call.data[ATTR_PANEL])
+        removed = await gateway.bindings.async_remove(
+            call.data[ATTR_PANEL], call.data[ATTR_KEY], call.data.get(ATTR_KEY_ACTION)
+        )
+        if not removed:
+            raise HomeAssistantError("未找到对应的按键绑定")
+
+    async def async_list_bindings(call: ServiceCall) -> ServiceResponse:
+        """列出所有按键绑定。"""
+        return {
+            "bindings": [
+                binding
+                for gateway in _gateways(hass)
+                for binding in gateway.bindings.as_list()
+            ]
+        }
+
+    async def async_bulk_control(call: ServiceCall) -> ServiceResponse:
+        """批量控制设备，每个网关只写入一次，并发等待确认。"""
+        groups = {}
+        results = {}
+        for command in call.data[ATTR_COMMANDS]:
+            did = command[ATTR_DID]
+            try:
+                gateway = _gateway_for_device(hass, did)
+            except HomeAssistantError:
+                results[did] = {"success": False, "error": "unknown_device"}
+                continue
+            groups.setdefault(gateway, []).append(
+                (did, command[ATTR_ACTION], command[ATTR_VALUE], command[ATTR_TRANSITION])
+            )
+
+        for partial in await asyncio.gather(
+            *(
+                gateway.control_many(
+                    commands, call.data[ATTR_TIMEOUT], call.data[ATTR_SYNC], call.data[ATTR_FORCE]
+                )
+                for gateway, commands in groups.items()
+            )
+        ):
+            results.update(partial)
+
+        succeeded = sum(1 for result in results.values() if result["success"])
+        response = {
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        }
+        if call.data[ATTR_SYNC]:
+            # 同步模式下根据各设备的第一条状态反馈计算起始偏差
+            starts = [
+                result["start_ms"]
+                for result in results.values()
+                if result.get("start_ms") is not None
+            ]
+            response["skew_ms"] = round(max(starts) - min(starts), 1) if len(starts) > 1 else None
+        return response
+
+    async def async_slow_nodes(call: ServiceCall) -> ServiceResponse:
+        """按p95延迟列出最慢的设备。"""
+        metric = call.data[ATTR_METRIC]
+        limit = call.data[ATTR_LIMIT]
+        nodes = []
+        for gateway in _gateways(hass):
+            for node in gateway.latency.slow_nodes(metric, limit):
+                device = gateway.devices.get(node["did"], {})
+                nodes.append({"gateway": gateway.gateway_id, "name": device.get("name"), **node})
+        nodes.sort(key=lambda node: node["p95_ms"], reverse=True)
+        return {"metric": metric, "nodes": nodes[:limit]}
+
+    profile_lock = asyncio.Lock()
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """采样事件循环线程，写出折叠调用栈并通知热点。"""
+        if profile_lock.locked():
+            raise HomeAssistantError("已有采样正在进行")
+        # 采样工具只在调用时导入
+        from .profiler import format_report, sample_thread, summarize, write_collapsed
+
+        async with profile_lock:
+            # 服务在事件循环线程中执行，由线程池中的线程对其采样
+            loop_thread = threading.get_ident()
+            stacks = await hass.async_add_executor_job(
+                sample_thread, loop_thread, call.data[ATTR_DURATION], call.data[ATTR_INTERVAL] / 1000
+            )
+            path = hass.config.path(f"insona_profile_{datetime.now():%Y%m%d_%H%M%S}.collapsed")
+            await hass.async_add_executor_job(write_collapsed, path, stacks)
+
+        summary = summarize(stacks)
+        persistent_notification.async_create(
+            hass,
+            format_report(summary, path),
+            title="inSona 热路径采样",
+            notification_id=f"{DOMAIN}_profile",
+        )
+        return {"path": path, **summary}
+
+    async def async_history(call: ServiceCall) -> ServiceResponse:
+        """查询设备最近的状态事件，未指定设备时返回所有设备中最近的记录。"""
+        limit = call.data[ATTR_LIMIT]
+        did = call.data.get(ATTR_DID)
+        if did is not None:
+            gateway = _gateway_for_device(hass, did)
+            entries = [{"did": did, **entry} for entry in gateway.history.entries(did, limit)]
+            gateways = [gateway]
+        else:
+            gateways = _gateways(hass)
+            entries = [entry for gateway in gateways for entry in gateway.history.latest(limit)]
+            entries.sort(key=lambda entry: entry["time"], reverse=True)
+            entries = entries[:limit]
+
+        names = {
+            did: device.get("name")
+            for gateway in gateways
+            for did, device in gateway.devices.items()
+        }
+        return {
+            "entries": [
+                {
+                    **entry,
+                    "time": dt_util.utc_from_timestamp(entry["time"]).isoformat(),
+                    "name": names.get(entry["did"]),
+                }
+                for entry in entries
+            ]
+        }
+
+    hass.services.async_register(DOMAIN, SERVICE_BIND_KEY, async_bind_key, schema=BIND_KEY_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_UNBIND_KEY, async_unbind_key, schema=UNBIND_KEY_SCHEMA)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_LIST_BINDINGS,
+        async_list_bindings,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK_CONTROL,
+        async_bulk_control,
+        schema=BULK_CONTROL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SLOW_NODES,
+        async_slow_nodes,
+        schema=SLOW_NODES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_HISTORY,
+        async_history,
+        schema=HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """最后一个配置项卸载时移除服务。"""
+    if _gateways(hass):
+        return
+    for service in (
+        SERVICE_BIND_KEY,
+        SERVICE_UNBIND_KEY,
+        SERVICE_LIST_BINDINGS,
+        SERVICE_BULK_CONTROL,
+        SERVICE_SLOW_NODES,
+        SERVICE_PROFILE,
+        SERVICE_HISTORY,
+    ):
+        hass.services.async_remove(DOMAIN, service)
@@ -0,0 +1,179 @@
+"""inSona网关数据流的增量解析器。"""
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# 帧分隔符，JSON字符串中的换行必须转义，因此可以直接用于切分
+FRAME_DELIMITER = b"\r\n"
+
+# 未完成的帧超过该大小（字节）时切换为流式解析
+STREAM_THRESHOLD = 256 * 1024
+
+# 流式解析时逐个输出元素的顶层数组
+STREAM_KEYS = ("rooms", "devices", "scenes")
+
+# 解析事件类型
+FRAME = "frame"  # 完整的小帧（原始字节）
+ITEM = "item"  # 流式数组中的一个元素
+END = "end"  # 流式帧结束，附带去掉已输出元素后的帧头
+
+class FrameTooLargeError(ValueError):
+    """未完成的帧超过了允许的最大长度。"""
+
+
+_STRUCTURAL = re.compile(rb'["{}\[\],]')
+_STRING_END = re.compile(rb'["\\]')
+_WHITESPACE = b" \t\r\n"
+
+
+class FrameParser:
+    """把网关字节流切分为帧，超大帧按元素增量输出。
+
+    小帧以原始字节整体输出，由调用方决定解码方式；
+    未完成的帧超过阈值后改为结构扫描，rooms/devices/scenes数组中的
+    每个对象一旦完整就立即解码输出并从缓冲区删除，内存占用只与单个元素大小相关。
+    指定max_frame时（用于不可信的下游连接）不做流式解析，
+    帧长度超过max_frame即抛出FrameTooLargeError，缓冲区不会无限增长。
+    """
+
+    def __init__(self, stream_threshold: int = STREAM_THRESHOLD, max_frame: Optional[int] = None) -> None:
+        """初始化解析器。"""
+        self._threshold = stream_threshold
+        self._max_frame = max_frame
+        self._buf = bytearray()
+        self._search_from = 0
+        self._streaming = False
+        self._reset_scan()
+
+    def _reset_scan(self) -> None:
+        """重置结构扫描状态。"""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._drop_comma = False
+
+    @property
+    def streaming(self) -> bool:
+        """当前是否正在流式解析超大帧。"""
+        return self._streaming
+
+    @property
+    def buffered(self) -> int:
+        """当前缓冲的字节数。"""
+        return len(self._buf)
+
+    def feed(self, data: bytes) -> List[Tuple[Any, ...]]:
+        """输入一段数据，返回本次解析出的事件列表。"""
+        events: List[Tuple[Any, ...]] = []
+        self._buf += data
+        while True:
+            if not self._streaming:
+                self._strip_leading()
+                index = self._buf.find(FRAME_DELIMITER, self._search_from)
+                if self._max_frame is not None:
+                    length = index if index >= 0 else len(self._buf)
+                    if length > self._max_frame:
+                        raise FrameTooLargeError(f"帧长度超过 {self._max_frame} 字节")
+                if index >= 0:
+                    frame = bytes(self._buf[:index])
+                    del self._buf[:index + len(FRAME_DELIMITER)]
+                    self._search_from = 0
+                    if frame:
+                        events.append((FRAME, frame))
+                    continue
+                if len(self._buf) < self._threshold:
+                    # 分隔符可能跨越两次输入，回退一个字节再继续查找
+                    self._search_from = max(len(self._buf) - 1, 0)
+                    break
+                self._streaming = True
+                self._search_from = 0
+                self._reset_scan()
+            if not self._scan(events):
+                break
+        return events
+
+    def _strip_leading(self) -> None:
+        """去掉帧之间的空白。"""
+        count = 0
+        while count < len(self._buf) and self._buf[count] in _WHITESPACE:
+            count += 1
+        if count:
+            del self._buf[:count]
+            self._search_from = max(self._search_from - count, 0)
+
+    def _scan(self, events: List[Tuple[Any, ...]]) -> bool:
+        """结构扫描超大帧，帧结束时返回True。"""
+        buf = self._buf
+        pos = self._pos
+        while True:
+            if self._in_string:
+                match = _STRING_END.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+                index = match.start()
+                if buf[index] == 0x5C:  # 反斜杠转义
+                    if index + 1 >= len(buf):
+                        pos = index
+                        break
+                    pos = index + 2
+                    continue
+                self._in_string = False
+                pos = index + 1
+                if self._depth == 1:
+                    # 顶层对象中最近的字符串，遇到'['时即为数组的键
+                    self._last_key = buf[self._string_start:index].decode("utf-8", "replace")
+                continue
+
+            match = _STRUCTURAL.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            index = match.start()
+            char = buf[index]
+
+            if char == 0x22:  # "
+                self._in_string = True
+                self._string_start = index + 1
+                pos = index + 1
+            elif char in (0x7B, 0x5B):  # { [
+                self._depth += 1
+                if self._depth == 2 and char == 0x5B and self._last_key in STREAM_KEYS:
+                    self._array_key = self._last_key
+                elif self._depth == 3 and char == 0x7B and self._array_key is not None:
+                    self._item_start = index
+                pos = index + 1
+            elif char in (0x7D, 0x5D):  # } ]
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    start = self._item_start
+                    events.append((ITEM, self._array_key, json.loads(bytes(buf[start:index + 1]))))
+                    del buf[start:index + 1]
+                    self._item_start = None
+                    self._drop_comma = True
+                    pos = start
+                    continue
+                if self._depth == 1 and char == 0x5D:
+                    self._array_key = None
+                    self._drop_comma = False
+                elif self._depth == 0:
+                    header = json.loads(bytes(buf[:index + 1]))
+                    del buf[:index + 1]
+                    events.append((END, header))
+                    self._streaming = False
+                    self._reset_scan()
+                    return True
+                pos = index + 1
+            else:  # ,
+                if self._depth == 2 and self._drop_comma:
+                    # 已输出元素后的逗号一并删除，保证帧头仍是合法JSON
+                    del buf[index]
+                    pos = index
+                    continue
+                pos = index + 1
+        self._pos = pos
+        return False
@@ -0,0 +1,89 @@
+"""inSona冗余控制命令过滤。"""
+import time
+from typing import Any, Dict, List, Optional
+
+from .const import (
+    DEVICE_TYPE_LIGHT,
+    DEVICE_TYPE_COVER,
+    FUNC_CTL,
+    FUNC_HSL,
+    ACTION_ONOFF,
+    ACTION_LEVEL,
+    ACTION_CTL,
+    ACTION_HSL,
+)
+
+# 设备状态被确认后视为可信的时间（秒），超过后即使状态一致也照常下发
+CONFIRM_WINDOW = 300.0
+
+
+class RedundantCommandFilter:
+    """跳过目标状态与设备当前状态一致的控制命令。
+
+    只有最近一次状态事件或同步确认了设备状态、且确认之后没有再下发过命令时，
+    缓存的状态才视为可信；场景、按键绑定等无法逐个跟踪目标的写入会使确认全部失效。
+    过滤灯具的开关、亮度、色温和颜色命令，以及窗帘的位置命令。
+    """
+
+    def __init__(self, window: float = CONFIRM_WINDOW) -> None:
+        """初始化过滤器。"""
+        self.window = window
+        self._confirmed: Dict[str, float] = {}  # did -> 状态最近一次被确认的时间
+        self.suppressed: Dict[str, int] = {}  # action -> 跳过的命令数
+
+    def confirm(self, did: str) -> None:
+        """设备状态由网关确认。"""
+        self._confirmed[did] = time.monotonic()
+
+    def forget(self, did: Optional[str] = None) -> None:
+        """使设备的状态确认失效，不指定设备时全部失效。"""
+        if did is None:
+            self._confirmed.clear()
+        else:
+            self._confirmed.pop(did, None)
+
+    def check(self, did: str, device: Dict[str, Any], action: str, value: List[int]) -> bool:
+        """命令是否冗余；冗余时计数，否则视为即将下发，使该设备的确认失效。"""
+        if self._is_redundant(did, device, action, value):
+            self.suppressed[action] = self.suppressed.get(action, 0) + 1
+            return True
+        # 下发后到下一次状态事件之前，缓存的状态不再可信
+        self._confirmed.pop(did, None)
+        return False
+
+    def _is_redundant(self, did: str, device: Dict[str, Any], action: str, value: List[int]) -> bool:
+        """比较命令目标与已确认的设备状态。"""
+        confirmed = self._confirmed.get(did)
+        if confirmed is None or time.monotonic() - confirmed > self.window:
+            return False
+        if device.get("alive", 0) != 1 or not value:
+            return False
+        state = device["value"]
+        if not state:
+            return False
+        if device["type"] == DEVICE_TYPE_COVER:
+            # 窗帘的value为[开关, 位置]，关闭时位置已按0更新
+            return action == ACTION_LEVEL and len(state) > 1 and state[1] == value[0]
+        if device["type"] != DEVICE_TYPE_LIGHT:
+            return False
+        if action == ACTION_ONOFF:
+            return state[0] == value[0]
+        # 其余命令都会开灯，灯关着时不冗余
+        if state[0] != 1:
+            return False
+        if action == ACTION_LEVEL:
+            return state[1:2] == value[:1]
+        if action == ACTION_CTL:
+            return device.get("func") == FUNC_CTL and state[1:3] == value[:2]
+        if action == ACTION_HSL:
+            return device.get("func") == FUNC_HSL and state[1:4] == value[:3]
+        return False
+
+    def as_dict(self) -> Dict[str, Any]:
+        """导出统计，用于诊断信息。"""
+        return {
+            "window_s": self.window,
+            "confirmed": len(self._confirmed),
+            "suppressed": sum(self.suppressed.values()),
+            "suppressed_by_action": dict(self.suppressed),
+        }
\ No newline at end of file
@@ -0,0 +1 @@
+"""inSona集成的测试。"""
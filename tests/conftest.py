@@ -0,0 +1,199 @@
+"""inSona集成测试的公共夹具：在本机模拟网关的TCP协议。"""
+import asyncio
+import copy
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from homeassistant.const import CONF_HOST, CONF_PORT
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.insona.const import DOMAIN
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+LIGHT = {
+    "did": "ECC57F1031F100",
+    "pid": 256,
+    "ver": "61706",
+    "type": 1984,
+    "alive": 1,
+    "roomId": 6,
+    "name": "会议过道",
+    "func": 4,
+    "funcs": [2, 3, 4, 11],
+    "value": [1, 100, 8],
+}
+
+COVER = {
+    "did": "ECC57F1031F200",
+    "pid": 512,
+    "ver": "61706",
+    "type": 1860,
+    "alive": 1,
+    "roomId": 6,
+    "name": "会议窗帘",
+    "func": 3,
+    "funcs": [2, 3],
+    "value": [1, 0],
+}
+
+TEMPERATURE_SENSOR = {
+    "did": "F0ACD760002D00",
+    "pid": 768,
+    "ver": "61706",
+    "type": 1344,
+    "alive": 1,
+    "roomId": 6,
+    "name": "会议温度",
+    "sensorType": 1,
+    "func": 10,
+    "funcs": [10],
+    "value": [21],
+}
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """加载custom_components下的集成。"""
+    yield
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_sockets(socket_enabled):
+    """网关模拟器在本机监听TCP端口，测试框架默认禁止创建套接字。"""
+    yield
+
+
+class FakeGateway:
+    """按inSona本地协议应答的网关模拟器。"""
+
+    def __init__(self, devices: List[dict], rooms: Optional[List[dict]] = None) -> None:
+        """初始化模拟器。"""
+        self.devices = copy.deepcopy(devices)
+        self.rooms = rooms if rooms is not None else [{"roomId": 6, "name": "会议室"}]
+        self.requests: List[Dict[str, Any]] = []
+        self.received_at: List[float] = []  # 每条请求到达的时间（perf_counter）
+        self.port = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def start(self) -> None:
+        """在本机随机端口监听。"""
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """断开所有连接并停止监听。"""
+        for writer in self._writers:
+            writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """逐帧处理客户端请求。"""
+        self._writers.append(writer)
+        buffer = b""
+        while True:
+            try:
+                chunk = await reader.read(65536)
+            except ConnectionError:
+                break
+            if not chunk:
+                break
+            buffer += chunk
+            while b"\r\n" in buffer:
+                line, buffer = buffer.split(b"\r\n", 1)
+                if line.strip():
+                    self._respond(writer, json.loads(line))
+        self._writers.remove(writer)
+
+    def _respond(self, writer: asyncio.StreamWriter, request: Dict[str, Any]) -> None:
+        """应答一条请求。"""
+        self.requests.append(request)
+        self.received_at.append(time.perf_counter())
+        method = request.get("method")
+        reply: Dict[str, Any] = {"version": 1, "uuid": request.get("uuid"), "result": "ok"}
+        if method == "c.query":
+            reply.update(method="s.query", rooms=self.rooms, devices=copy.deepcopy(self.devices))
+        elif method == "c.query.scene":
+            reply.update(method="s.query.scene", scenes=[])
+        elif method == "c.control":
+            reply.update(method="s.control")
+        else:
+            return
+        writer.write((json.dumps(reply) + "\r\n").encode("utf-8"))
+
+    def drop(self) -> None:
+        """断开所有客户端连接，继续监听以便客户端重连。"""
+        for writer in list(self._writers):
+            writer.close()
+
+    def push(self, frame: Dict[str, Any]) -> None:
+        """向所有连接推送一帧事件。"""
+        data = (json.dumps({"version": 1, "uuid": 1, **frame}) + "\r\n").encode("utf-8")
+        for writer in self._writers:
+            writer.write(data)
+
+    def controls(self) -> List[Dict[str, Any]]:
+        """收到的控制命令。"""
+        return [request for request in self.requests if request.get("method") == "c.control"]
+
+    def control_times(self) -> List[float]:
+        """控制命令到达的时间（perf_counter）。"""
+        return [
+            received_at
+            for request, received_at in zip(self.requests, self.received_at)
+            if request.get("method") == "c.control"
+        ]
+
+
+@pytest.fixture
+async def fake_gateway():
+    """启动网关模拟器的工厂，测试结束时全部停止。"""
+    gateways: List[FakeGateway] = []
+
+    async def _start(devices: List[dict], **kwargs: Any) -> FakeGateway:
+        gateway = FakeGateway(devices, **kwargs)
+        await gateway.start()
+        gateways.append(gateway)
+        return gateway
+
+    yield _start
+    for gateway in gateways:
+        await gateway.stop()
+
+
+async def async_setup_gateway(
+    hass: HomeAssistant, gateway: FakeGateway, options: Optional[Dict[str, Any]] = None
+) -> MockConfigEntry:
+    """为模拟网关创建并加载配置项。"""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_HOST: "127.0.0.1", CONF_PORT: gateway.port},
+        options=options or {},
+        unique_id=f"127.0.0.1:{gateway.port}",
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    return entry
+
+
+async def async_wait_for(hass: HomeAssistant, predicate, timeout: float = 2.0) -> None:
+    """等待网关帧经真实连接处理完毕。"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+        await hass.async_block_till_done()
+
+
+def entity_id_for(hass: HomeAssistant, platform: str, did: str) -> Optional[str]:
+    """按unique_id查找实体ID。"""
+    return er.async_get(hass).async_get_entity_id(platform, DOMAIN, f"{DOMAIN}_{did}")
@@ -0,0 +1,159 @@
+"""在网关模拟器上运行的性能基准。"""
+import statistics
+import time
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.entity_component import DATA_INSTANCES
+
+from custom_components.insona.const import DOMAIN, EVENT_INSONA
+
+from .conftest import COVER, LIGHT, TEMPERATURE_SENSOR, async_setup_gateway, async_wait_for, entity_id_for
+
+PANEL = {
+    "did": "ECC57F108F3BFF",
+    "pid": 1024,
+    "ver": "61706",
+    "type": 1218,
+    "alive": 1,
+    "roomId": 6,
+    "name": "会议面板",
+    "func": 9,
+    "funcs": [9],
+    "value": [0, 0],
+}
+
+# 每条链路测量的按键次数
+PRESSES = 30
+
+
+async def _async_press_latencies(hass: HomeAssistant, gateway, key: int) -> list:
+    """逐次按键，返回每次从推送按键事件到模拟器收到控制命令的毫秒数。"""
+    latencies = []
+    for _ in range(PRESSES):
+        controls = len(gateway.controls())
+        pressed_at = time.perf_counter()
+        gateway.push({"method": "s.event", "evt": "switch.key", "did": PANEL["did"], "func": 9, "value": [key, 0]})
+        await async_wait_for(hass, lambda: len(gateway.controls()) > controls)
+        latencies.append((gateway.control_times()[controls] - pressed_at) * 1000)
+    return latencies
+
+
+async def test_button_to_light_binding_vs_automation(hass: HomeAssistant, fake_gateway, record_property) -> None:
+    """按键到灯具控制帧的延迟：本地绑定直接写出预编译帧，明显快于事件加服务调用的自动化链路。"""
+    gateway = await fake_gateway([LIGHT, PANEL])
+    entry = await async_setup_gateway(hass, gateway)
+    entity_id = entity_id_for(hass, "light", LIGHT["did"])
+
+    # 按键3绑定到灯具，由网关读取任务直接下发
+    await hass.services.async_call(
+        DOMAIN,
+        "bind_key",
+        {"panel": PANEL["did"], "key": 3, "targets": [LIGHT["did"]], "action": "onoff", "value": [0]},
+        blocking=True,
+    )
+    binding = await _async_press_latencies(hass, gateway, 3)
+
+    # 按键4未绑定，由监听事件的自动化调用灯具服务
+    @callback
+    def _async_automation(event: Event) -> None:
+        if event.data["type"] == "switch.key" and event.data["value"][0] == 4:
+            hass.async_create_task(hass.services.async_call("light", "turn_off", {"entity_id": entity_id}))
+
+    unsub = hass.bus.async_listen(EVENT_INSONA, _async_automation)
+    automation = await _async_press_latencies(hass, gateway, 4)
+    unsub()
+
+    binding_ms = statistics.median(binding)
+    automation_ms = statistics.median(automation)
+    record_property("binding_median_ms", round(binding_ms, 3))
+    record_property("automation_median_ms", round(automation_ms, 3))
+    assert binding_ms < automation_ms
+    assert hass.data[DOMAIN][entry.entry_id].metrics.binding_latency_us is not None
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+# 注册基准中的设备数和房间数
+REGISTRY_DEVICES = 300
+REGISTRY_ROOMS = 10
+
+# 每个设备注册耗时的上限（毫秒）
+REGISTRY_BUDGET_MS = 1.0
+
+
+async def test_registry_write_time(hass: HomeAssistant, fake_gateway, record_property) -> None:
+    """几百个设备的区域和设备注册一次完成，每个设备的注册耗时在预算之内。"""
+    rooms = [{"roomId": room_id, "name": f"房间{room_id}"} for room_id in range(1, REGISTRY_ROOMS + 1)]
+    devices = [
+        {**LIGHT, "did": f"ECC57F1{index:07X}", "name": f"灯具{index}", "roomId": index % REGISTRY_ROOMS + 1}
+        for index in range(REGISTRY_DEVICES)
+    ]
+    gateway = await fake_gateway(devices, rooms=rooms)
+    entry = await async_setup_gateway(hass, gateway)
+    metrics = hass.data[DOMAIN][entry.entry_id].metrics
+
+    device_registry = dr.async_get(hass)
+    registered = dr.async_entries_for_config_entry(device_registry, entry.entry_id)
+    assert len(registered) == REGISTRY_DEVICES + 1
+    assert len({device.area_id for device in registered if device.area_id}) == REGISTRY_ROOMS
+
+    per_device_ms = metrics.registry_ms / REGISTRY_DEVICES
+    record_property("registry_ms", round(metrics.registry_ms, 1))
+    record_property("registry_per_device_us", round(per_device_ms * 1000, 1))
+    record_property("light_platform_ms", metrics.setup_timing["platforms_ms"]["light"])
+    assert per_device_ms < REGISTRY_BUDGET_MS
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+# 每种实体类各一个设备，覆盖所有灯具类、窗帘和传感器
+STATE_WRITE_DEVICES = [
+    {**LIGHT, "did": "ECC57F1031F110", "name": "开关灯", "func": 2, "funcs": [2], "value": [1]},
+    {**LIGHT, "did": "ECC57F1031F120", "name": "调光灯", "func": 3, "funcs": [2, 3], "value": [1, 80]},
+    LIGHT,
+    {**LIGHT, "did": "ECC57F1031F140", "name": "彩色灯", "func": 5, "funcs": [2, 3, 5], "value": [1, 100, 120, 50]},
+    {**LIGHT, "did": "ECC57F1031F150", "name": "双模式灯", "func": 4, "funcs": [2, 3, 4, 5], "value": [1, 100, 8]},
+    COVER,
+    TEMPERATURE_SENSOR,
+]
+
+# 每个实体写入状态的次数
+STATE_WRITES = 500
+
+# 每次写入状态耗时的上限（微秒）
+STATE_WRITE_BUDGET_US = 250.0
+
+
+async def test_state_write_per_entity_class(hass: HomeAssistant, fake_gateway, record_property) -> None:
+    """每个实体类写入一次状态的耗时在预算之内。"""
+    gateway = await fake_gateway(STATE_WRITE_DEVICES)
+    entry = await async_setup_gateway(hass, gateway)
+    components = hass.data[DATA_INSTANCES]
+
+    timings = {}
+    for device in STATE_WRITE_DEVICES:
+        platform = {LIGHT["type"]: "light", COVER["type"]: "cover"}.get(device["type"], "sensor")
+        entity = components[platform].get_entity(entity_id_for(hass, platform, device["did"]))
+        started = time.perf_counter()
+        for _ in range(STATE_WRITES):
+            entity.async_write_ha_state()
+        timings[type(entity).__name__] = (time.perf_counter() - started) * 1e6 / STATE_WRITES
+
+    assert set(timings) == {
+        "InSonaLight",
+        "InSonaDimmableLight",
+        "InSonaColorTempLight",
+        "InSonaRGBLight",
+        "InSonaDualModeLight",
+        "InSonaCover",
+        "InSonaSensor",
+    }
+    for entity_class, elapsed_us in timings.items():
+        record_property(f"{entity_class}_us", round(elapsed_us, 1))
+        assert elapsed_us < STATE_WRITE_BUDGET_US, entity_class
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,45 @@
+"""昼夜节律色温的测试。"""
+from homeassistant.core import HomeAssistant
+
+from .conftest import LIGHT, async_setup_gateway, async_wait_for
+
+SECOND_LIGHT = {**LIGHT, "did": "ECC57F1031F101", "name": "会议主灯"}
+
+ROOM_GROUP = "C0000000000006"
+
+# 最低和最高色温相同，目标色温与时间无关
+FIXED_KELVIN = {
+    "circadian_enabled": True,
+    "circadian_min_kelvin": 6500,
+    "circadian_max_kelvin": 6500,
+}
+
+
+async def test_transition_sent_in_milliseconds(hass: HomeAssistant, fake_gateway) -> None:
+    """逐灯命令带60秒渐变，以毫秒下发。"""
+    gateway = await fake_gateway([LIGHT])
+    entry = await async_setup_gateway(hass, gateway, FIXED_KELVIN)
+
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 1)
+    control = gateway.controls()[0]
+    assert control["did"] == LIGHT["did"]
+    assert control["action"] == "ctl"
+    assert control["value"] == [100, 100]
+    assert control["transition"] == 60000
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_room_group_command_transition(hass: HomeAssistant, fake_gateway) -> None:
+    """房间灯具状态一致时向组地址发一条带60秒渐变的命令。"""
+    gateway = await fake_gateway([LIGHT, SECOND_LIGHT])
+    entry = await async_setup_gateway(hass, gateway, {**FIXED_KELVIN, "room_groups": f"6={ROOM_GROUP}"})
+
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 1)
+    control = gateway.controls()[0]
+    assert control["did"] == ROOM_GROUP
+    assert control["transition"] == 60000
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
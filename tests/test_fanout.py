@@ -0,0 +1,63 @@
+"""多设备下发的测试。"""
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+
+from .conftest import LIGHT, async_setup_gateway, async_wait_for
+
+SECOND_LIGHT = {**LIGHT, "did": "ECC57F1031F101", "name": "会议主灯"}
+
+ROOM_GROUP = "C0000000000006"
+
+
+async def test_whole_room_uses_group_address(hass: HomeAssistant, fake_gateway) -> None:
+    """命令覆盖房间全部灯具且相同时只向组地址发一条命令。"""
+    gateway = await fake_gateway([LIGHT, SECOND_LIGHT])
+    entry = await async_setup_gateway(hass, gateway, {"room_groups": f"6={ROOM_GROUP}"})
+    commands = [
+        {"did": LIGHT["did"], "action": "onoff", "value": [0]},
+        {"did": SECOND_LIGHT["did"], "action": "onoff", "value": [0]},
+    ]
+
+    response = await hass.services.async_call(
+        DOMAIN, "bulk_control", {"commands": commands}, blocking=True, return_response=True
+    )
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 1)
+    assert gateway.controls()[0]["did"] == ROOM_GROUP
+    assert gateway.controls()[0]["value"] == [0]
+    for did in (LIGHT["did"], SECOND_LIGHT["did"]):
+        assert response["results"][did] == {"success": True, "group": ROOM_GROUP}
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_partial_room_falls_back_to_devices(hass: HomeAssistant, fake_gateway) -> None:
+    """只控制房间中部分灯具或命令不同时逐设备下发。"""
+    gateway = await fake_gateway([LIGHT, SECOND_LIGHT])
+    entry = await async_setup_gateway(hass, gateway, {"room_groups": f"6={ROOM_GROUP}"})
+
+    await hass.services.async_call(
+        DOMAIN,
+        "bulk_control",
+        {"commands": [{"did": LIGHT["did"], "action": "onoff", "value": [0]}]},
+        blocking=True,
+        return_response=True,
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        "bulk_control",
+        {
+            "commands": [
+                {"did": LIGHT["did"], "action": "level", "value": [40]},
+                {"did": SECOND_LIGHT["did"], "action": "level", "value": [60]},
+            ]
+        },
+        blocking=True,
+        return_response=True,
+    )
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 3)
+    assert ROOM_GROUP not in {control["did"] for control in gateway.controls()}
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
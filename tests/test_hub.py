@@ -0,0 +1,34 @@
+"""多网关调度中心的测试。"""
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.insona.const import DATA_HUB
+
+from .conftest import LIGHT, async_setup_gateway, entity_id_for
+
+
+async def test_owner_unload_transfers_entity(hass: HomeAssistant, fake_gateway) -> None:
+    """归属网关卸载后，仍能看到设备的网关接管实体。"""
+    first = await fake_gateway([LIGHT])
+    second = await fake_gateway([LIGHT])
+    first_entry = await async_setup_gateway(hass, first)
+    second_entry = await async_setup_gateway(hass, second)
+
+    hub = hass.data[DATA_HUB]
+    assert hub.owner(LIGHT["did"]) == f"127.0.0.1:{first.port}"
+    entity_id = entity_id_for(hass, "light", LIGHT["did"])
+    assert er.async_get(hass).async_get(entity_id).config_entry_id == first_entry.entry_id
+
+    assert await hass.config_entries.async_unload(first_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert hub.owner(LIGHT["did"]) == f"127.0.0.1:{second.port}"
+    entity_id = entity_id_for(hass, "light", LIGHT["did"])
+    assert entity_id is not None
+    assert er.async_get(hass).async_get(entity_id).config_entry_id == second_entry.entry_id
+    state = hass.states.get(entity_id)
+    assert state is not None
+    assert state.state == "on"
+
+    assert await hass.config_entries.async_unload(second_entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,39 @@
+"""设备在线状态跟踪的测试。"""
+import asyncio
+import time
+
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+from custom_components.insona.liveness import TimerWheel
+
+from .conftest import LIGHT, async_setup_gateway, async_wait_for, entity_id_for
+
+
+def _queries(gateway) -> int:
+    """模拟器收到的设备查询数。"""
+    return sum(1 for request in gateway.requests if request.get("method") == "c.query")
+
+
+async def test_idle_device_stays_available(hass: HomeAssistant, fake_gateway) -> None:
+    """长时间没有消息的设备只成为可疑设备，由重新同步的alive标志决定在线状态。"""
+    gateway = await fake_gateway([LIGHT])
+    entry = await async_setup_gateway(hass, gateway)
+    insona = hass.data[DOMAIN][entry.entry_id]
+    entity_id = entity_id_for(hass, "light", LIGHT["did"])
+    liveness = insona.liveness
+    liveness.wheel = TimerWheel(0.05, 0.01, time.monotonic())
+    liveness.wheel.touch(LIGHT["did"], time.monotonic())
+    queries = _queries(gateway)
+
+    await asyncio.sleep(0.1)
+    liveness._async_tick(None)
+    await async_wait_for(hass, lambda: _queries(gateway) > queries and liveness._resync_task is None)
+
+    assert insona.devices[LIGHT["did"]]["alive"] == 1
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+    assert liveness.as_dict()["suspects"] == 0
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,39 @@
+"""多路复用代理的测试。"""
+import asyncio
+import json
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+from custom_components.insona.proxy import MAX_REQUEST_FRAME
+
+from .conftest import LIGHT, async_setup_gateway
+
+# 代理监听本机随机端口
+PROXY_OPTIONS = {"proxy_enabled": True, "proxy_port": 0}
+
+
+async def test_oversized_request_disconnects_client(hass: HomeAssistant, fake_gateway) -> None:
+    """请求帧超过最大长度的客户端被断开，其他客户端照常应答。"""
+    gateway = await fake_gateway([LIGHT])
+    entry = await async_setup_gateway(hass, gateway, PROXY_OPTIONS)
+    proxy = hass.data[DOMAIN][entry.entry_id].proxy
+    port = proxy._server.sockets[0].getsockname()[1]
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"x" * (MAX_REQUEST_FRAME + 1))
+    await writer.drain()
+    assert await asyncio.wait_for(reader.read(), 2.0) == b""
+    writer.close()
+    assert proxy.clients_dropped == 1
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b'{"version": 1, "uuid": 7, "method": "c.query"}\r\n')
+    await writer.drain()
+    response = json.loads(await asyncio.wait_for(reader.readline(), 2.0))
+    assert response["uuid"] == 7
+    assert response["devices"][0]["did"] == LIGHT["did"]
+    writer.close()
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
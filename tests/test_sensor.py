@@ -0,0 +1,67 @@
+"""传感器实体的测试。"""
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+
+from .conftest import TEMPERATURE_SENSOR, async_setup_gateway, async_wait_for, entity_id_for
+
+
+async def test_status_frame_updates_sensor(hass: HomeAssistant, fake_gateway) -> None:
+    """网关推送的传感器状态帧经过死区过滤后写入实体状态。"""
+    gateway = await fake_gateway([TEMPERATURE_SENSOR])
+    entry = await async_setup_gateway(hass, gateway, {"temperature_deadband": 2})
+    entity_id = entity_id_for(hass, "sensor", TEMPERATURE_SENSOR["did"])
+    assert float(hass.states.get(entity_id).state) == 21
+    device = hass.data[DOMAIN][entry.entry_id].devices[TEMPERATURE_SENSOR["did"]]
+
+    # 变化小于死区，设备值更新但实体状态不变
+    gateway.push(
+        {"method": "s.event", "evt": "status", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [22]}
+    )
+    await async_wait_for(hass, lambda: device["value"] == [22])
+    assert float(hass.states.get(entity_id).state) == 21
+
+    gateway.push(
+        {"method": "s.event", "evt": "status", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [24]}
+    )
+    await async_wait_for(hass, lambda: device["value"] == [24])
+    assert float(hass.states.get(entity_id).state) == 24
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_reading_sensor_has_no_motion_entity(hass: HomeAssistant, fake_gateway) -> None:
+    """温度传感器只创建读数实体，不创建人体感应实体，也不加载二元传感器平台。"""
+    gateway = await fake_gateway([TEMPERATURE_SENSOR])
+    entry = await async_setup_gateway(hass, gateway)
+
+    assert entity_id_for(hass, "sensor", TEMPERATURE_SENSOR["did"]) is not None
+    assert entity_id_for(hass, "binary_sensor", TEMPERATURE_SENSOR["did"]) is None
+    assert "binary_sensor" not in hass.data[DOMAIN][entry.entry_id].platforms
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_sensor_event_recorded_in_history(hass: HomeAssistant, fake_gateway) -> None:
+    """传感器事件记入历史，小数和超出16位的读数原样保存。"""
+    gateway = await fake_gateway([TEMPERATURE_SENSOR])
+    entry = await async_setup_gateway(hass, gateway)
+    history = hass.data[DOMAIN][entry.entry_id].history
+
+    gateway.push(
+        {"method": "s.event", "evt": "sensor", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [23.5]}
+    )
+    gateway.push(
+        {"method": "s.event", "evt": "sensor", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [21.3]}
+    )
+    gateway.push(
+        {"method": "s.event", "evt": "sensor", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [65000]}
+    )
+    await async_wait_for(hass, lambda: len(history.entries(TEMPERATURE_SENSOR["did"])) == 3)
+    values = [record["value"] for record in history.entries(TEMPERATURE_SENSOR["did"])]
+    assert values == [[65000], [21.3], [23.5]]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
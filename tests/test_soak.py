@@ -0,0 +1,96 @@
+"""长时间运行的泄漏测试：反复重载、断线重连并灌入事件，资源占用应保持平稳。"""
+import gc
+import logging
+import tracemalloc
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+from custom_components.insona.resources import collect, process_rss_kb
+
+from .conftest import COVER, LIGHT, TEMPERATURE_SENSOR, async_setup_gateway, async_wait_for
+
+# 测试轮数，第一轮用于预热，之后各轮与第二轮比较
+CYCLES = 6
+
+# 每轮每个设备灌入的状态事件数
+FLOOD = 200
+
+# 预热后允许的常驻内存增长（KB）
+RSS_TOLERANCE_KB = 10 * 1024
+
+# 预热后集成代码允许的tracemalloc内存增长（字节）
+TRACE_TOLERANCE = 64 * 1024
+
+
+def _scene_queries(gateway) -> int:
+    """模拟器收到的场景查询数，每次同步最后查询场景。"""
+    return sum(1 for request in gateway.requests if request.get("method") == "c.query.scene")
+
+
+async def _async_cycle(hass: HomeAssistant, gateway, entry) -> None:
+    """重载配置项，断线重连，然后灌入事件。"""
+    assert await hass.config_entries.async_reload(entry.entry_id)
+    await hass.async_block_till_done()
+    insona = hass.data[DOMAIN][entry.entry_id]
+
+    # 重连后依次查询设备和场景，等到同步完成、没有等待中的请求
+    queries = _scene_queries(gateway)
+    gateway.drop()
+    await async_wait_for(
+        hass,
+        lambda: _scene_queries(gateway) > queries
+        and insona.connected
+        and not insona.resources()["waiting_commands"],
+    )
+
+    recorded = insona.history.recorded
+    for index in range(FLOOD):
+        gateway.push({"method": "s.event", "evt": "status", "did": LIGHT["did"], "func": 2, "value": [index % 2]})
+        gateway.push({"method": "s.event", "evt": "status", "did": COVER["did"], "func": 3, "value": [index % 100]})
+        gateway.push(
+            {"method": "s.event", "evt": "status", "did": TEMPERATURE_SENSOR["did"], "func": 10, "value": [index % 30]}
+        )
+    await async_wait_for(hass, lambda: insona.history.recorded >= recorded + 3 * FLOOD, timeout=10.0)
+    await hass.async_block_till_done()
+
+
+def _integration_growth(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> int:
+    """集成代码分配的内存增长（字节）。"""
+    file_filter = [tracemalloc.Filter(True, "*custom_components/insona/*")]
+    stats = after.filter_traces(file_filter).compare_to(before.filter_traces(file_filter), "filename")
+    return sum(stat.size_diff for stat in stats)
+
+
+async def test_reload_reconnect_flood_is_flat(hass: HomeAssistant, fake_gateway, caplog) -> None:
+    """各轮之后的回调数、请求数、任务数、常驻内存和集成内存不再增长。"""
+    # pytest会保存捕获的每条日志，调试日志逐轮累积会掩盖集成本身的内存变化；
+    # 主动断线产生的错误日志引用着异常及其栈帧，会让旧网关对象无法回收
+    caplog.set_level(logging.WARNING)
+    caplog.set_level(logging.CRITICAL, "custom_components.insona.gateway")
+    gateway = await fake_gateway([LIGHT, COVER, TEMPERATURE_SENSOR])
+    entry = await async_setup_gateway(hass, gateway)
+
+    tracemalloc.start(5)
+    try:
+        samples = []
+        snapshots = []
+        for cycle in range(CYCLES):
+            await _async_cycle(hass, gateway, entry)
+            gc.collect()
+            samples.append((collect(hass), await hass.async_add_executor_job(process_rss_kb)))
+            if cycle in (1, CYCLES - 1):
+                snapshots.append(tracemalloc.take_snapshot())
+    finally:
+        tracemalloc.stop()
+
+    baseline_counts, baseline_rss = samples[1]
+    for counts, rss in samples[2:]:
+        assert counts["gateways"] == baseline_counts["gateways"]
+        assert counts["bus_listeners"] <= baseline_counts["bus_listeners"]
+        assert counts["tasks"] <= baseline_counts["tasks"]
+        assert rss - baseline_rss < RSS_TOLERANCE_KB
+    assert _integration_growth(*snapshots) < TRACE_TOLERANCE
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,52 @@
+"""冗余命令过滤的测试。"""
+from homeassistant.core import HomeAssistant
+
+from custom_components.insona.const import DOMAIN
+
+from .conftest import COVER, LIGHT, async_setup_gateway, async_wait_for, entity_id_for
+
+
+async def test_bulk_control_skips_redundant_unless_forced(hass: HomeAssistant, fake_gateway) -> None:
+    """目标与已确认状态一致的命令不下发，force时照常下发。"""
+    gateway = await fake_gateway([LIGHT])
+    entry = await async_setup_gateway(hass, gateway)
+    command = {"did": LIGHT["did"], "action": "onoff", "value": [1]}
+
+    response = await hass.services.async_call(
+        DOMAIN, "bulk_control", {"commands": [command]}, blocking=True, return_response=True
+    )
+    assert response["results"][LIGHT["did"]] == {"success": True, "skipped": True}
+    assert gateway.controls() == []
+
+    response = await hass.services.async_call(
+        DOMAIN, "bulk_control", {"commands": [command], "force": True}, blocking=True, return_response=True
+    )
+    assert response["results"][LIGHT["did"]]["success"]
+    assert "skipped" not in response["results"][LIGHT["did"]]
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 1)
+    assert gateway.controls()[0]["action"] == "onoff"
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_cover_position_already_reached_is_skipped(hass: HomeAssistant, fake_gateway) -> None:
+    """窗帘已确认处于目标位置时不下发位置命令。"""
+    gateway = await fake_gateway([COVER])
+    entry = await async_setup_gateway(hass, gateway)
+    entity_id = entity_id_for(hass, "cover", COVER["did"])
+
+    await hass.services.async_call(
+        "cover", "set_cover_position", {"entity_id": entity_id, "position": 0}, blocking=True
+    )
+    assert gateway.controls() == []
+
+    await hass.services.async_call(
+        "cover", "set_cover_position", {"entity_id": entity_id, "position": 60}, blocking=True
+    )
+    await async_wait_for(hass, lambda: len(gateway.controls()) == 1)
+    assert gateway.controls()[0]["action"] == "level"
+    assert gateway.controls()[0]["value"] == [60]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()